@@ -13,17 +13,31 @@ class ConfigError(Exception):
 class Config:
     # Github
     GITHUB_REPOSITORIES: list = None
-    GITHUB_MAX_REPOSITORIES: int = 5
 
     # Aggregator
     AGGREGATOR_ROLLING_DAYS: int = 7
     AGGREGATOR_ROLLING_EVENTS: int = 500
     AGGREGATOR_BACKGROUND_REFRESH: int = 100
+    AGGREGATOR_REFRESH_TIMEOUT: int = 60
     AGGREGATOR_STATS_PRECISION: int = 2
+    AGGREGATOR_SKETCH_ACCURACY: float = 0.01
+    AGGREGATOR_ENGINE: str = "python"
+    AGGREGATOR_INCREMENTAL: bool = False
+    AGGREGATOR_FULL_REFRESH_INTERVAL: int = 36
+    AGGREGATOR_FETCH_BATCH_SIZE: int = 10000
+    AGGREGATOR_WINDOWS: dict = {}
+    AGGREGATOR_SHARED_SNAPSHOT_PATH: str = "none"
+    AGGREGATOR_SHARED_SNAPSHOT_POLL: float = 1
+    AGGREGATOR_LISTEN: bool = False
+    AGGREGATOR_LISTEN_DEBOUNCE: float = 2
+
+    # Database
+    DATABASE_NOTIFY_CHANNEL: str = "github_events_inserted"
 
     # Api
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
+    API_WORKERS: int = 1
 
     # Logging
     LOGGING_LEVEL: str = "warning"
@@ -72,14 +86,16 @@ class Config:
                     )
                 )
 
+        self._initialized = True
+
     def _parse_bool(self, val: str | bool) -> bool:
         return val if type(val) == bool else val.lower() in ["true", "yes", "1"]
 
-    def _parse_list(self, val: str) -> list:
-        return ast.literal_eval(val)
+    def _parse_list(self, val: str | list) -> list:
+        return val if type(val) == list else ast.literal_eval(val)
 
-    def _parse_dict(self, val: str) -> dict:
-        return ast.literal_eval(val)
+    def _parse_dict(self, val: str | dict) -> dict:
+        return val if type(val) == dict else ast.literal_eval(val)
 
     def _parse_str(self, val: str) -> str | None:
         if str(val).lower() in ["none", "null"]:
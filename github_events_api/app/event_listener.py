@@ -0,0 +1,123 @@
+
+import asyncio
+import json
+import logging
+import traceback
+
+from sqlalchemy.engine import Engine
+
+from app.config import Config
+
+
+class EventListener:
+    """
+    LISTENs on the DATABASE_NOTIFY_CHANNEL postgre channel, which the scraper notifies after inserting events,
+    with the affected repositories and the creation time of the newest inserted event in the payload.
+    The repositories are null if there were too many of them for a notification.
+
+    Uses its own psycopg2 connection, whose socket is watched by the event loop, so waiting for notifications
+    doesn't need a thread.
+    """
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+        self._connection = None
+        self._notifications: asyncio.Queue[dict] | None = None
+
+    @property
+    def is_listening(self) -> bool:
+        return self._connection is not None
+
+    def start(self) -> bool:
+        """
+        Connects and starts listening, if not listening already.
+
+        :return: whether it listens
+        """
+
+        if self.is_listening:
+            return True
+
+        if self.db_engine.dialect.driver != "psycopg2":
+            logging.warning(
+                f"Listening for inserted events needs psycopg2, got: {self.db_engine.dialect.driver}"
+            )
+            return False
+
+        try:
+            connection = self.db_engine.raw_connection()
+            driver_connection = connection.driver_connection
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self._config.DATABASE_NOTIFY_CHANNEL}"')
+        except Exception as e:
+            logging.error(
+                f"Couldn't listen for inserted events, ERROR: {e}, traceback: {traceback.format_exc()}"
+            )
+            return False
+
+        self._connection = connection
+        self._notifications = asyncio.Queue()
+        asyncio.get_running_loop().add_reader(
+            driver_connection.fileno(), self._read_notifications
+        )
+        logging.info(
+            f"Listening for inserted events on {self._config.DATABASE_NOTIFY_CHANNEL} channel."
+        )
+        return True
+
+    def _read_notifications(self):
+        driver_connection = self._connection.driver_connection
+        try:
+            driver_connection.poll()
+        except Exception as e:
+            logging.error(
+                f"Listening connection failed, ERROR: {e}, traceback: {traceback.format_exc()}"
+            )
+            self.close()
+            return
+
+        while driver_connection.notifies:
+            notification = driver_connection.notifies.pop(0)
+            try:
+                self._notifications.put_nowait(json.loads(notification.payload))
+            except ValueError:
+                logging.warning(
+                    f"Invalid inserted events notification: {notification.payload}"
+                )
+
+    async def wait(self, timeout: float) -> dict | None:
+        """
+        :param timeout: how long to wait for a notification in seconds
+        :return: payload of the next notification, None if none came in time
+        """
+
+        try:
+            return await asyncio.wait_for(self._notifications.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self) -> list[dict]:
+        """
+        :return: payloads of all notifications received so far
+        """
+
+        payloads = []
+        while self._notifications and not self._notifications.empty():
+            payloads.append(self._notifications.get_nowait())
+        return payloads
+
+    def close(self):
+        if self._connection is None:
+            return
+
+        connection = self._connection
+        self._connection = None
+        try:
+            asyncio.get_running_loop().remove_reader(
+                connection.driver_connection.fileno()
+            )
+        except Exception:
+            pass
+        connection.invalidate()
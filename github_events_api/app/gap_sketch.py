@@ -0,0 +1,135 @@
+
+import math
+
+
+class GapSketch:
+    """
+    DDSketch of consecutive times between events.
+
+    Times are counted in logarithmic buckets, so quantiles have a relative error of at most relative_accuracy
+    and the memory depends only on the range of the times, not on their amount. Counts can also be removed,
+    which keeps the sketch of a rolling window up to date, and sketches of the same accuracy can be merged.
+
+    The minimum and maximum are exact, they're tracked besides the buckets. Once the current one is removed, the next
+    one isn't known anymore, it's estimated from the buckets until it's set again.
+    """
+
+    __slots__ = ("_log_gamma", "buckets", "zero_count", "count", "min", "max")
+
+    def __init__(self, relative_accuracy: float):
+        self._log_gamma = self.get_log_gamma(relative_accuracy)
+        self.buckets: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        # exact extremes of the times, infinite without times and None when unknown
+        self.min: float | None = math.inf
+        self.max: float | None = -math.inf
+
+    @staticmethod
+    def get_log_gamma(relative_accuracy: float) -> float:
+        """
+        Logarithm of the ratio between bucket bounds, bucket of a time is ceil(log(time) / log_gamma).
+        """
+
+        return math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+
+    def get_bucket(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _get_bucket_value(self, bucket: int) -> float:
+        # middle of the bucket (gamma^(i-1), gamma^i] in terms of relative error
+        return 2 * math.exp(bucket * self._log_gamma) / (1 + math.exp(self._log_gamma))
+
+    def add_bucket(self, bucket: int | None, count: int = 1):
+        """
+        Counts times without their values, their extremes are added by add_extremes.
+
+        :param bucket: bucket from get_bucket, None for zero times
+        :param count: how many times to add to the bucket, negative to remove them
+        """
+
+        self.count += count
+        if bucket is None:
+            self.zero_count += count
+            return
+
+        bucket_count = self.buckets.get(bucket, 0) + count
+        if bucket_count:
+            self.buckets[bucket] = bucket_count
+        else:
+            del self.buckets[bucket]
+
+    def add_extremes(self, minimum: float, maximum: float):
+        """
+        :param minimum: minimum of the added times
+        :param maximum: maximum of the added times
+        """
+
+        if self.min is not None:
+            self.min = min(self.min, minimum)
+        if self.max is not None:
+            self.max = max(self.max, maximum)
+
+    def add(self, value: float):
+        self.add_bucket(self.get_bucket(value) if value > 0 else None)
+        self.add_extremes(value, value)
+
+    def remove(self, value: float):
+        self.add_bucket(self.get_bucket(value) if value > 0 else None, -1)
+        if self.count == 0:
+            self.min, self.max = math.inf, -math.inf
+            return
+        if self.min is not None and value <= self.min:
+            self.min = None
+        if self.max is not None and value >= self.max:
+            self.max = None
+
+    def merge(self, other: "GapSketch"):
+        for bucket, count in other.buckets.items():
+            self.add_bucket(bucket, count)
+        self.add_bucket(None, other.zero_count)
+        self.min = None if other.min is None else self.min
+        self.max = None if other.max is None else self.max
+        self.add_extremes(other.min, other.max)
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        :param quantile: between 0 and 1, e.g. 0.99 for 99th percentile
+        :return: time at the quantile, exact for 0 and 1, approximate between them, 0 for an empty sketch
+        """
+
+        if quantile == 0:
+            return self.get_min()
+        if quantile == 1:
+            return self.get_max()
+        return self._estimate_quantile(quantile)
+
+    def _estimate_quantile(self, quantile: float) -> float:
+        if self.count == 0:
+            return 0.0
+
+        rank = quantile * (self.count - 1)
+        cumulative_count = self.zero_count
+        if rank < cumulative_count:
+            return 0.0
+
+        for bucket in sorted(self.buckets):
+            cumulative_count += self.buckets[bucket]
+            if rank < cumulative_count:
+                return self._get_bucket_value(bucket)
+
+        return self._get_bucket_value(max(self.buckets))
+
+    def get_min(self) -> float:
+        if self.count == 0:
+            return 0.0
+        if self.min is None:
+            return self._estimate_quantile(0)
+        return self.min
+
+    def get_max(self) -> float:
+        if self.count == 0:
+            return 0.0
+        if self.max is None:
+            return self._estimate_quantile(1)
+        return self.max
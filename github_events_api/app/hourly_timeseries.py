@@ -0,0 +1,70 @@
+
+import datetime
+from collections import defaultdict
+
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+
+from shared_resources.github_event import GithubEventHourlyCount
+from shared_resources.database_utils import postgre_session
+from shared_resources.helpers import convert_to_github_datetime, truncate_to_hour
+from app.config import Config
+
+
+class HourlyTimeseries:
+    """
+    Reads hourly event counts of a repository from the rollup table the scraper maintains, instead of
+    grouping the raw events on every request.
+    """
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+
+    def get_max_hours(self) -> int:
+        return self._config.AGGREGATOR_ROLLING_DAYS * 24
+
+    @postgre_session
+    def fetch_repository_timeseries(
+        self, session: Session, repository: str, hours: int
+    ) -> dict:
+        """
+        Fetches event counts of the last hours by event type, hours without events are counted as 0.
+
+        :param session: postgre session injected by decorator
+        :param repository: repository in owner/name format
+        :param hours: number of the last hours including the current one, at most AGGREGATOR_ROLLING_DAYS days
+        :return: start of every hour, event counts by event type and across all event types for every hour
+        """
+
+        hours = min(hours, self.get_max_hours())
+        first_hour = truncate_to_hour(
+            datetime.datetime.now(tz=datetime.timezone.utc)
+        ) - datetime.timedelta(hours=hours - 1)
+
+        hourly_counts = session.query(
+            GithubEventHourlyCount.type,
+            GithubEventHourlyCount.hour,
+            GithubEventHourlyCount.count,
+        ).filter(
+            GithubEventHourlyCount.repository == repository,
+            GithubEventHourlyCount.hour >= first_hour,
+        )
+
+        all_counts = [0] * hours
+        event_type_counts = defaultdict(lambda: [0] * hours)
+        for event_type, hour, count in hourly_counts:
+            hour_index = int((hour - first_hour) / datetime.timedelta(hours=1))
+            if hour_index >= hours:
+                continue
+            all_counts[hour_index] += count
+            event_type_counts[event_type][hour_index] += count
+
+        return {
+            "hours": [
+                convert_to_github_datetime(first_hour + datetime.timedelta(hours=i))
+                for i in range(hours)
+            ],
+            "all_actions": all_counts,
+            "event_type": dict(event_type_counts),
+        }
@@ -1,24 +1,35 @@
 
 import logging
+import os
+import tempfile
 
 import asyncio
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Query
 from contextlib import asynccontextmanager
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi import HTTPException
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy import create_engine
 
 from app.stats_aggregator import StatsAggregator
+from app.hourly_timeseries import HourlyTimeseries
+from app import metrics
+from app.metrics import RequestLatencyMiddleware
 from app.config import Config
 from shared_resources.helpers import set_logger
 from shared_resources.database_utils import get_connection_string
 
 
 config = Config()
+# looked up on every timeseries request
+tracked_repositories = set(config.GITHUB_REPOSITORIES)
 
 db_engine = create_engine(get_connection_string())
+# of all the workers, created once
+metrics_registry = metrics.get_registry()
 stats_aggregator = StatsAggregator(config=config, db_engine=db_engine)
+hourly_timeseries = HourlyTimeseries(config=config, db_engine=db_engine)
 
 
 @asynccontextmanager
@@ -35,6 +46,7 @@ async def lifespan(app: FastAPI):
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestLatencyMiddleware)
 
 
 @app.get("/health")
@@ -44,34 +56,13 @@ async def get_health():
     )
 
 
-async def get_consecutive_result(repository_to_return: str = None) -> dict:
-    result = {
-        "last_refresh": await stats_aggregator.get_last_updated(),
-        "repositories": {},
-    }
-
-    async with stats_aggregator.lock:
-        for repository in stats_aggregator.cached_stats:
-            if repository_to_return and repository != repository_to_return:
-                continue
-
-            for event_type in stats_aggregator.cached_stats[repository]:
-                if repository not in result["repositories"]:
-                    result["repositories"][repository] = {
-                        "all_actions": {},
-                        "event_type": {},
-                    }
-
-                if event_type == "all":
-                    result["repositories"][repository]["all_actions"] = (
-                        stats_aggregator.cached_stats[repository]["all"]
-                    )
-                else:
-                    result["repositories"][repository]["event_type"][event_type] = (
-                        stats_aggregator.cached_stats[repository][event_type]
-                    )
-
-    return result
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # set on scrape, the age of the snapshot of the worker answering it
+    metrics.SNAPSHOT_AGE.set(
+        metrics.get_refresh_age(stats_aggregator.snapshot.last_refresh)
+    )
+    return Response(generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
 
 
 ok_response_example = {
@@ -80,6 +71,7 @@ ok_response_example = {
         "application/json": {
             "example": {
                 "last_refresh": "2025-04-07T14:14:10+00:00Z",
+                "window": "default",
                 "repositories": {
                     "user/repo_name": {
                         "all_actions": {
@@ -106,14 +98,49 @@ ok_response_example = {
 response_structure = """
 **Structure of response:**\n
     - `last_refresh`: Timestamp of last stats update (UTC, ISO format)\n
+    - `window`: Name of the rolling window the stats are calculated over\n
     - `repositories`: A dictionary keyed by repository name (e.g. `owner/repo`), each containing:\n
         - `all_actions`: Stats across all event types\n
         - `event_type`: Dictionary of stats grouped by event type (e.g. `PushEvent`, `WatchEvent`, etc.)\n\n
         Each stat entry includes:\n
             - `consecutive_events_average_s`: Average time (in seconds) between consecutive events of that type\n
-            - `total_events`: Total number of events used to compute the average
+            - `total_events`: Total number of events used to compute the average\n
+            - with `percentiles=true`: `consecutive_events_min_s`, `consecutive_events_p50_s`,
+            `consecutive_events_p90_s`, `consecutive_events_p99_s` and `consecutive_events_max_s` approximate
+            minimum, percentiles and maximum time (in seconds) between consecutive events
 """
 
+percentiles_description = (
+    "Include min, max, 50th, 90th and 99th percentile of time between consecutive events"
+)
+
+window_description = (
+    "Name of a rolling window configured in AGGREGATOR_WINDOWS, the first configured window if not given"
+)
+
+unknown_window_response = {
+    "description": "Rolling window is not configured",
+    "content": {"application/json": {"example": {"detail": "Window '...' not found"}}},
+}
+
+
+def get_stats_window(window: str | None) -> str:
+    """
+    :param window: requested stats window name, None for the default one
+    :return: name of a configured stats window
+    """
+
+    if window is None:
+        return stats_aggregator.default_window
+
+    if window not in stats_aggregator.stats_windows:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Window '{window}' not found, available windows: {list(stats_aggregator.stats_windows)}",
+        )
+
+    return window
+
 
 @app.get(
     "/github_events/all/consecutive_stats",
@@ -121,16 +148,26 @@ response_structure = """
     description=(
         "Returns statistics for the average time between consecutive GitHub events and their amount. "
         "The stats contain all repositories configured, grouped by event type and also across all event types. "
-        "They are grouped by a specific repo over a rolling window (7 days or 500 events).\n"
+        "They are grouped by a specific repo over a configurable rolling window (by default 7 days or 500 events).\n"
         + response_structure
     ),
     tags=["GitHub Stats"],
     response_description="A dictionary of consecutive event time by repository and event type",
-    responses={200: ok_response_example},
+    responses={
+        200: ok_response_example,
+        304: {"description": "Stats didn't change since the ETag in If-None-Match"},
+        400: unknown_window_response,
+    },
 )
-async def get_all_consecutive_stats():
-    result = await get_consecutive_result()
-    return JSONResponse(result)
+async def get_all_consecutive_stats(
+    percentiles: bool = Query(default=False, description=percentiles_description),
+    window: str | None = Query(default=None, description=window_description),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+) -> Response:
+    return stats_aggregator.snapshot.get_encoded_response(
+        get_stats_window(window), percentiles=percentiles
+    ).get_response(if_none_match, accept_encoding)
 
 
 @app.get(
@@ -139,13 +176,15 @@ async def get_all_consecutive_stats():
     description=(
         "Returns statistics about consecutive GitHub events for a single repository, "
         "grouped by event type and across all types. Useful for tracking activity trends "
-        "in a specific repo over a rolling window (7 days or 500 events).\n"
+        "in a specific repo over a configurable rolling window (by default 7 days or 500 events).\n"
         + response_structure
     ),
     tags=["GitHub Stats"],
     response_description="A dictionary of stats for the given repository and event type",
     responses={
         200: ok_response_example,
+        304: {"description": "Stats didn't change since the ETag in If-None-Match"},
+        400: unknown_window_response,
         404: {
             "description": "Repository not found or has no events in the aggregation window",
             "content": {
@@ -154,18 +193,111 @@ async def get_all_consecutive_stats():
         },
     },
 )
-async def get_all_stats_repo(repo_owner: str, repo_name: str):
-    result = await get_consecutive_result(f"{repo_owner}/{repo_name}")
-    if not result["repositories"]:
+async def get_all_stats_repo(
+    repo_owner: str,
+    repo_name: str,
+    percentiles: bool = Query(default=False, description=percentiles_description),
+    window: str | None = Query(default=None, description=window_description),
+    if_none_match: str | None = Header(default=None),
+    accept_encoding: str | None = Header(default=None),
+) -> Response:
+    repository_response = stats_aggregator.snapshot.get_encoded_response(
+        get_stats_window(window), f"{repo_owner}/{repo_name}", percentiles
+    )
+    if not repository_response:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Repository with owner: '{repo_owner}' and name: {repo_name} not found",
+        )
+
+    return repository_response.get_response(if_none_match, accept_encoding)
+
+
+timeseries_response_example = {
+    "description": "Timeseries retrieved successfully",
+    "content": {
+        "application/json": {
+            "example": {
+                "repository": "user/repo_name",
+                "hours": ["2025-04-07T13:00:00Z", "2025-04-07T14:00:00Z"],
+                "all_actions": [5, 2],
+                "event_type": {"PushEvent": [3, 2], "WatchEvent": [2, 0]},
+            }
+        }
+    },
+}
+
+timeseries_response_structure = """
+**Structure of response:**\n
+    - `repository`: Repository name (e.g. `owner/repo`)\n
+    - `hours`: Start of every hour (UTC, ISO format), from the oldest\n
+    - `all_actions`: Event counts across all event types, one per hour\n
+    - `event_type`: Event counts of every event type (e.g. `PushEvent`), one per hour
+"""
+
+
+# not async, the database query runs in the threadpool instead of blocking the event loop
+@app.get(
+    "/github_events/repo/{repo_owner}/{repo_name}/timeseries",
+    summary="Get hourly event counts for a specific repository",
+    description=(
+        "Returns the number of GitHub events of a single repository in each of the last hours, "
+        "grouped by event type and across all types. Hours without events have count 0.\n"
+        + timeseries_response_structure
+    ),
+    tags=["GitHub Stats"],
+    response_description="Event counts by hour and event type",
+    responses={
+        200: timeseries_response_example,
+        404: {
+            "description": "Repository is not configured",
+            "content": {
+                "application/json": {"example": {"detail": "Repository ... not found"}}
+            },
+        },
+    },
+)
+def get_repo_timeseries(
+    repo_owner: str,
+    repo_name: str,
+    hours: int | None = Query(
+        default=None,
+        ge=1,
+        description="Number of the last hours including the current one, all kept hours if not given",
+    ),
+) -> JSONResponse:
+    repository = f"{repo_owner}/{repo_name}"
+    if repository not in tracked_repositories:
         raise HTTPException(
             status_code=404,
             detail=f"Repository with owner: '{repo_owner}' and name: {repo_name} not found",
         )
 
-    return JSONResponse(result)
+    timeseries = hourly_timeseries.fetch_repository_timeseries(
+        repository=repository, hours=hours or hourly_timeseries.get_max_hours()
+    )
+    return JSONResponse({"repository": repository, **timeseries})
 
 
 if __name__ == "__main__":
     set_logger(config)
     logging.info("Starting app...")
-    uvicorn.run("app.main:app", host=config.API_HOST, port=config.API_PORT)
+    if config.API_WORKERS > 1 and not config.AGGREGATOR_SHARED_SNAPSHOT_PATH:
+        logging.warning(
+            "Every API worker refreshes statistics on its own, "
+            "set AGGREGATOR_SHARED_SNAPSHOT_PATH to refresh them only once."
+        )
+    with tempfile.TemporaryDirectory(
+        prefix="github_events_api_metrics_"
+    ) as metrics_dir:
+        if config.API_WORKERS > 1:
+            # otherwise /metrics returns the metrics of whichever worker answers it
+            metrics.prepare_multiprocess_dir(
+                os.environ.get(metrics.MULTIPROCESS_DIR_ENV) or metrics_dir
+            )
+        uvicorn.run(
+            "app.main:app",
+            host=config.API_HOST,
+            port=config.API_PORT,
+            workers=config.API_WORKERS,
+        )
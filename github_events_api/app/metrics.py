@@ -0,0 +1,135 @@
+
+import datetime
+import glob
+import os
+import time
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+)
+
+# with multiple API workers every worker writes its metrics to files in this directory, and /metrics collects
+# the metrics of all of them, prometheus_client reads it on import
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+REFRESH_DURATION = Histogram(
+    "github_events_api_refresh_duration_seconds",
+    "Duration of stats refreshes from database",
+    ["scope"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+# bound once, so the refresh doesn't look up label children
+FULL_REFRESH_DURATION = REFRESH_DURATION.labels(scope="full")
+REPOSITORIES_REFRESH_DURATION = REFRESH_DURATION.labels(scope="repositories")
+
+# gauges of the last value, from any worker with multiple workers
+REFRESH_ROWS = Gauge(
+    "github_events_api_last_refresh_rows",
+    "Rows fetched from database by the last stats refresh, already aggregated rows with the sql engine",
+    multiprocess_mode="mostrecent",
+)
+REFRESH_ROWS_TOTAL = Counter(
+    "github_events_api_refresh_rows_total",
+    "Rows fetched from database by stats refreshes, already aggregated rows with the sql engine",
+)
+REFRESH_FAILURES = Counter(
+    "github_events_api_refresh_failures_total",
+    "Stats refreshes that timed out, or were skipped because the previous one was still running",
+    ["reason"],
+)
+TIMED_OUT_REFRESHES = REFRESH_FAILURES.labels(reason="timeout")
+SKIPPED_REFRESHES = REFRESH_FAILURES.labels(reason="skipped")
+
+SNAPSHOT_AGE = Gauge(
+    "github_events_api_snapshot_age_seconds",
+    "Seconds since the served stats snapshot was refreshed, -1 before the first refresh",
+    multiprocess_mode="mostrecent",
+)
+
+LEADER_LOCK_WAIT = Histogram(
+    "github_events_api_leader_lock_wait_seconds",
+    "Time spent trying to acquire the shared snapshot leader lock",
+    buckets=(0.00001, 0.0001, 0.001, 0.01, 0.1, 1),
+)
+
+REQUEST_LATENCY = Histogram(
+    "github_events_api_request_duration_seconds",
+    "Latency of API requests by endpoint",
+    ["method", "endpoint"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def observe_refresh_rows(rows: int):
+    REFRESH_ROWS.set(rows)
+    REFRESH_ROWS_TOTAL.inc(rows)
+
+
+def prepare_multiprocess_dir(path: str):
+    """
+    Sets the metrics directory of the API workers, they must be started after. Metrics of a previous run are removed.
+
+    :param path: existing directory
+    """
+
+    for metrics_file in glob.glob(os.path.join(path, "*.db")):
+        os.remove(metrics_file)
+    os.environ[MULTIPROCESS_DIR_ENV] = path
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    :return: registry of the metrics of all API workers if they share a metrics directory, of this process otherwise
+    """
+
+    if not os.environ.get(MULTIPROCESS_DIR_ENV):
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def get_refresh_age(last_refresh: str | None) -> float:
+    """
+    :param last_refresh: refresh time of a snapshot in its ISO format
+    :return: seconds since the refresh, -1 if there was none
+    """
+
+    if not last_refresh:
+        return -1
+    refreshed_at = datetime.datetime.fromisoformat(last_refresh.removesuffix("Z"))
+    return time.time() - refreshed_at.timestamp()
+
+
+class RequestLatencyMiddleware:
+    """
+    ASGI middleware observing request latency by the endpoint's route path, so path parameters don't create
+    a label per repository. Label children are bound once per endpoint.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._latencies: dict[tuple[str, str], Histogram] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            # requests not matching any endpoint are one label
+            endpoint = (scope["method"], route.path if route else "unmatched")
+            latency = self._latencies.get(endpoint)
+            if latency is None:
+                latency = self._latencies[endpoint] = REQUEST_LATENCY.labels(*endpoint)
+            latency.observe(time.perf_counter() - request_start)
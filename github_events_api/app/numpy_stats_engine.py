@@ -0,0 +1,243 @@
+
+import datetime
+import itertools
+import operator
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import Float, cast, extract, select
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+
+from shared_resources.github_event import GithubEvent
+from shared_resources.database_utils import postgre_session
+from app.config import Config
+from app.gap_sketch import GapSketch
+from app.metrics import observe_refresh_rows
+
+
+class NumpyStatsEngine:
+    """
+    Calculates consecutive event stats with vectorized numpy operations over whole columns of events,
+    instead of looping through the events one by one.
+    """
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+
+    @staticmethod
+    def _encode(values, count: int, codes: defaultdict[str, int]) -> np.ndarray:
+        """
+        Encodes strings as integer codes, in order of their first appearance.
+
+        :param values: iterable of strings to encode
+        :param count: number of values
+        :param codes: code of every string encoded so far, new strings are added to it
+        :return: code of every value
+        """
+
+        return np.fromiter(map(codes.__getitem__, values), dtype=np.int64, count=count)
+
+    def _group_sketches(
+        self, group_indexes: np.ndarray, gaps: np.ndarray, groups_count: int
+    ) -> list[GapSketch]:
+        """
+        Counts consecutive times of each group into sketch buckets, with their extremes.
+
+        :param group_indexes: index of the group of every consecutive time
+        :param gaps: consecutive times
+        :param groups_count: number of groups
+        :return: sketch of every group
+        """
+
+        sketches = [
+            GapSketch(self._config.AGGREGATOR_SKETCH_ACCURACY)
+            for _ in range(groups_count)
+        ]
+
+        min_gaps = np.full(groups_count, np.inf)
+        max_gaps = np.full(groups_count, -np.inf)
+        np.minimum.at(min_gaps, group_indexes, gaps)
+        np.maximum.at(max_gaps, group_indexes, gaps)
+        for group_index in np.flatnonzero(np.isfinite(min_gaps)):
+            sketches[group_index].add_extremes(
+                float(min_gaps[group_index]), float(max_gaps[group_index])
+            )
+
+        zero_counts = np.bincount(group_indexes[gaps == 0], minlength=groups_count)
+        for group_index in np.flatnonzero(zero_counts):
+            sketches[group_index].add_bucket(None, int(zero_counts[group_index]))
+
+        positive = gaps > 0
+        log_gamma = GapSketch.get_log_gamma(self._config.AGGREGATOR_SKETCH_ACCURACY)
+        buckets = np.ceil(np.log(gaps[positive]) / log_gamma).astype(np.int64)
+        if len(buckets):
+            # one code per group and bucket pair, to count the pairs at once
+            min_bucket = buckets.min()
+            buckets_range = buckets.max() - min_bucket + 1
+            pair_codes, pair_counts = np.unique(
+                group_indexes[positive] * buckets_range + buckets - min_bucket,
+                return_counts=True,
+            )
+            for pair_code, pair_count in zip(pair_codes, pair_counts):
+                group_index, bucket = divmod(int(pair_code), int(buckets_range))
+                sketches[group_index].add_bucket(
+                    bucket + int(min_bucket), int(pair_count)
+                )
+
+        return sketches
+
+    def _group_gap_stats(
+        self, group_codes: np.ndarray, timestamps: np.ndarray, max_events: int | None
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[GapSketch]]:
+        """
+        Sums consecutive times between the newest max_events events of each group, counts them
+        and sketches their distribution.
+
+        :param group_codes: integer group of every event
+        :param timestamps: unix timestamp of every event, ordered from the oldest
+        :param max_events: maximum number of newest events of a group, None for no limit
+        :return: group codes, consecutive times sums, numbers of events and sketches, one element per group
+        """
+
+        # stable sort keeps the events of a group ordered by time
+        order = np.argsort(group_codes, kind="stable")
+        group_codes = group_codes[order]
+        timestamps = timestamps[order]
+
+        group_starts = np.flatnonzero(
+            np.concatenate(([True], group_codes[1:] != group_codes[:-1]))
+        )
+        group_sizes = np.diff(np.append(group_starts, len(group_codes)))
+        position_in_group = np.arange(len(group_codes)) - np.repeat(
+            group_starts, group_sizes
+        )
+
+        if max_events is None:
+            first_gap_position = np.zeros_like(group_sizes)
+            total_events = group_sizes
+        else:
+            first_gap_position = np.maximum(group_sizes - max_events, 0)
+            total_events = np.minimum(group_sizes, max_events)
+
+        # the consecutive time of an event is counted only if both it and the previous event are in the newest events
+        has_gap = position_in_group > np.repeat(first_gap_position, group_sizes)
+        gaps = np.diff(timestamps, prepend=timestamps[0])
+
+        gap_sums = np.add.reduceat(np.where(has_gap, gaps, 0.0), group_starts)
+        sketches = self._group_sketches(
+            np.repeat(np.arange(len(group_starts)), group_sizes)[has_gap],
+            gaps[has_gap],
+            len(group_starts),
+        )
+
+        return group_codes[group_starts], gap_sums, total_events, sketches
+
+    @postgre_session
+    def fetch_consecutive_stats(
+        self,
+        session: Session,
+        stats_windows: dict[str, tuple[datetime.datetime, int | None]],
+        repositories: list[str] | None = None,
+    ) -> dict[str, dict[str, dict[str, tuple[float, int, GapSketch]]]]:
+        """
+        Fetches the sum of consecutive times between events, their amount and sketch for configured repositories,
+        grouped by event repo and event type, and also across all event types under the "all" key.
+
+        Events of the widest stats window are fetched once, narrower time windows are their newest slices.
+
+        :param session: postgre session injected by decorator
+        :param stats_windows: oldest event creation time and maximum number of newest events (None for no limit)
+            by stats window name
+        :param repositories: repositories to fetch, all configured repositories by default
+        :return: (consecutive times sum in seconds, number of events, consecutive times sketch)
+            by stats window, repository and stats key
+        """
+
+        consecutive_stats = {window: {} for window in stats_windows}
+
+        widest_cutoff_datetime = min(
+            cutoff_datetime for cutoff_datetime, _ in stats_windows.values()
+        )
+        result = session.execute(
+            select(
+                GithubEvent.repository,
+                GithubEvent.type,
+                # created_at is stored without timezone in UTC
+                cast(extract("epoch", GithubEvent.created_at), Float),
+            )
+            .where(
+                GithubEvent.created_at >= widest_cutoff_datetime,
+                GithubEvent.repository.in_(
+                    self._config.GITHUB_REPOSITORIES
+                    if repositories is None
+                    else repositories
+                ),
+            )
+            .order_by(GithubEvent.created_at)
+            # streamed by a server-side cursor, rows of a batch are dropped once they're in the arrays
+            .execution_options(
+                stream_results=True, yield_per=self._config.AGGREGATOR_FETCH_BATCH_SIZE
+            )
+        )
+
+        repository_code_map = defaultdict(itertools.count().__next__)
+        event_type_code_map = defaultdict(itertools.count().__next__)
+        repository_chunks, event_type_chunks, timestamp_chunks = [], [], []
+        for rows in result.partitions():
+            repository_chunks.append(
+                self._encode(
+                    map(operator.itemgetter(0), rows), len(rows), repository_code_map
+                )
+            )
+            event_type_chunks.append(
+                self._encode(
+                    map(operator.itemgetter(1), rows), len(rows), event_type_code_map
+                )
+            )
+            timestamp_chunks.append(
+                np.fromiter(
+                    map(operator.itemgetter(2), rows), dtype=np.float64, count=len(rows)
+                )
+            )
+
+        observe_refresh_rows(sum(map(len, timestamp_chunks)))
+        if not timestamp_chunks:
+            return consecutive_stats
+
+        repository_codes = np.concatenate(repository_chunks)
+        event_type_codes = np.concatenate(event_type_chunks)
+        timestamps = np.concatenate(timestamp_chunks)
+        repository_names = list(repository_code_map)
+        event_type_names = list(event_type_code_map)
+
+        event_group_codes = repository_codes * len(event_type_names) + event_type_codes
+
+        for window, (cutoff_datetime, max_events) in stats_windows.items():
+            # events are ordered by time, so the events of a stats window are their newest slice
+            window_start = np.searchsorted(timestamps, cutoff_datetime.timestamp())
+            if window_start == len(timestamps):
+                continue
+            window_stats = consecutive_stats[window]
+
+            group_stats = self._group_gap_stats(
+                repository_codes[window_start:], timestamps[window_start:], max_events
+            )
+            for code, gap_sum, events, sketch in zip(*group_stats):
+                window_stats.setdefault(repository_names[code], {})["all"] = (
+                    float(gap_sum),
+                    int(events),
+                    sketch,
+                )
+
+            group_stats = self._group_gap_stats(
+                event_group_codes[window_start:], timestamps[window_start:], max_events
+            )
+            for code, gap_sum, events, sketch in zip(*group_stats):
+                repository_code, event_type_code = divmod(code, len(event_type_names))
+                window_stats[repository_names[repository_code]][
+                    event_type_names[event_type_code]
+                ] = (float(gap_sum), int(events), sketch)
+
+        return consecutive_stats
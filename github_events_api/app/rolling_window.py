@@ -0,0 +1,100 @@
+
+import math
+from collections import deque
+
+from app.gap_sketch import GapSketch
+
+
+class RollingWindow:
+    """
+    Rolling window of event times for a single repository and stats key (event type or "all").
+
+    Keeps at most max_events newest events, or all of them without max_events. The sum of the consecutive
+    times between events telescopes to the time between the newest and the oldest event, so it's available
+    without iterating the events.
+    Distribution of the consecutive times is kept in a sketch, which is updated as events come and go.
+    The times leave the window oldest first, so its exact minimum and maximum are kept in monotonic queues, the
+    candidates to become the extreme once the older times leave, and set to the sketch.
+    """
+
+    __slots__ = ("_timestamps", "_max_events", "sketch", "_min_gaps", "_max_gaps")
+
+    def __init__(self, max_events: int | None, relative_accuracy: float = 0.01):
+        self._timestamps: deque[float] = deque()
+        self._max_events = max_events
+        self.sketch = GapSketch(relative_accuracy)
+        # increasing and decreasing consecutive times from the oldest, the first ones are the extremes
+        self._min_gaps: deque[float] = deque()
+        self._max_gaps: deque[float] = deque()
+
+    @property
+    def total_events(self) -> int:
+        return len(self._timestamps)
+
+    @property
+    def gap_sum(self) -> float:
+        if len(self._timestamps) < 2:
+            return 0.0
+        return self._timestamps[-1] - self._timestamps[0]
+
+    @property
+    def last_timestamp(self) -> float | None:
+        return self._timestamps[-1] if self._timestamps else None
+
+    def get_average(self) -> float:
+        if len(self._timestamps) < 2:
+            return 0.0
+        return self.gap_sum / (len(self._timestamps) - 1)
+
+    def append(self, timestamp: float):
+        """
+        Adds the newest event, the oldest one is dropped once the window holds more than max_events events.
+
+        :param timestamp: event creation as a unix timestamp, mustn't be older than the last added event
+        """
+
+        if self._timestamps:
+            self._add_gap(timestamp - self._timestamps[-1])
+        self._timestamps.append(timestamp)
+
+        if self._max_events is not None and len(self._timestamps) > self._max_events:
+            self._pop_oldest()
+
+    def _add_gap(self, gap: float):
+        # counted without the extremes of the sketch, they're set from the queues
+        sketch = self.sketch
+        sketch.add_bucket(sketch.get_bucket(gap) if gap > 0 else None)
+        min_gaps, max_gaps = self._min_gaps, self._max_gaps
+        while min_gaps and min_gaps[-1] > gap:
+            min_gaps.pop()
+        min_gaps.append(gap)
+        while max_gaps and max_gaps[-1] < gap:
+            max_gaps.pop()
+        max_gaps.append(gap)
+        sketch.min, sketch.max = min_gaps[0], max_gaps[0]
+
+    def _remove_oldest_gap(self, gap: float):
+        sketch = self.sketch
+        sketch.add_bucket(sketch.get_bucket(gap) if gap > 0 else None, -1)
+        min_gaps, max_gaps = self._min_gaps, self._max_gaps
+        if min_gaps[0] == gap:
+            min_gaps.popleft()
+        if max_gaps[0] == gap:
+            max_gaps.popleft()
+        sketch.min = min_gaps[0] if min_gaps else math.inf
+        sketch.max = max_gaps[0] if max_gaps else -math.inf
+
+    def _pop_oldest(self):
+        oldest_timestamp = self._timestamps.popleft()
+        if self._timestamps:
+            self._remove_oldest_gap(self._timestamps[0] - oldest_timestamp)
+
+    def expire(self, cutoff_timestamp: float):
+        """
+        Drops events that slid out of the rolling time window.
+
+        :param cutoff_timestamp: events created before this unix timestamp are dropped
+        """
+
+        while self._timestamps and self._timestamps[0] < cutoff_timestamp:
+            self._pop_oldest()
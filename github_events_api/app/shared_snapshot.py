@@ -0,0 +1,97 @@
+
+import fcntl
+import mmap
+import os
+import tempfile
+
+import orjson
+
+from app.stats_snapshot import StatsSnapshot
+
+
+class SharedSnapshot:
+    """
+    Stats snapshot shared by API workers through a file, so only one of them refreshes the stats from database.
+
+    The worker holding the lock file is the leader, it publishes its snapshots by atomically replacing the file.
+    The other workers reload the file whenever it's replaced. The lock is released by the OS when the leader
+    exits, so another worker takes over the refresh.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: snapshot file path, the lock file is next to it with .lock suffix
+        """
+
+        self._path = path
+        self._lock_fd: int | None = None
+        self.is_leader = False
+        # file identity of the last loaded snapshot, changes with every publish
+        self._loaded_version: tuple[int, int, int] | None = None
+
+    def try_acquire_leadership(self) -> bool:
+        """
+        :return: whether this worker is the leader, the lock is only tried, never waited for
+        """
+
+        if self.is_leader:
+            return True
+
+        if self._lock_fd is None:
+            # opened lazily, so only workers that run the refresh loop open it
+            self._lock_fd = os.open(f"{self._path}.lock", os.O_RDWR | os.O_CREAT)
+
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+
+        self.is_leader = True
+        return True
+
+    def publish(self, snapshot: StatsSnapshot):
+        content = orjson.dumps(
+            {"stats": snapshot.stats, "last_refresh": snapshot.last_refresh}
+        )
+
+        # written next to the snapshot and renamed over it, so readers never see a partial file
+        fd, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self._path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(content)
+            os.replace(temporary_path, self._path)
+        except Exception:
+            os.unlink(temporary_path)
+            raise
+
+    def load_if_changed(self) -> StatsSnapshot | None:
+        """
+        :return: snapshot published since the last load, None if there is no new one
+        """
+
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return None
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._loaded_version or stat.st_size == 0:
+            return None
+
+        with open(self._path, "rb") as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                with memoryview(mapped_file) as view:
+                    content = orjson.loads(view)
+
+        self._loaded_version = version
+        return StatsSnapshot(
+            cached_stats=content["stats"], last_refresh=content["last_refresh"]
+        )
+
+    def close(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.is_leader = False
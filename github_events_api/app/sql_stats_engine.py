@@ -0,0 +1,198 @@
+
+import datetime
+from collections import defaultdict
+
+from sqlalchemy import CTE, Float, case, cast, extract, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+
+from shared_resources.github_event import GithubEvent
+from shared_resources.database_utils import postgre_session
+from app.config import Config
+from app.gap_sketch import GapSketch
+from app.metrics import observe_refresh_rows
+
+
+class SqlStatsEngine:
+    """
+    Calculates consecutive event stats inside the database with window functions, so only one row per
+    repository and stats key is fetched instead of every event in the rolling window.
+    """
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+
+    def _gap_stats_query(
+        self,
+        ranked_events: CTE,
+        stats_key: str,
+        window: str,
+        cutoff_datetime: datetime.datetime,
+        max_events: int | None,
+    ):
+        """
+        Sums consecutive times between the newest max_events events of each repository and stats key in
+        the stats window, and counts them, per sketch bucket of the consecutive time. Zero consecutive times,
+        and the oldest event without one, are in the null bucket.
+
+        :param ranked_events: events in the widest window ranked from the newest, per repo + type and per repo
+        :param stats_key: "all" for stats across all event types, "type" for stats per event type
+        :param window: name of the stats window
+        :param cutoff_datetime: oldest event creation time of the stats window
+        :param max_events: maximum number of newest events in the stats window, None for no limit
+        """
+
+        if stats_key == "all":
+            partition_by = [ranked_events.c.repository]
+            rank_column = ranked_events.c.all_rank
+            stats_key_column = literal("all")
+        else:
+            partition_by = [ranked_events.c.repository, ranked_events.c.type]
+            rank_column = ranked_events.c.type_rank
+            stats_key_column = ranked_events.c.type
+
+        # newer events are ranked first, so the rank is the same within any narrower time window
+        conditions = [ranked_events.c.created_at >= cutoff_datetime]
+        if max_events is not None:
+            conditions.append(rank_column <= max_events)
+
+        event_time = extract("epoch", ranked_events.c.created_at)
+        # lag is calculated after the where clause, so the oldest kept event has no consecutive time
+        gaps = (
+            select(
+                literal(window).label("window"),
+                ranked_events.c.repository,
+                stats_key_column.label("stats_key"),
+                (
+                    event_time
+                    - func.lag(event_time).over(
+                        partition_by=partition_by,
+                        order_by=ranked_events.c.created_at,
+                    )
+                ).label("gap"),
+            )
+            .where(*conditions)
+            .subquery()
+        )
+
+        log_gamma = GapSketch.get_log_gamma(self._config.AGGREGATOR_SKETCH_ACCURACY)
+        bucket = case(
+            (
+                gaps.c.gap > 0,
+                func.ceil(func.ln(cast(gaps.c.gap, Float)) / log_gamma),
+            )
+        ).label("bucket")
+
+        return select(
+            gaps.c.window,
+            gaps.c.repository,
+            gaps.c.stats_key,
+            bucket,
+            func.coalesce(func.sum(gaps.c.gap), 0).label("gap_sum"),
+            func.count(gaps.c.gap).label("gaps"),
+            func.count().label("total_events"),
+            func.min(gaps.c.gap).label("min_gap"),
+            func.max(gaps.c.gap).label("max_gap"),
+        ).group_by(gaps.c.window, gaps.c.repository, gaps.c.stats_key, bucket)
+
+    @postgre_session
+    def fetch_consecutive_stats(
+        self,
+        session: Session,
+        stats_windows: dict[str, tuple[datetime.datetime, int | None]],
+        repositories: list[str] | None = None,
+    ) -> dict[str, dict[str, dict[str, tuple[float, int, GapSketch]]]]:
+        """
+        Fetches the sum of consecutive times between events, their amount and sketch for configured repositories,
+        grouped by event repo and event type, and also across all event types under the "all" key.
+
+        The stats are calculated for every stats window from a single scan of the events of the widest one.
+
+        :param session: postgre session injected by decorator
+        :param stats_windows: oldest event creation time and maximum number of newest events (None for no limit)
+            by stats window name
+        :param repositories: repositories to fetch, all configured repositories by default
+        :return: (consecutive times sum in seconds, number of events, consecutive times sketch)
+            by stats window, repository and stats key
+        """
+
+        widest_cutoff_datetime = min(
+            cutoff_datetime for cutoff_datetime, _ in stats_windows.values()
+        )
+        ranked_events = (
+            select(
+                GithubEvent.repository,
+                GithubEvent.type,
+                GithubEvent.created_at,
+                func.row_number()
+                .over(
+                    partition_by=[GithubEvent.repository, GithubEvent.type],
+                    order_by=GithubEvent.created_at.desc(),
+                )
+                .label("type_rank"),
+                func.row_number()
+                .over(
+                    partition_by=GithubEvent.repository,
+                    order_by=GithubEvent.created_at.desc(),
+                )
+                .label("all_rank"),
+            ).where(
+                GithubEvent.created_at >= widest_cutoff_datetime,
+                GithubEvent.repository.in_(
+                    self._config.GITHUB_REPOSITORIES
+                    if repositories is None
+                    else repositories
+                ),
+            )
+            # referenced by all stats queries, but scanned only once
+            .cte("ranked_events")
+        )
+
+        stats_query = union_all(
+            *(
+                self._gap_stats_query(
+                    ranked_events, stats_key, window, cutoff_datetime, max_events
+                )
+                for window, (cutoff_datetime, max_events) in stats_windows.items()
+                for stats_key in ("all", "type")
+            )
+        )
+
+        gap_sums = defaultdict(float)
+        event_counts = defaultdict(int)
+        sketches = {}
+        fetched_rows = 0
+        for (
+            window,
+            repository,
+            stats_key,
+            bucket,
+            gap_sum,
+            gaps,
+            total_events,
+            min_gap,
+            max_gap,
+        ) in session.execute(stats_query):
+            fetched_rows += 1
+            group = window, repository, stats_key
+            if group not in sketches:
+                sketches[group] = GapSketch(self._config.AGGREGATOR_SKETCH_ACCURACY)
+
+            gap_sums[group] += float(gap_sum)
+            event_counts[group] += total_events
+            sketches[group].add_bucket(None if bucket is None else int(bucket), gaps)
+            if gaps:
+                sketches[group].add_extremes(float(min_gap), float(max_gap))
+
+        observe_refresh_rows(fetched_rows)
+
+        consecutive_stats = {window: defaultdict(dict) for window in stats_windows}
+        for (window, repository, stats_key), sketch in sketches.items():
+            consecutive_stats[window][repository][stats_key] = (
+                gap_sums[window, repository, stats_key],
+                event_counts[window, repository, stats_key],
+                sketch,
+            )
+
+        return consecutive_stats
@@ -4,18 +4,33 @@ import traceback
 import logging
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import asyncio
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 from sqlalchemy.engine import Engine
 
 from shared_resources.github_event import GithubEvent
 from shared_resources.database_utils import postgre_session
 from shared_resources.helpers import time_response
-from app.config import Config
+from app.config import Config, ConfigError
+from app.rolling_window import RollingWindow
+from app.stats_window import StatsWindow
+from app.sql_stats_engine import SqlStatsEngine
+from app.numpy_stats_engine import NumpyStatsEngine
+from app.stats_snapshot import StatsSnapshot, PERCENTILE_FIELDS
+from app.shared_snapshot import SharedSnapshot
+from app.event_listener import EventListener
+from app import metrics
+from app.gap_sketch import GapSketch
+
+HighWaterMarks = dict[str, tuple[datetime.datetime, set[str]]]
 
 
 class StatsAggregator:
+    ENGINES = ("python", "sql", "numpy")
+
     _instance = None
 
     # making it a singleton
@@ -28,119 +43,502 @@ class StatsAggregator:
         if getattr(self, "_initialized", False):
             return
 
+        if config.AGGREGATOR_ENGINE not in self.ENGINES:
+            raise ConfigError(
+                f"Aggregator engine must be one of {self.ENGINES}, got: {config.AGGREGATOR_ENGINE}"
+            )
+
         self._task_started = False
         self._config = config
+        # stats windows by name, the first one is used when no window is requested
+        self.stats_windows = {
+            stats_window.name: stats_window
+            for stats_window in StatsWindow.from_config(config)
+        }
+        self.default_window = next(iter(self.stats_windows))
         self.db_engine = db_engine
-        self.cached_stats = defaultdict(dict)
-        self.lock = asyncio.Lock()
-        self._last_updated: datetime.datetime | None = None
+        self._stats_engines = {
+            "sql": SqlStatsEngine(config=config, db_engine=db_engine),
+            "numpy": NumpyStatsEngine(config=config, db_engine=db_engine),
+        }
+        # replaced as a whole on every refresh, so endpoints can read it without a lock
+        self.snapshot = StatsSnapshot(
+            cached_stats={window: {} for window in self.stats_windows},
+            last_refresh=None,
+        )
 
-    def get_event_cutoff_datetime(self) -> datetime.datetime:
-        return datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
-            days=self._config.AGGREGATOR_ROLLING_DAYS
+        # database fetch is blocking, it runs in its own thread to not stall the endpoints
+        self._refresh_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="stats_refresh"
+        )
+        self._refresh_future: asyncio.Future | None = None
+
+        # with multiple API workers, only the leader refreshes stats, the others load its snapshot
+        self._shared_snapshot = (
+            SharedSnapshot(config.AGGREGATOR_SHARED_SNAPSHOT_PATH)
+            if config.AGGREGATOR_SHARED_SNAPSHOT_PATH
+            else None
+        )
+
+        # refreshes stats of repositories the scraper notified about, instead of waiting for the next refresh
+        self._event_listener = (
+            EventListener(config=config, db_engine=db_engine)
+            if config.AGGREGATOR_LISTEN
+            else None
         )
 
+        # incremental refresh state, rolling windows by stats window, repository and stats key
+        self._windows: dict[str, defaultdict[str, dict[str, RollingWindow]]] = {
+            window: defaultdict(dict) for window in self.stats_windows
+        }
+        # repository -> creation time of its last fetched event and ids of its events created then, repositories are
+        # scraped at different times, so an event of one may be inserted older than the last event of another
+        self._high_water_marks: HighWaterMarks | None = None
+        self._refreshes_since_full_scan = 0
+
+    def get_event_cutoff_datetimes(self) -> dict[str, datetime.datetime]:
+        """
+        :return: oldest event creation time used for stats, by stats window
+        """
+
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        return {
+            window: stats_window.get_cutoff_datetime(now)
+            for window, stats_window in self.stats_windows.items()
+        }
+
+    def get_event_cutoff_datetime(self) -> datetime.datetime:
+        """
+        :return: oldest event creation time used by any stats window
+        """
+
+        return min(self.get_event_cutoff_datetimes().values())
+
+    @property
+    def cached_stats(self) -> dict[str, dict[str, dict]]:
+        return self.snapshot.stats[self.default_window]
+
     async def get_last_updated(self) -> str:
-        async with self.lock:
-            return (
-                self._last_updated.isoformat(timespec="seconds") + "Z"
-                if self._last_updated
-                else None
-            )
+        return self.snapshot.last_refresh
+
+    def _is_incremental_refresh(self) -> bool:
+        """
+        Incremental refresh needs the state of a previous refresh. Full scan is still done every
+        AGGREGATOR_FULL_REFRESH_INTERVAL refreshes to pick up events inserted out of created_at order.
+        """
+
+        return (
+            self._config.AGGREGATOR_INCREMENTAL
+            and self._high_water_marks is not None
+            and self._refreshes_since_full_scan
+            < self._config.AGGREGATOR_FULL_REFRESH_INTERVAL
+        )
 
     @postgre_session
     def _fetch_consecutive_event_times(
-        self, session: Session
-    ) -> defaultdict[str, dict[str, list[float]]]:
+        self,
+        session: Session,
+        incremental: bool = False,
+        repositories: list[str] | None = None,
+    ) -> dict[str, defaultdict[str, dict[str, RollingWindow]]]:
         """
-        Fetches all events not older than AGGREGATOR_ROLLING_DAYS config. Groups them by event repo and event type,
-        calculates and returns the consecutive times between events.
+        Fetches all events not older than the widest stats window in one ordered scan. Groups them by event repo
+        and event type into rolling windows of consecutive event times, for every stats window the event is in.
+
+        The rolling windows don't hold more than max_events newest events of their stats window.
 
-        Doesn't return more than AGGREGATOR_ROLLING_EVENTS config.
+        In incremental mode only events of every repository not older than its last fetched event are read and
+        appended to the windows of the previous fetch, events that slid out of their stats window are expired.
 
         :param session: postgre session injected by decorator
+        :param incremental: update windows of the previous fetch instead of scanning the whole rolling window
+        :param repositories: scan only events of these repositories, the incremental state is left untouched
         """
 
+        cutoff_datetimes = self.get_event_cutoff_datetimes()
+        cutoff_datetime = min(cutoff_datetimes.values())
+        cutoff_timestamps = {
+            window: window_cutoff.timestamp()
+            for window, window_cutoff in cutoff_datetimes.items()
+        }
+
+        if incremental:
+            windows = self._windows
+            high_water_marks = self._high_water_marks
+            # windows are updated in place, force a full scan next time if this fetch fails halfway
+            self._high_water_marks = None
+            # repositories without fetched events yet are read from the cutoff
+            fetch_condition = or_(
+                GithubEvent.repository.not_in(list(high_water_marks)),
+                *(
+                    and_(
+                        GithubEvent.repository == repository,
+                        GithubEvent.created_at >= last_created_at,
+                    )
+                    for repository, (last_created_at, _) in high_water_marks.items()
+                ),
+            )
+        else:
+            windows = {window: defaultdict(dict) for window in self.stats_windows}
+            high_water_marks = {}
+            fetch_condition = None
+
+        # only the needed columns, without ORM entities, streamed by a server-side cursor in batches
         event_query = (
-            session.query(GithubEvent)
-            .filter(GithubEvent.created_at >= self.get_event_cutoff_datetime())
+            select(
+                GithubEvent.id,
+                GithubEvent.repository,
+                GithubEvent.type,
+                GithubEvent.created_at,
+            )
+            .where(GithubEvent.created_at >= cutoff_datetime)
             .order_by(GithubEvent.created_at)
+            .execution_options(
+                stream_results=True,
+                yield_per=self._config.AGGREGATOR_FETCH_BATCH_SIZE,
+            )
         )
+        if fetch_condition is not None:
+            event_query = event_query.where(fetch_condition)
+        if repositories is not None:
+            event_query = event_query.where(GithubEvent.repository.in_(repositories))
 
-        last_datetimes = defaultdict(dict)
-        sums_for_avg = defaultdict(dict)
-
-        # avoid memory issues in case events contained a lot of info
-        for event in event_query.yield_per(100):
-            repository = event.repository
-            created_at: datetime.datetime = event.created_at.replace(
-                tzinfo=datetime.timezone.utc
-            )
-            event_type = event.type
+        fetched_rows = 0
+        for event_id, repository, event_type, created_at in session.execute(
+            event_query
+        ):
+            fetched_rows += 1
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
 
-            # already past 7 days
-            if created_at < self.get_event_cutoff_datetime():
+            # already past the widest stats window
+            if created_at < cutoff_datetime:
                 break
 
-            for stats_key in "all", event_type:
-                # we already did 500 events
-                if (
-                    stats_key in sums_for_avg[repository]
-                    and len(sums_for_avg[repository][stats_key]) + 1
-                    >= self._config.AGGREGATOR_ROLLING_EVENTS
-                ):
+            # events created in the same second as the last fetched event could have been fetched already
+            last_created_at, last_created_at_ids = high_water_marks.get(
+                repository, (None, None)
+            )
+            if created_at == last_created_at:
+                if event_id in last_created_at_ids:
+                    continue
+                last_created_at_ids.add(event_id)
+            else:
+                high_water_marks[repository] = created_at, {event_id}
+
+            created_at_timestamp = created_at.timestamp()
+            for window, window_cutoff_timestamp in cutoff_timestamps.items():
+                if created_at_timestamp < window_cutoff_timestamp:
                     continue
 
-                if stats_key in last_datetimes[repository]:
-                    consecutive_action_time = (
-                        created_at - last_datetimes[repository][stats_key]
+                repository_windows = windows[window][repository]
+                for stats_key in "all", event_type:
+                    if stats_key not in repository_windows:
+                        repository_windows[stats_key] = RollingWindow(
+                            self.stats_windows[window].max_events,
+                            self._config.AGGREGATOR_SKETCH_ACCURACY,
+                        )
+                    repository_windows[stats_key].append(created_at_timestamp)
+
+        metrics.observe_refresh_rows(fetched_rows)
+
+        # windows of some repositories only can't continue incrementally
+        if repositories is not None:
+            return windows
+
+        if incremental:
+            for window, window_cutoff_timestamp in cutoff_timestamps.items():
+                self._expire_windows(windows[window], window_cutoff_timestamp)
+            self._refreshes_since_full_scan += 1
+        else:
+            self._refreshes_since_full_scan = 0
+
+        self._windows = windows
+        self._high_water_marks = high_water_marks
+
+        return windows
+
+    @staticmethod
+    def _expire_windows(
+        windows: defaultdict[str, dict[str, RollingWindow]], cutoff_timestamp: float
+    ):
+        for repository in list(windows):
+            for stats_key in list(windows[repository]):
+                windows[repository][stats_key].expire(cutoff_timestamp)
+                if windows[repository][stats_key].total_events == 0:
+                    del windows[repository][stats_key]
+
+            if not windows[repository]:
+                del windows[repository]
+
+    def _fetch_consecutive_stats(
+        self, repositories: list[str] | None = None
+    ) -> dict[str, dict[str, dict[str, tuple[float, int, GapSketch]]]]:
+        """
+        Fetches consecutive stats of all stats windows with the configured AGGREGATOR_ENGINE.
+
+        :param repositories: fetch only these repositories, all configured repositories by default
+        :return: (consecutive times sum in seconds, number of events, consecutive times sketch)
+            by stats window, repository and stats key
+        """
+
+        if self._config.AGGREGATOR_ENGINE in self._stats_engines:
+            cutoff_datetimes = self.get_event_cutoff_datetimes()
+            return self._stats_engines[
+                self._config.AGGREGATOR_ENGINE
+            ].fetch_consecutive_stats(
+                stats_windows={
+                    window: (cutoff_datetimes[window], stats_window.max_events)
+                    for window, stats_window in self.stats_windows.items()
+                },
+                repositories=repositories,
+            )
+
+        windows = self._fetch_consecutive_event_times(
+            incremental=self._is_incremental_refresh(), repositories=repositories
+        )
+        return {
+            window: {
+                repository: {
+                    stats_key: (
+                        rolling_window.gap_sum,
+                        rolling_window.total_events,
+                        rolling_window.sketch,
                     )
-                    sums_for_avg[repository][stats_key].append(
-                        consecutive_action_time.total_seconds()
+                    for stats_key, rolling_window in windows[window][repository].items()
+                }
+                for repository in windows[window]
+            }
+            for window in windows
+        }
+
+    def _calculate_stats(
+        self, repositories: list[str] | None = None
+    ) -> dict[str, defaultdict[str, dict[str, dict]]]:
+        """
+        Fetches consecutive stats from database and calculates the averages of configured repositories,
+        for every stats window.
+
+        :param repositories: calculate only these repositories, all configured repositories by default
+        """
+
+        consecutive_stats = self._fetch_consecutive_stats(repositories=repositories)
+
+        return {
+            window: self._calculate_window_stats(consecutive_stats.get(window, {}))
+            for window in self.stats_windows
+        }
+
+    def _calculate_window_stats(
+        self, consecutive_stats: dict[str, dict[str, tuple[float, int, GapSketch]]]
+    ) -> defaultdict[str, dict[str, dict]]:
+        cached_stats = defaultdict(dict)
+        tracked_repositories = set(self._config.GITHUB_REPOSITORIES)
+        for repository in consecutive_stats:
+            if repository not in tracked_repositories:
+                continue
+            for stats_key, (gap_sum, total_events, sketch) in consecutive_stats[
+                repository
+            ].items():
+                consecutive_average = (
+                    gap_sum / (total_events - 1) if total_events > 1 else 0
+                )
+                cached_stats[repository][stats_key] = {
+                    "consecutive_events_average_s": round(
+                        consecutive_average, self._config.AGGREGATOR_STATS_PRECISION
+                    ),
+                    "total_events": total_events,
+                }
+                for field, quantile in PERCENTILE_FIELDS.items():
+                    cached_stats[repository][stats_key][field] = round(
+                        sketch.get_quantile(quantile),
+                        self._config.AGGREGATOR_STATS_PRECISION,
                     )
-                    last_datetimes[repository][stats_key] = created_at
-                else:
-                    last_datetimes[repository][stats_key] = created_at
-                    sums_for_avg[repository][stats_key] = []
 
-        return sums_for_avg
+        return cached_stats
+
+    def _get_refresh_scope(self, repositories: set[str] | None) -> list[str] | None:
+        """
+        :param repositories: repositories with new events, None or empty if unknown
+        :return: configured repositories to refresh, None to refresh all of them
+        """
+
+        # incremental refresh reads only the new events anyway, and keeps its state complete
+        if (
+            not repositories
+            or not self.snapshot.last_refresh
+            or (
+                self._config.AGGREGATOR_ENGINE not in self._stats_engines
+                and self._is_incremental_refresh()
+            )
+        ):
+            return None
 
-    async def _refresh_stats(self):
+        return [
+            repository
+            for repository in self._config.GITHUB_REPOSITORIES
+            if repository in repositories
+        ]
+
+    def _create_snapshot(self, repositories: set[str] | None = None) -> StatsSnapshot:
         """
-        Refresh consecutive stats from database and store them to self.cached_stats.
+        :param repositories: recalculate only these repositories and keep the others from the current snapshot,
+            None to recalculate all of them
         """
 
-        consecutive_sums = self._fetch_consecutive_event_times()
+        refresh_start = time.perf_counter()
+        refresh_scope = self._get_refresh_scope(repositories)
+        if refresh_scope is None:
+            cached_stats = self._calculate_stats()
+        else:
+            cached_stats = self._calculate_stats(repositories=refresh_scope)
+            # looked up for every repository of every window
+            refreshed_repositories = set(refresh_scope)
+            for window, window_stats in self.snapshot.stats.items():
+                for repository, repository_stats in window_stats.items():
+                    if repository not in refreshed_repositories:
+                        cached_stats[window][repository] = repository_stats
+        last_updated = datetime.datetime.now(tz=datetime.timezone.utc)
+        snapshot = StatsSnapshot(
+            cached_stats=cached_stats,
+            last_refresh=last_updated.isoformat(timespec="seconds") + "Z",
+        )
 
-        async with self.lock:
-            for repository in consecutive_sums:
-                if repository not in self._config.GITHUB_REPOSITORIES:
-                    continue
-                for stats_key in consecutive_sums[repository]:
-                    if len(consecutive_sums[repository][stats_key]) == 0:
-                        consecutive_average = 0
-                    else:
-                        consecutive_average = sum(
-                            consecutive_sums[repository][stats_key]
-                        ) / len(consecutive_sums[repository][stats_key])
-
-                    self.cached_stats[repository][stats_key] = {
-                        "consecutive_events_average_s": round(
-                            consecutive_average, self._config.AGGREGATOR_STATS_PRECISION
-                        ),
-                        "total_events": len(consecutive_sums[repository][stats_key])
-                        + 1,
-                    }
-
-            self._last_updated = datetime.datetime.now(tz=datetime.timezone.utc)
-            logging.info(
-                f"Successfully refreshed statistics, repositories: {len(self.cached_stats)}"
+        if self._shared_snapshot:
+            self._shared_snapshot.publish(snapshot)
+
+        refresh_duration = (
+            metrics.FULL_REFRESH_DURATION
+            if refresh_scope is None
+            else metrics.REPOSITORIES_REFRESH_DURATION
+        )
+        refresh_duration.observe(time.perf_counter() - refresh_start)
+        return snapshot
+
+    async def _refresh_stats(self, repositories: set[str] | None = None):
+        """
+        Refresh consecutive stats from database and publish them as a new self.snapshot.
+
+        Stats are calculated in the refresh thread, the event loop only waits for them up to
+        AGGREGATOR_REFRESH_TIMEOUT seconds. A refresh that timed out keeps running in the background,
+        and new refreshes are skipped until it finishes.
+
+        :param repositories: refresh only these repositories, None to refresh all of them
+        """
+
+        if self._refresh_future and not self._refresh_future.done():
+            logging.warning(
+                "Previous statistics refresh is still running, skipping refresh."
             )
+            metrics.SKIPPED_REFRESHES.inc()
+            return
+
+        self._refresh_future = asyncio.get_running_loop().run_in_executor(
+            self._refresh_executor, self._create_snapshot, repositories
+        )
+
+        try:
+            # shielded, so the timeout doesn't mark the still running refresh as done
+            snapshot = await asyncio.wait_for(
+                asyncio.shield(self._refresh_future),
+                timeout=self._config.AGGREGATOR_REFRESH_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            logging.error(
+                f"Statistics refresh didn't finish in {self._config.AGGREGATOR_REFRESH_TIMEOUT}s, "
+                f"keeping previous statistics."
+            )
+            metrics.TIMED_OUT_REFRESHES.inc()
+            return
+
+        self.snapshot = snapshot
+        logging.info(
+            f"Successfully refreshed statistics, repositories: {len(snapshot.stats[self.default_window])}"
+        )
+
+    async def _load_shared_snapshot(self):
+        """
+        Replaces self.snapshot with the snapshot published by the leader worker, if there is a new one.
+        """
+
+        snapshot = await asyncio.get_running_loop().run_in_executor(
+            self._refresh_executor, self._shared_snapshot.load_if_changed
+        )
+        if snapshot:
+            self.snapshot = snapshot
+            logging.info(f"Loaded statistics of the leader worker.")
+
+    async def _update_snapshot(
+        self, repositories: set[str] | None = None
+    ) -> int | float:
+        """
+        Refreshes stats if this worker is the leader (or the only one), otherwise loads the leader's snapshot.
+
+        :param repositories: refresh only these repositories, None to refresh all of them
+        :return: seconds until the next update
+        """
+
+        if self._shared_snapshot is None:
+            await self._refresh_stats(repositories)
+            return self._config.AGGREGATOR_BACKGROUND_REFRESH
+
+        was_leader = self._shared_snapshot.is_leader
+        with metrics.LEADER_LOCK_WAIT.time():
+            is_leader = self._shared_snapshot.try_acquire_leadership()
+        if is_leader:
+            if not was_leader:
+                logging.info(f"Worker became the statistics refresh leader.")
+                # a snapshot loaded from the previous leader could be behind, refresh everything
+                repositories = None
+            await self._refresh_stats(repositories)
+            return self._config.AGGREGATOR_BACKGROUND_REFRESH
+
+        await self._load_shared_snapshot()
+        return self._config.AGGREGATOR_SHARED_SNAPSHOT_POLL
+
+    async def _wait_for_refresh(self, timeout: float) -> set[str] | None:
+        """
+        Waits until the next refresh. With AGGREGATOR_LISTEN, the refreshing worker wakes up earlier when the scraper
+        notifies about inserted events, and waits AGGREGATOR_LISTEN_DEBOUNCE seconds to collect the notifications
+        of the following inserts too.
+
+        :param timeout: seconds until the next refresh without notifications
+        :return: repositories of the notified events, None if the whole snapshot should be refreshed
+        """
+
+        is_refreshing = self._shared_snapshot is None or self._shared_snapshot.is_leader
+        if (
+            self._event_listener is None
+            or not is_refreshing
+            or not self._event_listener.start()
+        ):
+            await asyncio.sleep(timeout)
+            return None
+
+        notification = await self._event_listener.wait(timeout)
+        if notification is None:
+            return None
+
+        await asyncio.sleep(self._config.AGGREGATOR_LISTEN_DEBOUNCE)
+        repositories = set()
+        for payload in [notification] + self._event_listener.drain():
+            # too many repositories for the notification payload
+            if payload.get("repositories") is None:
+                logging.info("Inserted events notified, refreshing all repositories")
+                return None
+            repositories.update(payload["repositories"])
+
+        logging.info(
+            f"Inserted events notified, refreshing repositories: {sorted(repositories)}"
+        )
+        return repositories
 
     async def start_refresh(self):
         """
-        Continually refresh consecutive stats from database and store them to self.cached_stats every
-        AGGREGATOR_BACKGROUND_REFRESH seconds.
+        Continually refresh consecutive stats from database and publish them as self.snapshot every
+        AGGREGATOR_BACKGROUND_REFRESH seconds. With AGGREGATOR_SHARED_SNAPSHOT_PATH, workers that aren't
+        the leader check for the leader's snapshot every AGGREGATOR_SHARED_SNAPSHOT_POLL seconds instead.
+        With AGGREGATOR_LISTEN, repositories with inserted events are refreshed as soon as they're notified,
+        AGGREGATOR_BACKGROUND_REFRESH is then the fallback interval of the full refresh.
         """
 
         if self._task_started:
@@ -151,19 +549,24 @@ class StatsAggregator:
 
         self._task_started = True
         logging.info(f"Statistics refresh task started.")
+        repositories = None
+        full_update_start = time.time()
         while True:
             loop_start = time.time()
+            update_interval = self._config.AGGREGATOR_BACKGROUND_REFRESH
 
             try:
-                await self._refresh_stats()
+                update_interval = await self._update_snapshot(repositories)
             except Exception as e:
                 logging.error(
                     f"There was an error in the main loop, ERROR: {e}, traceback: {traceback.format_exc()}"
                 )
 
-            loop_took = time_response(loop_start)
+            # notified refreshes don't postpone the full one
+            if repositories is None:
+                full_update_start = loop_start
+            full_update_took = time_response(full_update_start)
 
-            if loop_took < self._config.AGGREGATOR_BACKGROUND_REFRESH:
-                await asyncio.sleep(
-                    self._config.AGGREGATOR_BACKGROUND_REFRESH - loop_took + 0.01
-                )
+            repositories = await self._wait_for_refresh(
+                max(update_interval - full_update_took + 0.01, 0)
+            )
@@ -0,0 +1,72 @@
+
+import datetime
+
+from app.config import Config, ConfigError
+
+
+class StatsWindow:
+    """
+    Rolling window definition the stats are calculated over, bounded by time and optionally by the amount
+    of newest events.
+    """
+
+    __slots__ = ("name", "duration", "max_events")
+
+    def __init__(self, name: str, duration: datetime.timedelta, max_events: int | None):
+        self.name = name
+        self.duration = duration
+        self.max_events = max_events
+
+    def get_cutoff_datetime(self, now: datetime.datetime) -> datetime.datetime:
+        return now - self.duration
+
+    def __repr__(self):
+        return f"StatsWindow(name={self.name!r}, duration={self.duration}, max_events={self.max_events})"
+
+    @classmethod
+    def from_config(cls, config: Config) -> list["StatsWindow"]:
+        """
+        Parses AGGREGATOR_WINDOWS config, e.g. {"1h": {"hours": 1}, "7d": {"days": 7, "events": 500}}.
+        Windows without "days" and "hours" are bounded by AGGREGATOR_ROLLING_DAYS, windows without "events"
+        by time only. Without any windows configured, a single "default" window of AGGREGATOR_ROLLING_DAYS
+        and AGGREGATOR_ROLLING_EVENTS is used.
+
+        :return: windows in the configured order, the first one is the default
+        """
+
+        if not config.AGGREGATOR_WINDOWS:
+            return [
+                cls(
+                    "default",
+                    datetime.timedelta(days=config.AGGREGATOR_ROLLING_DAYS),
+                    config.AGGREGATOR_ROLLING_EVENTS,
+                )
+            ]
+
+        stats_windows = []
+        for name, definition in config.AGGREGATOR_WINDOWS.items():
+            unknown_fields = set(definition) - {"days", "hours", "events"}
+            if unknown_fields:
+                raise ConfigError(
+                    f"Unknown fields {sorted(unknown_fields)} of aggregator window {name}, "
+                    f"allowed fields are days, hours and events"
+                )
+
+            if "days" in definition or "hours" in definition:
+                duration = datetime.timedelta(
+                    days=definition.get("days", 0), hours=definition.get("hours", 0)
+                )
+            else:
+                duration = datetime.timedelta(days=config.AGGREGATOR_ROLLING_DAYS)
+            max_events = definition.get("events")
+
+            if duration <= datetime.timedelta(0) or (
+                max_events is not None and max_events < 1
+            ):
+                raise ConfigError(
+                    f"Aggregator window {name} must span positive time and events, got: {definition}"
+                )
+
+            stats_windows.append(cls(name, duration, max_events))
+
+        return stats_windows
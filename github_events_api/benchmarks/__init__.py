@@ -0,0 +1,5 @@
+
+import os
+
+# benchmarks generate their events into their own table, unless told otherwise
+os.environ.setdefault("DATABASE_TABLE_NAME", "benchmark_events")
@@ -0,0 +1,71 @@
+
+"""
+Runs the aggregator and API benchmarks on the same generated events and emits their results as a single JSON,
+together with the version, commit and parameters they ran with, so results of different versions can be compared.
+Run from github_events_api directory:
+
+    PYTHONPATH=.:.. python -m benchmarks --events 3000000 --repositories 50 --output results.json
+
+Without --database-url, the database from DATABASE_* environment variables is used. The events are generated into
+DATABASE_TABLE_NAME table (benchmark_events by default), which is recreated if it doesn't have --events rows.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+from pathlib import Path
+
+import toml
+from benchmarks import aggregator, api
+from benchmarks.event_generator import add_generator_arguments, prepare_events
+from sqlalchemy.engine import make_url
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_generator_arguments(parser)
+    parser.add_argument("--engines", nargs="+", default=["python", "sql", "numpy"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--output", type=Path, default=None, help="JSON file, stdout by default"
+    )
+    args = parser.parse_args()
+
+    database_url, generator = prepare_events(args)
+    results = {
+        "version": toml.load("pyproject.toml")["tool"]["poetry"]["version"],
+        "commit": get_commit(),
+        "started_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(
+            timespec="seconds"
+        ),
+        "python": platform.python_version(),
+        "database": make_url(database_url).get_backend_name(),
+        "generator": generator,
+        "aggregator": aggregator.run(database_url, args.engines, args.repeats),
+        "api": api.run(database_url, args.requests, args.concurrency),
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
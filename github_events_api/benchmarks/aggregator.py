@@ -0,0 +1,91 @@
+
+"""
+Measures how long the aggregator takes to scan the events and to refresh the stats snapshot, and its peak RSS,
+for every AGGREGATOR_ENGINE. Every engine runs in its own process. Run from github_events_api directory:
+
+    PYTHONPATH=.:.. python -m benchmarks.aggregator --events 3000000 --repositories 50
+
+Without --database-url, the database from DATABASE_* environment variables is used. The events are generated into
+DATABASE_TABLE_NAME table (benchmark_events by default), which is recreated if it doesn't have --events rows.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.event_generator import add_generator_arguments, prepare_events
+from benchmarks.helpers import get_peak_rss_mb, run_isolated, summarize_durations
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from shared_resources.github_event import GithubEvent
+
+
+def run_engine(database_url: str, engine_name: str, repeats: int) -> dict:
+    from app.config import Config
+    from app.stats_aggregator import StatsAggregator
+
+    config = Config()
+    config.AGGREGATOR_ENGINE = engine_name
+    # a refresh that timed out would keep running in the background and skew the next ones
+    config.AGGREGATOR_REFRESH_TIMEOUT = 24 * 3600
+    db_engine = create_engine(database_url)
+    aggregator = StatsAggregator(config=config, db_engine=db_engine)
+    start_rss_mb = get_peak_rss_mb()
+
+    with Session(db_engine) as session:
+        rows = session.scalar(
+            select(func.count()).where(
+                GithubEvent.created_at >= aggregator.get_event_cutoff_datetime()
+            )
+        )
+
+    result = {"engine": engine_name, "rows": rows}
+    # the raw event scan exists only in the python engine, the others scan in their fetch
+    if engine_name == "python":
+        durations = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            aggregator._fetch_consecutive_event_times()
+            durations.append(time.perf_counter() - start)
+        result["fetch_consecutive_event_times"] = summarize_durations(durations)
+
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        asyncio.run(aggregator._refresh_stats())
+        durations.append(time.perf_counter() - start)
+    result["refresh_stats"] = summarize_durations(durations)
+    result["refresh_stats"]["rows_per_second"] = round(
+        rows / result["refresh_stats"]["median_seconds"]
+    )
+
+    result["peak_rss_mb"] = get_peak_rss_mb()
+    result["peak_rss_growth_mb"] = round(result["peak_rss_mb"] - start_rss_mb, 1)
+    return result
+
+
+def run(database_url: str, engines: list[str], repeats: int) -> list[dict]:
+    return [
+        run_isolated(run_engine, database_url, engine_name, repeats)
+        for engine_name in engines
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_generator_arguments(parser)
+    parser.add_argument("--engines", nargs="+", default=["python", "sql", "numpy"])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    database_url, generator = prepare_events(args)
+    results = run(database_url, args.engines, args.repeats)
+    print(json.dumps({"generator": generator, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
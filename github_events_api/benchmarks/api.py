@@ -0,0 +1,140 @@
+
+"""
+Drives the API endpoints in-process through their ASGI app, without a server or network, and measures their
+throughput and p50/p99 latency. Stats are refreshed once from the generated events before the endpoints are driven,
+the timeseries endpoint reads the generated hourly counts. Run from github_events_api directory:
+
+    PYTHONPATH=.:.. python -m benchmarks.api --events 1000000 --requests 5000 --concurrency 16
+
+Without --database-url, the database from DATABASE_* environment variables is used. The events are generated into
+DATABASE_TABLE_NAME table (benchmark_events by default), which is recreated if it doesn't have --events rows.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import numpy as np
+from benchmarks.event_generator import add_generator_arguments, prepare_events
+from benchmarks.helpers import run_isolated
+from sqlalchemy import create_engine
+
+WARMUP_REQUESTS = 20
+
+
+def get_endpoints(repository: str) -> dict[str, str]:
+    return {
+        "health": "/health",
+        "all_stats": "/github_events/all/consecutive_stats",
+        "all_stats_percentiles": "/github_events/all/consecutive_stats?percentiles=true",
+        "repo_stats": f"/github_events/repo/{repository}/consecutive_stats",
+        "repo_stats_not_modified": f"/github_events/repo/{repository}/consecutive_stats",
+        "repo_timeseries": f"/github_events/repo/{repository}/timeseries",
+    }
+
+
+async def drive_endpoint(
+    client: httpx.AsyncClient,
+    path: str,
+    requests_count: int,
+    concurrency: int,
+    headers: dict | None = None,
+) -> dict:
+    """
+    Sends requests_count requests to the path from concurrency concurrent clients.
+
+    :return: throughput and latency percentiles of the requests
+    """
+
+    for _ in range(WARMUP_REQUESTS):
+        await client.get(path, headers=headers)
+
+    latencies = []
+    status_codes = set()
+    remaining = requests_count
+
+    async def send_requests():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            status_codes.add(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send_requests() for _ in range(concurrency)))
+    took = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": requests_count,
+        "status_codes": sorted(status_codes),
+        "requests_per_second": round(requests_count / took),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+async def drive_endpoints(requests_count: int, concurrency: int) -> dict:
+    from app import main
+
+    await main.stats_aggregator._refresh_stats()
+
+    endpoints = get_endpoints(main.config.GITHUB_REPOSITORIES[0])
+    results = {}
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark"
+    ) as client:
+        etag = (await client.get(endpoints["repo_stats"])).headers.get("etag")
+        for name, path in endpoints.items():
+            headers = (
+                {"If-None-Match": etag} if name == "repo_stats_not_modified" else None
+            )
+            results[name] = await drive_endpoint(
+                client, path, requests_count, concurrency, headers
+            )
+
+    return results
+
+
+def run_endpoints(database_url: str, requests_count: int, concurrency: int) -> dict:
+    # main creates its engine from DATABASE_* variables on import, it's rebound to the benchmark database below
+    os.environ.setdefault("DATABASE_PORT", "5432")
+    from app import main
+
+    db_engine = create_engine(database_url)
+    for database_user in (
+        main.stats_aggregator,
+        main.hourly_timeseries,
+        *main.stats_aggregator._stats_engines.values(),
+    ):
+        database_user.db_engine = db_engine
+    main.config.AGGREGATOR_REFRESH_TIMEOUT = 24 * 3600
+
+    return asyncio.run(drive_endpoints(requests_count, concurrency))
+
+
+def run(database_url: str, requests_count: int, concurrency: int) -> dict:
+    return run_isolated(run_endpoints, database_url, requests_count, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_generator_arguments(parser)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    database_url, generator = prepare_events(args)
+    results = run(database_url, args.requests, args.concurrency)
+    print(json.dumps({"generator": generator, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+
+"""
+Generates synthetic Github events into the events table and their hourly counts, in batches, so tens of millions
+of events don't have to fit in memory.
+
+Repository and event type activity is skewed by a Zipf-like distribution, with skew 0 every repository and event
+type is equally likely. Burstiness is the share of events created in bursts, short runs of events of one repository
+following each other within seconds, the rest is spread uniformly over the generated days.
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from shared_resources.github_event import GithubEvent, GithubEventHourlyCount
+from shared_resources.database_utils import get_connection_string
+
+EVENT_TYPES = [
+    "PushEvent",
+    "WatchEvent",
+    "PullRequestEvent",
+    "IssueCommentEvent",
+    "IssuesEvent",
+    "CreateEvent",
+    "ForkEvent",
+    "PullRequestReviewEvent",
+    "DeleteEvent",
+    "ReleaseEvent",
+]
+BATCH_SIZE = 50000
+BURST_MEAN_EVENTS = 50
+# events of a burst are spread over this many seconds
+BURST_SECONDS = 250
+
+
+def get_repository_names(repositories_count: int) -> list[str]:
+    return [f"benchmark_owner/repo_{i}" for i in range(repositories_count)]
+
+
+def get_zipf_weights(count: int, skew: float) -> np.ndarray:
+    """
+    :return: probabilities of count items, the k-th (from 1) proportional to 1 / k^skew
+    """
+
+    weights = 1 / np.arange(1, count + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+@dataclass
+class EventGenerator:
+    repositories_count: int = 5
+    repository_skew: float = 1
+    event_type_skew: float = 1.2
+    burstiness: float = 0.3
+    days: float = 7
+    seed: int = 42
+
+    def generate(
+        self, events_count: int, now: datetime.datetime, batch_size: int = BATCH_SIZE
+    ) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Generates events in batches, the same events for the same parameters, seed and now.
+
+        :param events_count: number of events to generate
+        :param now: creation time of the newest possible event, events are older by up to self.days
+        :param batch_size: number of events in a batch
+        :return: repository indexes, event type indexes and creation timestamps of a batch of events
+        """
+
+        random = np.random.default_rng(self.seed)
+        repository_weights = get_zipf_weights(
+            self.repositories_count, self.repository_skew
+        )
+        event_type_weights = get_zipf_weights(len(EVENT_TYPES), self.event_type_skew)
+        # a little below the whole time, so events don't expire while the benchmark runs
+        rolling_seconds = self.days * 24 * 3600 - 600
+        newest_timestamp = now.timestamp()
+
+        for batch_start in range(0, events_count, batch_size):
+            count = min(batch_size, events_count - batch_start)
+            repositories = random.choice(
+                self.repositories_count, size=count, p=repository_weights
+            )
+            event_types = random.choice(
+                len(EVENT_TYPES), size=count, p=event_type_weights
+            )
+            ages = random.uniform(0, rolling_seconds, size=count)
+
+            # events of a burst are of one repository and follow each other by a few seconds
+            burst_count = int(count * self.burstiness)
+            if burst_count:
+                burst_ids = random.integers(
+                    0, max(burst_count // BURST_MEAN_EVENTS, 1), size=burst_count
+                )
+                burst_starts = random.uniform(
+                    0, rolling_seconds, size=burst_ids.max() + 1
+                )
+                burst_repositories = random.choice(
+                    self.repositories_count,
+                    size=burst_ids.max() + 1,
+                    p=repository_weights,
+                )
+                ages[:burst_count] = np.clip(
+                    burst_starts[burst_ids]
+                    + random.uniform(0, BURST_SECONDS, size=burst_count),
+                    0,
+                    rolling_seconds,
+                )
+                repositories[:burst_count] = burst_repositories[burst_ids]
+
+            yield repositories, event_types, newest_timestamp - ages
+
+    def get_event_rows(
+        self, events_count: int, now: datetime.datetime, batch_size: int = BATCH_SIZE
+    ) -> Iterator[list[dict]]:
+        """
+        :return: batches of generated events as rows of the events table
+        """
+
+        repository_names = get_repository_names(self.repositories_count)
+        event_id = 0
+        for repositories, event_types, timestamps in self.generate(
+            events_count, now, batch_size
+        ):
+            rows = []
+            for repository, event_type, timestamp in zip(
+                repositories.tolist(), event_types.tolist(), timestamps.tolist()
+            ):
+                rows.append(
+                    {
+                        "id": str(event_id),
+                        "type": EVENT_TYPES[event_type],
+                        # stored without timezone in UTC
+                        "created_at": datetime.datetime.fromtimestamp(
+                            timestamp, tz=datetime.timezone.utc
+                        ).replace(tzinfo=None),
+                        "repository": repository_names[repository],
+                    }
+                )
+                event_id += 1
+            yield rows
+
+
+def _copy_rows(engine: Engine, table_name: str, rows: list[dict]):
+    """
+    Inserts rows by postgre COPY, much faster than inserts for millions of rows.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = list(rows[0])
+    for row in rows:
+        writer.writerow(row.values())
+    buffer.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH CSV", buffer
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def _insert_rows(engine: Engine, table, rows: list[dict]):
+    if engine.dialect.name == "postgresql":
+        _copy_rows(engine, table.name, rows)
+    else:
+        with engine.begin() as connection:
+            connection.execute(insert(table), rows)
+
+
+def load_events(
+    database_url: str,
+    events_count: int,
+    generator: EventGenerator,
+    regenerate: bool = False,
+) -> bool:
+    """
+    Fills the events table and hourly counts with events_count generated events, unless it already has that many.
+
+    :param database_url: SQLAlchemy url of the database
+    :param events_count: number of events to generate
+    :param generator: generator of the events
+    :param regenerate: generate the events even if the table has events_count events, e.g. with other parameters
+    :return: whether the events were generated
+    """
+
+    engine = create_engine(database_url)
+    tables = [GithubEvent.__table__, GithubEventHourlyCount.__table__]
+    GithubEvent.metadata.create_all(engine, tables=tables)
+    with Session(engine) as session:
+        if (
+            not regenerate
+            and session.scalar(select(func.count()).select_from(GithubEvent))
+            == events_count
+        ):
+            return False
+
+    for table in tables:
+        table.drop(engine)
+        table.create(engine)
+    if engine.dialect.name == "postgresql":
+        # the events table is partitioned by day, a single default partition takes all generated days
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"CREATE TABLE {GithubEvent.__tablename__}_default "
+                    f"PARTITION OF {GithubEvent.__tablename__} DEFAULT"
+                )
+            )
+
+    hourly_counts = Counter()
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    for rows in generator.get_event_rows(events_count, now):
+        _insert_rows(engine, GithubEvent.__table__, rows)
+        hourly_counts.update(
+            (
+                row["repository"],
+                row["type"],
+                row["created_at"].replace(minute=0, second=0, microsecond=0),
+            )
+            for row in rows
+        )
+
+    hourly_count_rows = [
+        {"repository": repository, "type": type_, "hour": hour, "count": count}
+        for (repository, type_, hour), count in hourly_counts.items()
+    ]
+    for batch_start in range(0, len(hourly_count_rows), BATCH_SIZE):
+        _insert_rows(
+            engine,
+            GithubEventHourlyCount.__table__,
+            hourly_count_rows[batch_start : batch_start + BATCH_SIZE],
+        )
+
+    engine.dispose()
+    return True
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--database-url",
+        default=None,
+        help="SQLAlchemy url, DATABASE_* variables by default",
+    )
+    parser.add_argument("--events", type=int, default=3_000_000)
+    parser.add_argument("--repositories", type=int, default=5)
+    parser.add_argument("--repository-skew", type=float, default=1)
+    parser.add_argument("--event-type-skew", type=float, default=1.2)
+    parser.add_argument(
+        "--burstiness", type=float, default=0.3, help="share of events in bursts"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--regenerate",
+        action="store_true",
+        help="generate the events even if the table already has --events rows",
+    )
+
+
+def prepare_events(args: argparse.Namespace) -> tuple[str, dict]:
+    """
+    Generates the events if needed and configures the aggregator for the generated repositories.
+
+    :return: database url and the generator parameters
+    """
+
+    database_url = args.database_url or get_connection_string()
+    generator = EventGenerator(
+        repositories_count=args.repositories,
+        repository_skew=args.repository_skew,
+        event_type_skew=args.event_type_skew,
+        burstiness=args.burstiness,
+        seed=args.seed,
+    )
+    load_events(database_url, args.events, generator, args.regenerate)
+    # inherited by the benchmark processes
+    os.environ["GITHUB_REPOSITORIES"] = str(get_repository_names(args.repositories))
+
+    return database_url, {"events": args.events, **generator.__dict__}
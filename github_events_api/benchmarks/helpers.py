@@ -0,0 +1,31 @@
+
+import multiprocessing
+import resource
+import statistics
+from typing import Callable
+
+
+def get_peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_isolated(func: Callable, *args) -> dict:
+    """
+    Runs func in a fresh process, so peak RSS of one benchmark doesn't hide the others.
+    """
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def summarize_durations(durations: list[float]) -> dict:
+    """
+    :param durations: durations of the repeated runs in seconds
+    """
+
+    return {
+        "runs": len(durations),
+        "min_seconds": round(min(durations), 4),
+        "median_seconds": round(statistics.median(durations), 4),
+        "max_seconds": round(max(durations), 4),
+    }
@@ -0,0 +1,126 @@
+
+"""
+Compares read paths of the aggregator's event scan: ORM entities fetched by yield_per(100), which the aggregator
+used before, against streaming only the needed columns through a server-side cursor with different batch sizes,
+and the whole _fetch_consecutive_event_times.
+
+Every path runs in its own process, so their peak RSS doesn't mix. Run from github_events_api directory:
+
+    PYTHONPATH=.:.. python -m benchmarks.read_path --events 3000000 --batch-sizes 1000 10000 50000
+
+Without --database-url, the database from DATABASE_* environment variables is used. The events are generated into
+DATABASE_TABLE_NAME table (benchmark_events by default), which is recreated if it doesn't have --events rows.
+"""
+
+import argparse
+import datetime
+import json
+import time
+
+from benchmarks.event_generator import add_generator_arguments, prepare_events
+from benchmarks.helpers import get_peak_rss_mb, run_isolated
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from shared_resources.github_event import GithubEvent
+
+
+def read_orm(session: Session, cutoff_datetime: datetime.datetime, batch_size: int):
+    event_query = (
+        session.query(GithubEvent)
+        .filter(GithubEvent.created_at >= cutoff_datetime)
+        .order_by(GithubEvent.created_at)
+    )
+    for event in event_query.yield_per(batch_size):
+        event.id, event.repository, event.type, event.created_at
+
+
+def read_columns(session: Session, cutoff_datetime: datetime.datetime, batch_size: int):
+    event_query = (
+        select(
+            GithubEvent.id,
+            GithubEvent.repository,
+            GithubEvent.type,
+            GithubEvent.created_at,
+        )
+        .where(GithubEvent.created_at >= cutoff_datetime)
+        .order_by(GithubEvent.created_at)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for _ in session.execute(event_query):
+        pass
+
+
+def fetch_event_times(
+    session: Session, cutoff_datetime: datetime.datetime, batch_size: int
+):
+    from app.config import Config
+    from app.stats_aggregator import StatsAggregator
+
+    config = Config()
+    config.AGGREGATOR_FETCH_BATCH_SIZE = batch_size
+    aggregator = StatsAggregator(config=config, db_engine=session.get_bind())
+    aggregator._fetch_consecutive_event_times(session=session)
+
+
+READ_PATHS = {
+    "orm": read_orm,
+    "columns": read_columns,
+    "fetch_consecutive_event_times": fetch_event_times,
+}
+
+
+def run_read_path(database_url: str, read_path: str, batch_size: int) -> dict:
+    engine = create_engine(database_url)
+    cutoff_datetime = datetime.datetime.now(
+        tz=datetime.timezone.utc
+    ) - datetime.timedelta(days=7)
+    start_rss_mb = get_peak_rss_mb()
+
+    with Session(engine) as session:
+        rows = session.scalar(
+            select(func.count()).where(GithubEvent.created_at >= cutoff_datetime)
+        )
+
+        start = time.perf_counter()
+        READ_PATHS[read_path](session, cutoff_datetime, batch_size)
+        took = time.perf_counter() - start
+
+    peak_rss_mb = get_peak_rss_mb()
+    return {
+        "read_path": read_path,
+        "batch_size": batch_size,
+        "rows": rows,
+        "seconds": round(took, 3),
+        "rows_per_second": round(rows / took) if took else None,
+        "peak_rss_mb": peak_rss_mb,
+        "peak_rss_growth_mb": round(peak_rss_mb - start_rss_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    add_generator_arguments(parser)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1000, 10000, 50000]
+    )
+    args = parser.parse_args()
+
+    database_url, generator = prepare_events(args)
+    runs = [("orm", 100)] + [
+        (read_path, batch_size)
+        for read_path in ("columns", "fetch_consecutive_event_times")
+        for batch_size in args.batch_sizes
+    ]
+    results = [
+        run_isolated(run_read_path, database_url, read_path, batch_size)
+        for read_path, batch_size in runs
+    ]
+
+    print(json.dumps({"generator": generator, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
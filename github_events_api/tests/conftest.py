@@ -5,14 +5,17 @@ from unittest.mock import MagicMock
 
 os.environ["GITHUB_REPOSITORIES"] = '["test_owner/test_repo"]'
 os.environ["GITHUB_AUTHENTICATION_TOKENS"] = '["test_token"]'
-os.environ["GITHUB_MAX_REPOSITORIES"] = "5"
 os.environ["AGGREGATOR_ROLLING_EVENTS"] = "500"
 os.environ["AGGREGATOR_ROLLING_DAYS"] = "7"
 os.environ["DATABASE_NAME"] = "test_name"
+os.environ.setdefault("DATABASE_TABLE_NAME", "test_events_table")
 
 from app.stats_aggregator import StatsAggregator
 from app.config import Config
+from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+from shared_resources.github_event import GithubEvent
 
 
 @pytest.fixture
@@ -24,3 +27,14 @@ def mock_engine() -> Engine:
 def stats_aggregator(mock_engine: Engine) -> StatsAggregator:
     StatsAggregator._instance = None
     return StatsAggregator(config=Config(), db_engine=mock_engine)
+
+
+@pytest.fixture
+def sqlite_engine() -> Engine:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    GithubEvent.metadata.create_all(engine)
+    return engine
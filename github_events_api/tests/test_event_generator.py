@@ -0,0 +1,63 @@
+import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from benchmarks.event_generator import EVENT_TYPES, EventGenerator, load_events
+from shared_resources.github_event import GithubEvent, GithubEventHourlyCount
+
+NOW = datetime.datetime(2024, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+def generate_all(generator: EventGenerator, events_count: int) -> tuple:
+    batches = list(generator.generate(events_count, NOW, batch_size=1000))
+    return tuple(np.concatenate(arrays) for arrays in zip(*batches))
+
+
+def test_generate_is_reproducible() -> None:
+    first = generate_all(EventGenerator(seed=1), 2500)
+    second = generate_all(EventGenerator(seed=1), 2500)
+    other = generate_all(EventGenerator(seed=2), 2500)
+
+    assert len(first[0]) == 2500
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[2], other[2])
+
+
+def test_generate_skew_and_time_range() -> None:
+    repositories, event_types, timestamps = generate_all(
+        EventGenerator(repositories_count=10, repository_skew=1.5, days=2), 20000
+    )
+
+    repository_counts = np.bincount(repositories, minlength=10)
+    event_type_counts = np.bincount(event_types, minlength=len(EVENT_TYPES))
+    assert repository_counts[0] > 3 * repository_counts[9]
+    assert event_type_counts[0] > 3 * event_type_counts[-1]
+    assert timestamps.max() <= NOW.timestamp()
+    assert timestamps.min() >= NOW.timestamp() - 2 * 24 * 3600
+
+
+def test_generate_burstiness() -> None:
+    def get_median_gap(burstiness: float) -> float:
+        _, _, timestamps = generate_all(
+            EventGenerator(repositories_count=1, burstiness=burstiness), 5000
+        )
+        return float(np.median(np.diff(np.sort(timestamps))))
+
+    assert get_median_gap(0.8) < get_median_gap(0) / 2
+
+
+def test_load_events(tmp_path) -> None:
+    generator = EventGenerator(repositories_count=3)
+    database_url = f"sqlite:///{tmp_path / 'events.db'}"
+
+    assert load_events(database_url, 3000, generator)
+    # already generated
+    assert not load_events(database_url, 3000, generator)
+
+    with Session(create_engine(database_url)) as session:
+        events_count = session.scalar(select(func.count()).select_from(GithubEvent))
+        hourly_count = session.scalar(select(func.sum(GithubEventHourlyCount.count)))
+
+    assert events_count == hourly_count == 3000
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from app.gap_sketch import GapSketch
+from app.rolling_window import RollingWindow
+
+
+def test_sketch_quantiles_relative_accuracy() -> None:
+    random.seed(42)
+    values = sorted(random.expovariate(1 / 300) for _ in range(10000))
+    sketch = GapSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for quantile in 0, 0.5, 0.9, 0.99, 1:
+        expected = values[round(quantile * (len(values) - 1))]
+        assert sketch.get_quantile(quantile) == pytest.approx(expected, rel=0.01)
+
+
+def test_sketch_remove_and_merge() -> None:
+    sketch = GapSketch(relative_accuracy=0.01)
+    other_sketch = GapSketch(relative_accuracy=0.01)
+    for value in 0, 10, 20, 30:
+        sketch.add(value)
+    other_sketch.add(1000)
+
+    sketch.remove(0)
+    sketch.remove(30)
+    sketch.merge(other_sketch)
+
+    assert sketch.count == 3
+    assert sketch.zero_count == 0
+    assert sketch.get_min() == pytest.approx(10, rel=0.01)
+    assert sketch.get_max() == pytest.approx(1000, rel=0.01)
+
+
+def test_sketch_exact_extremes() -> None:
+    sketch = GapSketch(relative_accuracy=0.05)
+    other_sketch = GapSketch(relative_accuracy=0.05)
+    for value in 12.3, 45.6, 78.9:
+        sketch.add(value)
+    other_sketch.add(1001.7)
+    sketch.merge(other_sketch)
+
+    assert sketch.get_min() == sketch.get_quantile(0) == 12.3
+    assert sketch.get_max() == sketch.get_quantile(1) == 1001.7
+
+    # the next extreme isn't known after the removal of the current one, it's estimated
+    sketch.remove(12.3)
+    assert sketch.min is None
+    assert sketch.get_min() == pytest.approx(45.6, rel=0.05)
+    assert sketch.get_max() == 1001.7
+
+
+def test_sketch_empty_and_zero() -> None:
+    sketch = GapSketch(relative_accuracy=0.01)
+    assert sketch.get_quantile(0.5) == 0.0
+
+    sketch.add(0)
+    sketch.add(0)
+    sketch.add(50)
+    assert sketch.get_quantile(0.5) == 0.0
+    assert sketch.get_max() == pytest.approx(50, rel=0.01)
+
+
+def test_rolling_window_sketch_follows_window() -> None:
+    window = RollingWindow(max_events=3)
+    for timestamp in 0.0, 1000.0, 1010.0, 1030.0:
+        window.append(timestamp)
+
+    # consecutive time of 1000s left the window with the oldest event
+    assert window.sketch.count == 2
+
+    assert window.sketch.get_min() == 10
+    assert window.sketch.get_max() == 20
+
+    window.expire(1020.0)
+    assert window.sketch.count == 0
+
+
+def test_rolling_window_exact_extremes() -> None:
+    random.seed(42)
+    timestamps = sorted(random.uniform(0, 100000) for _ in range(1000))
+    window = RollingWindow(max_events=50, relative_accuracy=0.05)
+
+    for i, timestamp in enumerate(timestamps):
+        window.append(timestamp)
+        gaps = [
+            newer - older
+            for older, newer in zip(
+                timestamps[max(i - 49, 0) : i], timestamps[max(i - 48, 1) : i + 1]
+            )
+        ]
+        if gaps:
+            assert (window.sketch.get_min(), window.sketch.get_max()) == (
+                min(gaps),
+                max(gaps),
+            )
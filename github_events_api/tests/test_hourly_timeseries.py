@@ -0,0 +1,64 @@
+import datetime
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.hourly_timeseries import HourlyTimeseries
+from shared_resources.github_event import GithubEventHourlyCount
+from shared_resources.helpers import convert_to_github_datetime, truncate_to_hour
+
+
+def test_fetch_repository_timeseries(sqlite_engine: Engine) -> None:
+    current_hour = truncate_to_hour(datetime.datetime.now(tz=datetime.timezone.utc))
+    with Session(sqlite_engine) as session:
+        session.add_all(
+            [
+                GithubEventHourlyCount(
+                    repository="test_owner/test_repo",
+                    type=event_type,
+                    hour=current_hour - datetime.timedelta(hours=hours_ago),
+                    count=count,
+                )
+                for event_type, hours_ago, count in [
+                    ("PushEvent", 0, 2),
+                    ("PushEvent", 2, 3),
+                    ("WatchEvent", 2, 1),
+                    # older than the requested hours
+                    ("WatchEvent", 3, 5),
+                ]
+            ]
+            + [
+                GithubEventHourlyCount(
+                    repository="test_owner/other_repo",
+                    type="PushEvent",
+                    hour=current_hour,
+                    count=7,
+                )
+            ]
+        )
+        session.commit()
+
+    timeseries = HourlyTimeseries(
+        config=Config(), db_engine=sqlite_engine
+    ).fetch_repository_timeseries(repository="test_owner/test_repo", hours=3)
+
+    assert timeseries == {
+        "hours": [
+            convert_to_github_datetime(current_hour - datetime.timedelta(hours=i))
+            for i in (2, 1, 0)
+        ],
+        "all_actions": [4, 0, 2],
+        "event_type": {"PushEvent": [3, 0, 2], "WatchEvent": [1, 0, 0]},
+    }
+
+
+def test_fetch_repository_timeseries_max_hours(sqlite_engine: Engine) -> None:
+    hourly_timeseries = HourlyTimeseries(config=Config(), db_engine=sqlite_engine)
+
+    timeseries = hourly_timeseries.fetch_repository_timeseries(
+        repository="test_owner/test_repo", hours=10**6
+    )
+
+    assert len(timeseries["hours"]) == hourly_timeseries.get_max_hours()
+    assert timeseries["event_type"] == {}
@@ -0,0 +1,80 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+
+from app.metrics import (
+    MULTIPROCESS_DIR_ENV,
+    RequestLatencyMiddleware,
+    get_refresh_age,
+    get_registry,
+    prepare_multiprocess_dir,
+)
+
+
+def get_request_count(method: str, endpoint: str) -> float:
+    return (
+        REGISTRY.get_sample_value(
+            "github_events_api_request_duration_seconds_count",
+            {"method": method, "endpoint": endpoint},
+        )
+        or 0
+    )
+
+
+async def test_request_latency_by_route_path() -> None:
+    app = FastAPI()
+    app.add_middleware(RequestLatencyMiddleware)
+
+    @app.get("/test_repo/{repo_name}")
+    async def get_repo(repo_name: str):
+        return {"repo_name": repo_name}
+
+    route_count = get_request_count("GET", "/test_repo/{repo_name}")
+    unmatched_count = get_request_count("GET", "unmatched")
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        for repo_name in "first", "second":
+            assert (await client.get(f"/test_repo/{repo_name}")).status_code == 200
+        assert (await client.get("/missing")).status_code == 404
+
+    assert get_request_count("GET", "/test_repo/{repo_name}") == route_count + 2
+    assert get_request_count("GET", "unmatched") == unmatched_count + 1
+
+
+def test_get_refresh_age() -> None:
+    refreshed_at = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        seconds=30
+    )
+
+    assert get_refresh_age(None) == -1
+    assert 29 < get_refresh_age(refreshed_at.isoformat(timespec="seconds") + "Z") < 40
+
+
+def test_get_registry_collects_all_workers(tmp_path, monkeypatch) -> None:
+    (tmp_path / "counter_0.db").write_bytes(b"")
+    monkeypatch.setenv(MULTIPROCESS_DIR_ENV, "")
+    prepare_multiprocess_dir(str(tmp_path))
+
+    # the metrics values of every worker are written to the directory from its start
+    worker_env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    for rows in 1, 2:
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                f"from app.metrics import observe_refresh_rows; observe_refresh_rows({rows})",
+            ],
+            env=worker_env,
+            check=True,
+        )
+
+    registry = get_registry()
+    assert registry is not REGISTRY
+    assert registry.get_sample_value("github_events_api_refresh_rows_total") == 3
+    assert registry.get_sample_value("github_events_api_last_refresh_rows") == 2
@@ -0,0 +1,90 @@
+import os
+from unittest.mock import MagicMock, patch
+
+from app.config import Config
+from app.shared_snapshot import SharedSnapshot
+from app.stats_aggregator import StatsAggregator
+from app.stats_snapshot import StatsSnapshot
+
+STATS = {
+    "default": {
+        "test_owner/test_repo": {
+            "all": {"consecutive_events_average_s": 5.0, "total_events": 3}
+        }
+    }
+}
+
+
+def test_leadership_is_exclusive(tmp_path) -> None:
+    path = str(tmp_path / "snapshot.json")
+    leader = SharedSnapshot(path)
+    follower = SharedSnapshot(path)
+
+    assert leader.try_acquire_leadership()
+    assert leader.try_acquire_leadership()
+    assert not follower.try_acquire_leadership()
+
+    leader.close()
+
+    assert follower.try_acquire_leadership()
+    follower.close()
+
+
+def test_publish_and_load(tmp_path) -> None:
+    path = str(tmp_path / "snapshot.json")
+    leader = SharedSnapshot(path)
+    follower = SharedSnapshot(path)
+
+    assert follower.load_if_changed() is None
+
+    leader.publish(
+        StatsSnapshot(cached_stats=STATS, last_refresh="2025-04-07T14:14:10Z")
+    )
+    snapshot = follower.load_if_changed()
+
+    assert snapshot.stats == STATS
+    # followers don't compress the responses on reload
+    assert snapshot.get_encoded_response("default")._gzip_body is None
+    assert snapshot.get_encoded_response("default")._brotli_body is None
+    assert snapshot.last_refresh == "2025-04-07T14:14:10Z"
+    assert (
+        snapshot.get_encoded_response("default").body
+        == StatsSnapshot(cached_stats=STATS, last_refresh="2025-04-07T14:14:10Z")
+        .get_encoded_response("default")
+        .body
+    )
+    assert follower.load_if_changed() is None
+
+    leader.publish(
+        StatsSnapshot(cached_stats=STATS, last_refresh="2025-04-07T14:15:50Z")
+    )
+
+    assert follower.load_if_changed().last_refresh == "2025-04-07T14:15:50Z"
+    assert os.listdir(tmp_path) == ["snapshot.json"]
+
+
+async def test_only_leader_refreshes(tmp_path) -> None:
+    config = Config()
+    config.AGGREGATOR_SHARED_SNAPSHOT_PATH = str(tmp_path / "snapshot.json")
+    try:
+        StatsAggregator._instance = None
+        leader = StatsAggregator(config=config, db_engine=MagicMock())
+        StatsAggregator._instance = None
+        follower = StatsAggregator(config=config, db_engine=MagicMock())
+    finally:
+        config.AGGREGATOR_SHARED_SNAPSHOT_PATH = None
+        StatsAggregator._instance = None
+
+    with patch.object(leader, "_calculate_stats", return_value=STATS), patch.object(
+        follower, "_calculate_stats"
+    ) as follower_calculate:
+        assert await leader._update_snapshot() == config.AGGREGATOR_BACKGROUND_REFRESH
+        assert (
+            await follower._update_snapshot() == config.AGGREGATOR_SHARED_SNAPSHOT_POLL
+        )
+
+    follower_calculate.assert_not_called()
+    assert follower.cached_stats == STATS["default"]
+    assert await follower.get_last_updated() == await leader.get_last_updated()
+    leader._shared_snapshot.close()
+    follower._shared_snapshot.close()
@@ -1,11 +1,19 @@
 import pytest
+import asyncio
 import datetime
+import time
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from collections import defaultdict
 
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
 from app.stats_aggregator import StatsAggregator
-from app.config import Config
+from app.config import Config, ConfigError
+from app.rolling_window import RollingWindow
+from app.stats_window import StatsWindow
+from app.stats_snapshot import StatsSnapshot
 from shared_resources.github_event import GithubEvent
 
 
@@ -16,23 +24,34 @@ def test_get_event_cutoff_datetime(stats_aggregator: StatsAggregator):
     assert (now - cutoff).days == stats_aggregator._config.AGGREGATOR_ROLLING_DAYS
 
 
+def make_window(*timestamps: float) -> RollingWindow:
+    window = RollingWindow(max_events=500)
+    for timestamp in timestamps:
+        window.append(timestamp)
+    return window
+
+
 @pytest.mark.asyncio
 async def test_refresh_stats_aggregates_data(stats_aggregator: StatsAggregator) -> None:
     mock_data = defaultdict(dict)
-    mock_data["repo"] = {
-        "all": [4.0, 6.0],
-        "PushEvent": [5.0, 5.0],
-        "ForkEvent": [5.0],
-        "WatchEvent": [],
+    mock_data["test_owner/test_repo"] = {
+        "all": make_window(0.0, 4.0, 10.0),
+        "PushEvent": make_window(0.0, 5.0, 10.0),
+        "ForkEvent": make_window(0.0, 5.0),
+        "WatchEvent": make_window(0.0),
     }
+    mock_data["not_configured/repo"] = {"all": make_window(0.0, 5.0)}
 
     with patch.object(
-        stats_aggregator, "_fetch_consecutive_event_times", return_value=mock_data
+        stats_aggregator,
+        "_fetch_consecutive_event_times",
+        return_value={"default": mock_data},
     ):
         await stats_aggregator._refresh_stats()
 
-        assert "repo" in stats_aggregator.cached_stats
-        stats = stats_aggregator.cached_stats["repo"]
+        assert "test_owner/test_repo" in stats_aggregator.cached_stats
+        assert "not_configured/repo" not in stats_aggregator.cached_stats
+        stats = stats_aggregator.cached_stats["test_owner/test_repo"]
         assert stats["all"]["consecutive_events_average_s"] == 5.0
         assert stats["all"]["total_events"] == 3
         assert stats["PushEvent"]["consecutive_events_average_s"] == 5.0
@@ -44,55 +63,78 @@ async def test_refresh_stats_aggregates_data(stats_aggregator: StatsAggregator)
         assert isinstance(await stats_aggregator.get_last_updated(), str)
 
 
-def make_event(seconds_offset: int) -> GithubEvent:
-    now = datetime.datetime.now(tz=datetime.timezone.utc)
+def test_rolling_window_keeps_newest_events() -> None:
+    window = RollingWindow(max_events=3)
+    for timestamp in 0.0, 1.0, 3.0, 6.0, 10.0:
+        window.append(timestamp)
+
+    assert window.total_events == 3
+    assert window.gap_sum == 7.0
+    assert window.get_average() == 3.5
+
+
+def test_rolling_window_expire() -> None:
+    window = make_window(0.0, 1.0, 3.0, 6.0)
+    window.expire(2.0)
+
+    assert window.total_events == 2
+    assert window.get_average() == 3.0
+
+    window.expire(7.0)
+
+    assert window.total_events == 0
+    assert window.get_average() == 0.0
+
+
+def make_event(
+    seconds_offset: int,
+    now: datetime.datetime = None,
+    event_type: str = "PushEvent",
+    repository: str = "repo",
+) -> GithubEvent:
+    now = now or datetime.datetime.now(tz=datetime.timezone.utc)
 
     return GithubEvent(
         id=str(seconds_offset),
-        type="PushEvent",
+        type=event_type,
         created_at=now + datetime.timedelta(seconds=seconds_offset),
-        repository="repo",
+        repository=repository,
     )
 
 
-def get_mock_session(return_value: list) -> MagicMock:
+def get_mock_session(return_value: list[GithubEvent]) -> MagicMock:
     mock_session = MagicMock()
-    mock_query = MagicMock()
-    mock_filter = MagicMock()
-    mock_order = MagicMock()
-
-    mock_order.yield_per.return_value = return_value
-    mock_filter.order_by.return_value = mock_order
-    mock_query.filter.return_value = mock_filter
-    mock_session.query.return_value = mock_query
+    mock_session.execute.return_value = [
+        (event.id, event.repository, event.type, event.created_at)
+        for event in return_value
+    ]
 
     return mock_session
 
 
 @pytest.mark.asyncio
-def test_fetch_consecutive_sums() -> None:
+def test_fetch_consecutive_event_times() -> None:
     aggregator = StatsAggregator(config=Config(), db_engine=MagicMock())
     mock_session = get_mock_session([make_event(i * 5) for i in range(3)])
-    result = aggregator._fetch_consecutive_sums(session=mock_session)
+    result = aggregator._fetch_consecutive_event_times(session=mock_session)
 
-    assert isinstance(result, defaultdict)
-    assert "repo" in result
-    assert "PushEvent" in result["repo"]
-    assert len(result["repo"]["PushEvent"]) == 2
-    assert round(result["repo"]["PushEvent"][0], 2) == 5.0
-    assert round(result["repo"]["PushEvent"][1], 2) == 5.0
+    assert isinstance(result["default"], defaultdict)
+    assert "repo" in result["default"]
+    assert "PushEvent" in result["default"]["repo"]
+    assert result["default"]["repo"]["PushEvent"].total_events == 3
+    assert round(result["default"]["repo"]["PushEvent"].get_average(), 2) == 5.0
 
 
 @pytest.mark.asyncio
 def test_fetch_consecutive_sums_skip_old() -> None:
     aggregator = StatsAggregator(config=Config(), db_engine=MagicMock())
     mock_session = get_mock_session([make_event(-(i * 10**8)) for i in range(3)])
-    result = aggregator._fetch_consecutive_sums(session=mock_session)
+    result = aggregator._fetch_consecutive_event_times(session=mock_session)
 
-    assert isinstance(result, defaultdict)
-    assert "repo" in result
-    assert "PushEvent" in result["repo"]
-    assert len(result["repo"]["PushEvent"]) == 0
+    assert isinstance(result["default"], defaultdict)
+    assert "repo" in result["default"]
+    assert "PushEvent" in result["default"]["repo"]
+    assert result["default"]["repo"]["PushEvent"].total_events == 1
 
 
 @pytest.mark.asyncio
@@ -102,10 +144,274 @@ def test_fetch_consecutive_sums_skip_many_events() -> None:
     mock_session = get_mock_session(
         [make_event(i) for i in range(config.AGGREGATOR_ROLLING_EVENTS + 100)]
     )
-    result = aggregator._fetch_consecutive_sums(session=mock_session)
+    result = aggregator._fetch_consecutive_event_times(session=mock_session)
+
+    assert isinstance(result["default"], defaultdict)
+    assert "repo" in result["default"]
+    assert "PushEvent" in result["default"]["repo"]
+    assert (
+        result["default"]["repo"]["PushEvent"].total_events
+        == config.AGGREGATOR_ROLLING_EVENTS
+    )
+    assert round(result["default"]["repo"]["PushEvent"].get_average(), 2) == 1.0
+
+
+def test_fetch_consecutive_event_times_incremental() -> None:
+    aggregator = StatsAggregator(config=Config(), db_engine=MagicMock())
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    first_events = [make_event(i * 5, now) for i in range(3)]
+    aggregator._fetch_consecutive_event_times(session=get_mock_session(first_events))
+
+    # the last already fetched event is returned again, as it's not older than the last fetched event
+    new_events = [first_events[-1]] + [
+        make_event(i * 5, now, "WatchEvent") for i in range(3, 5)
+    ]
+    result = aggregator._fetch_consecutive_event_times(
+        session=get_mock_session(new_events), incremental=True
+    )
+
+    assert result["default"]["repo"]["all"].total_events == 5
+    assert round(result["default"]["repo"]["all"].get_average(), 2) == 5.0
+    assert result["default"]["repo"]["PushEvent"].total_events == 3
+    assert result["default"]["repo"]["WatchEvent"].total_events == 2
+
+
+def test_fetch_consecutive_event_times_incremental_expires_old() -> None:
+    aggregator = StatsAggregator(config=Config(), db_engine=MagicMock())
+    cutoff = aggregator.get_event_cutoff_datetime()
+    old_events = [make_event(i * 5, cutoff, "ForkEvent") for i in range(1, 3)]
+    aggregator._fetch_consecutive_event_times(session=get_mock_session(old_events))
+
+    with patch.object(
+        aggregator,
+        "get_event_cutoff_datetimes",
+        return_value={"default": cutoff + datetime.timedelta(seconds=12)},
+    ):
+        result = aggregator._fetch_consecutive_event_times(
+            session=get_mock_session([make_event(20, cutoff)]), incremental=True
+        )
+
+    assert "ForkEvent" not in result["default"]["repo"]
+    assert result["default"]["repo"]["all"].total_events == 1
+    assert result["default"]["repo"]["PushEvent"].total_events == 1
+
+
+def test_fetch_consecutive_event_times_incremental_per_repository(
+    sqlite_engine: Engine,
+) -> None:
+    aggregator = StatsAggregator(config=Config(), db_engine=sqlite_engine)
+    now = datetime.datetime.now(tz=datetime.timezone.utc).replace(microsecond=0)
+    with Session(sqlite_engine) as session:
+        session.add(make_event(-3600, now, repository="b"))
+        session.add(make_event(-60, now, repository="a"))
+        session.commit()
+        aggregator._fetch_consecutive_event_times(session=session)
+
+        # repository b is scraped later, its new events are older than the last event of repository a
+        session.add(make_event(-1200, now, repository="b"))
+        session.add(make_event(-600, now, repository="b"))
+        session.commit()
+        result = aggregator._fetch_consecutive_event_times(
+            session=session, incremental=True
+        )
+
+    assert result["default"]["a"]["all"].total_events == 1
+    assert result["default"]["b"]["all"].total_events == 3
+    assert round(result["default"]["b"]["all"].get_average(), 2) == 1500.0
+
+
+def test_is_incremental_refresh(stats_aggregator: StatsAggregator) -> None:
+    stats_aggregator._config.AGGREGATOR_INCREMENTAL = True
+    try:
+        assert not stats_aggregator._is_incremental_refresh()
+
+        stats_aggregator._fetch_consecutive_event_times(
+            session=get_mock_session([make_event(0)])
+        )
+        assert stats_aggregator._is_incremental_refresh()
+
+        stats_aggregator._refreshes_since_full_scan = (
+            stats_aggregator._config.AGGREGATOR_FULL_REFRESH_INTERVAL
+        )
+        assert not stats_aggregator._is_incremental_refresh()
+    finally:
+        stats_aggregator._config.AGGREGATOR_INCREMENTAL = False
+
+
+def slow_fetch(*args, **kwargs) -> defaultdict:
+    time.sleep(0.3)
+    return defaultdict(dict)
+
+
+@pytest.mark.asyncio
+async def test_refresh_stats_doesnt_block_event_loop(
+    stats_aggregator: StatsAggregator,
+) -> None:
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    with patch.object(
+        stats_aggregator, "_fetch_consecutive_event_times", side_effect=slow_fetch
+    ):
+        await stats_aggregator._refresh_stats()
+    ticker.cancel()
+
+    assert ticks > 10
+    assert isinstance(await stats_aggregator.get_last_updated(), str)
+
+
+@pytest.mark.asyncio
+async def test_refresh_stats_timeout(stats_aggregator: StatsAggregator) -> None:
+    stats_aggregator._config.AGGREGATOR_REFRESH_TIMEOUT = 0.1
+    try:
+        with patch.object(
+            stats_aggregator, "_fetch_consecutive_event_times", side_effect=slow_fetch
+        ) as fetch_mock:
+            await stats_aggregator._refresh_stats()
+            assert await stats_aggregator.get_last_updated() is None
+
+            # previous refresh is still running
+            await stats_aggregator._refresh_stats()
+            assert fetch_mock.call_count == 1
+    finally:
+        stats_aggregator._config.AGGREGATOR_REFRESH_TIMEOUT = 60
+
+
+def test_fetch_consecutive_event_times_multiple_windows() -> None:
+    config = Config()
+    config.AGGREGATOR_WINDOWS = {
+        "1h": {"hours": 1},
+        "1d": {"days": 1, "events": 3},
+        "7d": {"days": 7},
+    }
+    try:
+        StatsAggregator._instance = None
+        aggregator = StatsAggregator(config=config, db_engine=MagicMock())
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        events = [make_event(-3 * 24 * 3600, now)] + [
+            make_event(-i * 600, now) for i in range(10, -1, -1)
+        ]
+        mock_session = get_mock_session(events)
+        result = aggregator._fetch_consecutive_event_times(session=mock_session)
+    finally:
+        config.AGGREGATOR_WINDOWS = {}
+        StatsAggregator._instance = None
+
+    assert mock_session.execute.call_count == 1
+    assert aggregator.default_window == "1h"
+    assert result["1h"]["repo"]["all"].total_events == 6
+    assert round(result["1h"]["repo"]["all"].get_average(), 2) == 600.0
+    assert result["1d"]["repo"]["all"].total_events == 3
+    assert result["7d"]["repo"]["all"].total_events == 12
+
+
+def test_stats_windows_config() -> None:
+    config = Config()
+    config.AGGREGATOR_WINDOWS = {"24h": {"hours": 24}, "500": {"events": 500}}
+    try:
+        stats_windows = StatsWindow.from_config(config)
+
+        config.AGGREGATOR_WINDOWS = {"1w": {"weeks": 1}}
+        with pytest.raises(ConfigError):
+            StatsWindow.from_config(config)
+    finally:
+        config.AGGREGATOR_WINDOWS = {}
+
+    assert [stats_window.name for stats_window in stats_windows] == ["24h", "500"]
+    assert stats_windows[0].duration == datetime.timedelta(hours=24)
+    assert stats_windows[0].max_events is None
+    assert stats_windows[1].duration == datetime.timedelta(
+        days=config.AGGREGATOR_ROLLING_DAYS
+    )
+    assert stats_windows[1].max_events == 500
+    assert [stats_window.name for stats_window in StatsWindow.from_config(config)] == [
+        "default"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refresh_stats_of_notified_repositories(
+    stats_aggregator: StatsAggregator,
+) -> None:
+    other_repo_stats = {"all": {"consecutive_events_average_s": 1.0}}
+    stats_aggregator._config.GITHUB_REPOSITORIES.append("test_owner/other_repo")
+    try:
+        stats_aggregator.snapshot = StatsSnapshot(
+            cached_stats={
+                "default": {
+                    "test_owner/test_repo": {},
+                    "test_owner/other_repo": other_repo_stats,
+                }
+            },
+            last_refresh="2024-01-01T00:00:00Z",
+        )
+        mock_data = defaultdict(dict)
+        mock_data["test_owner/test_repo"] = {"all": make_window(0.0, 4.0)}
+        with patch.object(
+            stats_aggregator,
+            "_fetch_consecutive_event_times",
+            return_value={"default": mock_data},
+        ) as fetch_mock:
+            await stats_aggregator._refresh_stats(
+                {"test_owner/test_repo", "other/repo"}
+            )
+    finally:
+        stats_aggregator._config.GITHUB_REPOSITORIES.remove("test_owner/other_repo")
+
+    assert fetch_mock.call_args.kwargs["repositories"] == ["test_owner/test_repo"]
+    assert stats_aggregator.cached_stats["test_owner/other_repo"] == other_repo_stats
+    assert (
+        stats_aggregator.cached_stats["test_owner/test_repo"]["all"]["total_events"]
+        == 2
+    )
+
+
+def test_get_refresh_scope_unknown_repositories(
+    stats_aggregator: StatsAggregator,
+) -> None:
+    stats_aggregator.snapshot = StatsSnapshot(
+        cached_stats={"default": {}}, last_refresh="2024-01-01T00:00:00Z"
+    )
+
+    assert stats_aggregator._get_refresh_scope(None) is None
+    assert stats_aggregator._get_refresh_scope(set()) is None
+    assert stats_aggregator._get_refresh_scope(
+        {"test_owner/test_repo", "other/repo"}
+    ) == ["test_owner/test_repo"]
+
+
+@pytest.mark.asyncio
+async def test_wait_for_refresh_collects_notifications(
+    stats_aggregator: StatsAggregator,
+) -> None:
+    event_listener = MagicMock()
+    event_listener.start.return_value = True
+    event_listener.wait = AsyncMock(return_value={"repositories": ["repo_1"]})
+    event_listener.drain.return_value = [
+        {"repositories": ["repo_1", "repo_2"]},
+        {"repositories": ["repo_3"]},
+    ]
+    stats_aggregator._event_listener = event_listener
+    stats_aggregator._config.AGGREGATOR_LISTEN_DEBOUNCE = 0
+
+    assert await stats_aggregator._wait_for_refresh(10) == {
+        "repo_1",
+        "repo_2",
+        "repo_3",
+    }
+
+    # no notification in time, whole snapshot is refreshed
+    event_listener.wait = AsyncMock(return_value=None)
+    assert await stats_aggregator._wait_for_refresh(10) is None
 
-    assert isinstance(result, defaultdict)
-    assert "repo" in result
-    assert "PushEvent" in result["repo"]
-    assert len(result["repo"]["PushEvent"]) == config.AGGREGATOR_ROLLING_EVENTS - 1
-    assert round(result["repo"]["PushEvent"][0], 2) == 1.0
+    # repositories didn't fit in the notification payload
+    event_listener.wait = AsyncMock(return_value={"repositories": ["repo_1"]})
+    event_listener.drain.return_value = [{"repositories": None}]
+    assert await stats_aggregator._wait_for_refresh(10) is None
+    stats_aggregator._config.AGGREGATOR_LISTEN_DEBOUNCE = 2
@@ -0,0 +1,103 @@
+import random
+import datetime
+
+import pytest
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.stats_aggregator import StatsAggregator
+from app.config import Config
+from shared_resources.github_event import GithubEvent
+
+
+def insert_random_events(engine: Engine, events_count: int):
+    random.seed(42)
+    now = datetime.datetime.now(tz=datetime.timezone.utc).replace(
+        microsecond=0, tzinfo=None
+    )
+
+    with Session(engine) as session:
+        for i in range(events_count):
+            session.add(
+                GithubEvent(
+                    id=str(i),
+                    type=random.choice(["PushEvent", "WatchEvent", "ForkEvent"]),
+                    created_at=now
+                    - datetime.timedelta(seconds=random.randint(0, 8 * 24 * 3600)),
+                    repository=random.choice(
+                        ["test_owner/test_repo", "test_owner/other_repo"]
+                    ),
+                )
+            )
+        session.commit()
+
+
+@pytest.mark.parametrize("engine", ["sql", "numpy"])
+async def test_engine_parity_with_python(sqlite_engine: Engine, engine: str) -> None:
+    insert_random_events(sqlite_engine, 2000)
+    config = Config()
+
+    StatsAggregator._instance = None
+    aggregator = StatsAggregator(config=config, db_engine=sqlite_engine)
+    await aggregator._refresh_stats()
+    python_stats = aggregator.cached_stats
+
+    config.AGGREGATOR_ENGINE = engine
+    try:
+        await aggregator._refresh_stats()
+    finally:
+        config.AGGREGATOR_ENGINE = "python"
+    engine_stats = aggregator.cached_stats
+
+    assert python_stats["test_owner/test_repo"]["all"]["total_events"] == (
+        config.AGGREGATOR_ROLLING_EVENTS
+    )
+    assert python_stats["test_owner/test_repo"]["PushEvent"]["total_events"] > 1
+    assert engine_stats == python_stats
+
+
+@pytest.mark.parametrize("engine", ["sql", "numpy"])
+async def test_engine_parity_with_python_multiple_windows(
+    sqlite_engine: Engine, engine: str
+) -> None:
+    insert_random_events(sqlite_engine, 2000)
+    config = Config()
+    config.AGGREGATOR_WINDOWS = {
+        "6h": {"hours": 6},
+        "2d": {"days": 2, "events": 50},
+        "7d": {"days": 7, "events": 500},
+    }
+
+    try:
+        StatsAggregator._instance = None
+        aggregator = StatsAggregator(config=config, db_engine=sqlite_engine)
+        await aggregator._refresh_stats()
+        python_stats = aggregator.snapshot.stats
+
+        config.AGGREGATOR_ENGINE = engine
+        await aggregator._refresh_stats()
+        engine_stats = aggregator.snapshot.stats
+    finally:
+        config.AGGREGATOR_ENGINE = "python"
+        config.AGGREGATOR_WINDOWS = {}
+        StatsAggregator._instance = None
+
+    assert set(python_stats) == {"6h", "2d", "7d"}
+    assert python_stats["2d"]["test_owner/test_repo"]["all"]["total_events"] == 50
+    assert (
+        python_stats["6h"]["test_owner/test_repo"]["all"]["total_events"]
+        < python_stats["7d"]["test_owner/test_repo"]["all"]["total_events"]
+    )
+    assert engine_stats == python_stats
+
+
+@pytest.mark.parametrize("engine", ["sql", "numpy"])
+async def test_engine_empty_database(sqlite_engine: Engine, engine: str) -> None:
+    config = Config()
+    StatsAggregator._instance = None
+    aggregator = StatsAggregator(config=config, db_engine=sqlite_engine)
+
+    assert aggregator._stats_engines[engine].fetch_consecutive_stats(
+        stats_windows={"default": (aggregator.get_event_cutoff_datetime(), 500)}
+    ) == {"default": {}}
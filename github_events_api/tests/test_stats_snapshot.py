@@ -0,0 +1,130 @@
+import gzip
+
+import brotli
+import orjson
+
+from app.stats_snapshot import StatsSnapshot
+
+STATS = {
+    "test_owner/test_repo": {
+        "all": {"consecutive_events_average_s": 5.0, "total_events": 3},
+        "PushEvent": {
+            "consecutive_events_average_s": 5.0,
+            "total_events": 3,
+            "consecutive_events_min_s": 4.0,
+            "consecutive_events_p50_s": 5.0,
+            "consecutive_events_p90_s": 6.0,
+            "consecutive_events_p99_s": 6.0,
+            "consecutive_events_max_s": 6.0,
+        },
+    },
+    "test_owner/other_repo": {
+        "all": {"consecutive_events_average_s": 0.0, "total_events": 1},
+    },
+}
+
+
+def test_snapshot_content() -> None:
+    snapshot = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh="2025-04-07T14:14:10Z"
+    )
+
+    all_content = orjson.loads(snapshot.get_encoded_response("default").body)
+    repo_content = orjson.loads(
+        snapshot.get_encoded_response("default", "test_owner/test_repo").body
+    )
+
+    assert all_content["last_refresh"] == "2025-04-07T14:14:10Z"
+    assert set(all_content["repositories"]) == set(STATS)
+    assert repo_content == {
+        "last_refresh": "2025-04-07T14:14:10Z",
+        "window": "default",
+        "repositories": {
+            "test_owner/test_repo": {
+                "all_actions": STATS["test_owner/test_repo"]["all"],
+                "event_type": {
+                    "PushEvent": {
+                        "consecutive_events_average_s": 5.0,
+                        "total_events": 3,
+                    }
+                },
+            }
+        },
+    }
+    assert gzip.decompress(snapshot.get_encoded_response("default").gzip_body) == (
+        snapshot.get_encoded_response("default").body
+    )
+    assert brotli.decompress(snapshot.get_encoded_response("default").brotli_body) == (
+        snapshot.get_encoded_response("default").body
+    )
+
+
+def test_snapshot_etag_changes_with_stats() -> None:
+    snapshot = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh="2025-04-07T14:14:10Z"
+    )
+    same_snapshot = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh="2025-04-07T14:14:10Z"
+    )
+    new_snapshot = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh="2025-04-07T14:15:50Z"
+    )
+
+    assert (
+        snapshot.get_encoded_response("default").etag
+        == same_snapshot.get_encoded_response("default").etag
+    )
+    assert (
+        snapshot.get_encoded_response("default").etag
+        != new_snapshot.get_encoded_response("default").etag
+    )
+
+
+def test_response_not_modified() -> None:
+    encoded = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh=None
+    ).get_encoded_response("default")
+
+    response = encoded.get_response(if_none_match=f'"other", {encoded.etag}')
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == encoded.etag
+
+
+def test_response_encoding() -> None:
+    encoded = StatsSnapshot(
+        cached_stats={"default": STATS}, last_refresh=None
+    ).get_encoded_response("default")
+
+    plain = encoded.get_response(if_none_match='"other"')
+    assert encoded._gzip_body is None
+    gzipped = encoded.get_response(accept_encoding="gzip, deflate, br;q=0")
+    # compressed bodies are compressed on the first request accepting them
+    assert encoded._brotli_body is None
+    brotli_response = encoded.get_response(accept_encoding="gzip, br")
+
+    assert plain.status_code == 200
+    assert plain.body == encoded.body
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.body == encoded.gzip_body
+    assert brotli_response.headers["content-encoding"] == "br"
+    assert brotli_response.body == encoded.brotli_body
+
+
+def test_snapshot_percentiles() -> None:
+    snapshot = StatsSnapshot(cached_stats={"default": STATS}, last_refresh=None)
+
+    content = orjson.loads(
+        snapshot.get_encoded_response(
+            "default", "test_owner/test_repo", percentiles=True
+        ).body
+    )
+
+    assert (
+        content["repositories"]["test_owner/test_repo"]["event_type"]["PushEvent"]
+        == STATS["test_owner/test_repo"]["PushEvent"]
+    )
+    assert snapshot.get_encoded_response("default", "test_owner/missing_repo") is None
+    assert snapshot.get_encoded_response("missing_window") is None
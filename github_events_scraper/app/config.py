@@ -12,21 +12,38 @@ class ConfigError(Exception):
 class Config:
     # Github
     GITHUB_REPOSITORIES: list = None
+    GITHUB_EVENT_SOURCES: list = []
     GITHUB_AUTHENTICATION_TOKENS: list = None
-    GITHUB_MAX_REPOSITORIES: int = 5
     GITHUB_REFRESH_RATE: int = 3600
+    GITHUB_MIN_REFRESH_RATE: int = 60
+    GITHUB_REFRESH_TARGET_FILL: float = 0.5
+    GITHUB_RATE_LIMIT_RESERVE: int = 50
     GITHUB_API_URL: str = "https://api.github.com"
+    GITHUB_ASYNC_SCRAPING: bool = False
+    GITHUB_PREFETCH_PAGES: int = 1
 
     # Request
     REQUEST_TIMEOUT: int = 60
     REQUEST_MAX_RETRY: int = 3
     REQUEST_BACKOFF_FACTOR: int = 1
     REQUEST_STATUS_FORCELIST: list = [501, 502, 503, 504]
+    REQUEST_MAX_CONCURRENCY: int = 10
+    REQUEST_MAX_CONCURRENCY_PER_TOKEN: int = 4
 
     # Aggregator
     AGGREGATOR_ROLLING_DAYS: int = 7
     AGGREGATOR_ROLLING_EVENTS: int = 500
 
+    # Database
+    DATABASE_PARTITION_DAYS_AHEAD: int = 3
+    DATABASE_NOTIFY_CHANNEL: str = "github_events_inserted"
+    DATABASE_WRITE_BATCH_SIZE: int = 1000
+    DATABASE_WRITE_BATCH_SECONDS: float = 1
+    DATABASE_WRITE_QUEUE_PAGES: int = 100
+
+    # Metrics
+    METRICS_PORT: int = 9100
+
     # Logging
     LOGGING_LEVEL: str = "warning"
 
@@ -76,11 +93,11 @@ class Config:
     def _parse_bool(self, val: str | bool) -> bool:
         return val if type(val) == bool else val.lower() in ["true", "yes", "1"]
 
-    def _parse_list(self, val: str) -> list:
-        return ast.literal_eval(val)
+    def _parse_list(self, val: str | list) -> list:
+        return val if type(val) == list else ast.literal_eval(val)
 
-    def _parse_dict(self, val: str) -> dict:
-        return ast.literal_eval(val)
+    def _parse_dict(self, val: str | dict) -> dict:
+        return val if type(val) == dict else ast.literal_eval(val)
 
     def _parse_str(self, val: str) -> str | None:
         if str(val).lower() in ["none", "null"]:
@@ -0,0 +1,152 @@
+
+import bisect
+import datetime
+from array import array
+
+
+class EventIdBucket:
+    """
+    Event ids of a single day, a sorted array of int64 ids, and a set of the recently added ones, merged into the
+    array once it's MERGE_SIZE ids.
+    """
+
+    MERGE_SIZE = 4096
+
+    def __init__(self, event_ids: array | None = None):
+        """
+        :param event_ids: sorted ids
+        """
+
+        self._sorted_ids = event_ids if event_ids is not None else array("q")
+        self._recent_ids: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted_ids) + len(self._recent_ids)
+
+    def __contains__(self, event_id: int) -> bool:
+        # recent ids first, the merge replaces the array before clearing them, so an id is always in one of them
+        if event_id in self._recent_ids:
+            return True
+        sorted_ids = self._sorted_ids
+        position = bisect.bisect_left(sorted_ids, event_id)
+        return position < len(sorted_ids) and sorted_ids[position] == event_id
+
+    def add(self, event_id: int):
+        self._recent_ids.add(event_id)
+        if len(self._recent_ids) >= self.MERGE_SIZE:
+            self._merge()
+
+    def _merge(self):
+        # only the recent ids are sorted, the runs of the sorted ids between them are copied whole, so the merge is
+        # linear in the size of the bucket instead of sorting it all again
+        sorted_ids = self._sorted_ids
+        merged_ids = array("q")
+        start = 0
+        for event_id in sorted(self._recent_ids):
+            position = bisect.bisect_left(sorted_ids, event_id, start)
+            if position < len(sorted_ids) and sorted_ids[position] == event_id:
+                # already in the sorted ids, e.g. an id conflicting in database, it's copied with its run
+                continue
+            merged_ids.extend(sorted_ids[start:position])
+            merged_ids.append(event_id)
+            start = position
+        merged_ids.extend(sorted_ids[start:])
+
+        self._sorted_ids = merged_ids
+        self._recent_ids = set()
+
+
+class EventIdIndex:
+    """
+    Compact index of ids of the events in database. Github event ids are numeric, so they're kept as int64 in buckets
+    by the UTC day of event creation, 8 bytes per id instead of a string in a set. Lookups only search the bucket of
+    the event's day, and the buckets of expired days are dropped whole. Ids that aren't numeric are kept in a set.
+
+    Creation times must be in UTC, aware or naive from database.
+    """
+
+    def __init__(self):
+        self._buckets: dict[datetime.date, EventIdBucket] = {}
+        self._other_ids: set[str] = set()
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in list(self._buckets.values())) + len(
+            self._other_ids
+        )
+
+    def contains(self, event_id: str, created_at: datetime.datetime) -> bool:
+        if not event_id.isdigit():
+            return event_id in self._other_ids
+
+        bucket = self._buckets.get(created_at.date())
+        return bucket is not None and int(event_id) in bucket
+
+    def get_contained_ids(
+        self, events: list[tuple[str, datetime.datetime]]
+    ) -> set[str]:
+        """
+        :param events: ids and creation times of events, e.g. of a scraped page
+        :return: ids of the events in the index
+        """
+
+        contained_ids = set()
+        buckets = self._buckets
+        for event_id, created_at in events:
+            if not event_id.isdigit():
+                if event_id in self._other_ids:
+                    contained_ids.add(event_id)
+                continue
+            bucket = buckets.get(created_at.date())
+            if bucket is not None and int(event_id) in bucket:
+                contained_ids.add(event_id)
+
+        return contained_ids
+
+    def add(self, event_id: str, created_at: datetime.datetime):
+        if not event_id.isdigit():
+            self._other_ids.add(event_id)
+            return
+
+        day = created_at.date()
+        if day not in self._buckets:
+            self._buckets[day] = EventIdBucket()
+        self._buckets[day].add(int(event_id))
+
+    def load(self, events: list[tuple[str, datetime.datetime]]):
+        """
+        Replaces the index with the events, e.g. loaded from database.
+
+        :param events: ids and creation times of events
+        """
+
+        days_ids: dict[datetime.date, array] = {}
+        other_ids = set()
+        for event_id, created_at in events:
+            if not event_id.isdigit():
+                other_ids.add(event_id)
+                continue
+            day = created_at.date()
+            if day not in days_ids:
+                days_ids[day] = array("q")
+            days_ids[day].append(int(event_id))
+
+        self._buckets = {
+            day: EventIdBucket(array("q", sorted(set(day_ids))))
+            for day, day_ids in days_ids.items()
+        }
+        self._other_ids = other_ids
+
+    def expire(self, cutoff_datetime: datetime.datetime) -> int:
+        """
+        Drops buckets of the days before the cutoff, the day of the cutoff is kept whole.
+
+        :return: number of dropped ids
+        """
+
+        cutoff_day = cutoff_datetime.date()
+        dropped_count = 0
+        for day in list(self._buckets):
+            if day < cutoff_day:
+                dropped_count += len(self._buckets.pop(day))
+
+        return dropped_count
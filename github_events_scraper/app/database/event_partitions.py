@@ -0,0 +1,210 @@
+
+import datetime
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import Config
+from shared_resources.github_event import GithubEvent
+from shared_resources.database_utils import postgre_session
+
+
+class EventPartitions:
+    """
+    Manages daily range partitions of the events table on created_at. Partitions are created ahead of time,
+    and expired ones are detached concurrently and dropped whole instead of deleting their events row by row.
+
+    Only postgre tables created as partitioned (or migrated by app.database.migrate_partitions) are managed,
+    for others is_partitioned returns False.
+    """
+
+    PARTITION_SUFFIX_FORMAT = "%Y%m%d"
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+        self._table_name = GithubEvent.__tablename__
+        self._is_partitioned: bool | None = None
+
+    def get_partition_name(self, day: datetime.date) -> str:
+        return f"{self._table_name}_p{day.strftime(self.PARTITION_SUFFIX_FORMAT)}"
+
+    def get_partition_day(self, partition_name: str) -> datetime.date | None:
+        """
+        :return: day of the partition, None if it isn't a daily partition of the events table
+        """
+
+        match = re.fullmatch(
+            rf"{re.escape(self._table_name)}_p(\d{{8}})", partition_name
+        )
+        if not match:
+            return None
+        return datetime.datetime.strptime(
+            match.group(1), self.PARTITION_SUFFIX_FORMAT
+        ).date()
+
+    def get_partition_days(
+        self, cutoff_datetime: datetime.datetime, now: datetime.datetime
+    ) -> list[datetime.date]:
+        """
+        :return: days that need a partition, from the day of cutoff to DATABASE_PARTITION_DAYS_AHEAD days after now
+        """
+
+        first_day = cutoff_datetime.date()
+        last_day = now.date() + datetime.timedelta(
+            days=self._config.DATABASE_PARTITION_DAYS_AHEAD
+        )
+        return [
+            first_day + datetime.timedelta(days=i)
+            for i in range((last_day - first_day).days + 1)
+        ]
+
+    def _quote(self, name: str) -> str:
+        return self.db_engine.dialect.identifier_preparer.quote(name)
+
+    @postgre_session
+    def is_partitioned(self, session: Session) -> bool:
+        """
+        :param session: postgre session injected by decorator
+        """
+
+        if self._is_partitioned is None:
+            self._is_partitioned = session.get_bind().dialect.name == "postgresql" and (
+                session.execute(
+                    text(
+                        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+                        "WHERE partrelid = to_regclass(:table_name))"
+                    ),
+                    {"table_name": self._table_name},
+                ).scalar()
+            )
+        return self._is_partitioned
+
+    def _get_partitions(self, session: Session) -> dict[datetime.date, str]:
+        partition_names = session.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = to_regclass(:table_name)"
+            ),
+            {"table_name": self._table_name},
+        ).scalars()
+
+        partitions = {}
+        for partition_name in partition_names:
+            day = self.get_partition_day(partition_name)
+            if day:
+                partitions[day] = partition_name
+        return partitions
+
+    @postgre_session
+    def create_partitions(
+        self, session: Session, cutoff_datetime: datetime.datetime
+    ) -> int:
+        """
+        Creates missing daily partitions from the day of cutoff_datetime to DATABASE_PARTITION_DAYS_AHEAD days
+        ahead, so inserts always have a partition to go to.
+
+        :param session: postgre session injected by decorator
+        :param cutoff_datetime: creation time of the oldest kept events
+        :return: number of created partitions
+        """
+
+        created_count = self.create_partitions_uncommitted(session, cutoff_datetime)
+        session.commit()
+        return created_count
+
+    def create_partitions_uncommitted(
+        self, session: Session, cutoff_datetime: datetime.datetime
+    ) -> int:
+        """
+        Same as create_partitions, but leaves the commit to the caller's transaction.
+        """
+
+        existing_days = self._get_partitions(session)
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        created_count = 0
+        for day in self.get_partition_days(cutoff_datetime, now):
+            if day in existing_days:
+                continue
+
+            session.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {self._quote(self.get_partition_name(day))} "
+                    f"PARTITION OF {self._quote(self._table_name)} "
+                    f"FOR VALUES FROM ('{day.isoformat()}') "
+                    f"TO ('{(day + datetime.timedelta(days=1)).isoformat()}')"
+                )
+            )
+            created_count += 1
+
+        return created_count
+
+    def _get_droppable_partitions(
+        self, connection: Connection
+    ) -> dict[datetime.date, tuple[str, bool | None]]:
+        """
+        :return: day -> partition name, and whether it's pending detach, None if it's already detached by
+            an interrupted drop
+        """
+
+        partitions = connection.execute(
+            text(
+                "SELECT child.relname, pg_inherits.inhdetachpending FROM pg_class child "
+                "LEFT JOIN pg_inherits ON pg_inherits.inhrelid = child.oid "
+                "WHERE child.relkind = 'r' AND child.relnamespace = "
+                "(SELECT relnamespace FROM pg_class WHERE oid = to_regclass(:table_name)) "
+                "AND (pg_inherits.inhparent = to_regclass(:table_name) OR NOT child.relispartition)"
+            ),
+            {"table_name": self._table_name},
+        )
+
+        droppable_partitions = {}
+        for partition_name, detach_pending in partitions:
+            day = self.get_partition_day(partition_name)
+            if day:
+                droppable_partitions[day] = (partition_name, detach_pending)
+        return droppable_partitions
+
+    def drop_expired_partitions(self, cutoff_datetime: datetime.datetime) -> int:
+        """
+        Drops partitions whose whole day is older than cutoff_datetime.
+
+        Dropping an attached partition locks the whole events table, blocking reads of the API and inserts of the
+        scraper, so the partitions are detached concurrently first. It can't run in a transaction, so every
+        statement commits on its own. The partitions an interrupted drop left detached, or pending detach, are
+        dropped by the next one.
+
+        :param cutoff_datetime: creation time of the oldest kept events
+        :return: number of events in the dropped partitions
+        """
+
+        dropped_events_count = 0
+        with self.db_engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as connection:
+            partitions = self._get_droppable_partitions(connection)
+            for day, (partition_name, detach_pending) in sorted(partitions.items()):
+                if day + datetime.timedelta(days=1) > cutoff_datetime.date():
+                    continue
+
+                quoted_name = self._quote(partition_name)
+                dropped_events_count += connection.execute(
+                    text(f"SELECT count(*) FROM {quoted_name}")
+                ).scalar()
+                if detach_pending is not None:
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {self._quote(self._table_name)} "
+                            f"DETACH PARTITION {quoted_name} "
+                            f"{'FINALIZE' if detach_pending else 'CONCURRENTLY'}"
+                        )
+                    )
+                connection.execute(text(f"DROP TABLE {quoted_name}"))
+                logging.info(f"Dropped expired events partition {partition_name}.")
+
+        return dropped_events_count
@@ -0,0 +1,125 @@
+
+import logging
+import queue
+import threading
+import time
+import traceback
+
+from app.config import Config
+from app.database.github_event_wrapper import GithubEventWrapper
+from app.metrics import EVENTS_INSERTED, WRITE_QUEUE_PAGES
+from shared_resources.github_event import GithubEventRecord
+
+
+class EventWriterError(Exception):
+    pass
+
+
+class EventWriter:
+    """
+    Inserts scraped events to database in a background thread, as they're scraped page by page.
+
+    Pages wait in a queue of DATABASE_WRITE_QUEUE_PAGES pages, adding to a full queue blocks, so the scraping is slowed
+    down to the speed of the database. They're inserted in batches of DATABASE_WRITE_BATCH_SIZE events, or the events
+    that came in DATABASE_WRITE_BATCH_SECONDS since the first one of the batch.
+    """
+
+    # queued to insert the batch right away, and to stop the thread after it
+    _FLUSH = object()
+    _STOP = object()
+
+    def __init__(self, config: Config, github_event_wrapper: GithubEventWrapper):
+        self._config = config
+        self._github_event_wrapper = github_event_wrapper
+        self._queue = queue.Queue(maxsize=config.DATABASE_WRITE_QUEUE_PAGES)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        # errors of failed batches since the last flush
+        self._errors: list[Exception] = []
+        WRITE_QUEUE_PAGES.set_function(self._queue.qsize)
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, github_events: list[GithubEventRecord]):
+        """
+        Queues events for insert, blocks while the queue is full.
+
+        :param github_events: events of a scraped page
+        """
+
+        self._queue.put(github_events)
+
+    def flush(self):
+        """
+        Waits until all queued events are inserted.
+
+        :raises EventWriterError: if any batch failed since the last flush, its events weren't inserted
+        """
+
+        self._queue.put(self._FLUSH)
+        self._queue.join()
+
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise EventWriterError(
+                f"{len(errors)} batches of events failed to insert"
+            ) from errors[0]
+
+    def close(self):
+        """
+        Inserts the queued events and stops the thread.
+        """
+
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+    def _write(self, github_events: list[GithubEventRecord]):
+        try:
+            inserted_events = self._github_event_wrapper.insert_multiple_events(
+                github_events=github_events
+            )
+            logging.info(f"Inserted {len(inserted_events)} new events.")
+            EVENTS_INSERTED.inc(len(inserted_events))
+        except Exception as e:
+            logging.error(
+                f"Error during insert of {len(github_events)} events, ERROR: {e}, traceback: {traceback.format_exc()}"
+            )
+            self._errors.append(e)
+
+    def _run(self):
+        batch: list[GithubEventRecord] = []
+        # queue items of the batch, marked done once it's inserted
+        batch_items = 0
+        batch_deadline = None
+
+        while True:
+            timeout = (
+                None
+                if batch_deadline is None
+                else max(batch_deadline - time.monotonic(), 0)
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # the batch is due
+                item = None
+            else:
+                batch_items += 1
+
+            if isinstance(item, list):
+                batch.extend(item)
+                if batch_deadline is None:
+                    batch_deadline = (
+                        time.monotonic() + self._config.DATABASE_WRITE_BATCH_SECONDS
+                    )
+                if len(batch) < self._config.DATABASE_WRITE_BATCH_SIZE:
+                    continue
+
+            if batch:
+                self._write(batch)
+            for _ in range(batch_items):
+                self._queue.task_done()
+            batch, batch_items, batch_deadline = [], 0, None
+
+            if item is self._STOP:
+                return
@@ -1,24 +1,51 @@
 
 import datetime
+import json
+from collections import Counter
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.engine import Engine
 
 from app.config import Config
-from shared_resources.github_event import GithubEvent
-from shared_resources.database_utils import postgre_session
-from shared_resources.helpers import calculate_days_ago
+from app.database.event_id_index import EventIdIndex
+from app.database.event_partitions import EventPartitions
+from app.metrics import DEDUP_LOOKUPS, DEDUP_HITS, INSERT_CONFLICTS
+from shared_resources.github_event import (
+    GithubEvent,
+    GithubEventHourlyCount,
+    GithubEventRecord,
+)
+from shared_resources.database_utils import postgre_session, get_dialect_insert
+from shared_resources.helpers import (
+    calculate_days_ago,
+    convert_to_github_datetime,
+    truncate_to_hour,
+)
 
 
 class GithubEventWrapper:
 
+    # rows of a single insert statement, with 4 columns it's within the bind parameters limit of postgre and sqlite
+    INSERT_CHUNK_SIZE = 5000
+    # postgre rejects notification payloads of 8000 bytes and longer
+    NOTIFY_PAYLOAD_LIMIT = 8000
+
     def __init__(self, config: Config, db_engine: Engine):
         self._config = config
         self.db_engine = db_engine
-        self._cached_github_event_ids = set()
+        self._event_id_index = EventIdIndex()
+        self._event_partitions = EventPartitions(config=config, db_engine=db_engine)
+
+    def get_event_ids_in_db(
+        self, events: list[tuple[str, datetime.datetime]]
+    ) -> set[str]:
+        """
+        :param events: ids and creation times of events, e.g. of a scraped page
+        :return: ids of the events in the cached event ids
+        """
 
-    def is_event_id_in_db(self, event_id: str):
-        return event_id in self._cached_github_event_ids
+        return self._event_id_index.get_contained_ids(events)
 
     def get_event_cutoff_datetime(self):
         return datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
@@ -33,52 +60,242 @@ class GithubEventWrapper:
         :param session: postgre session injected by decorator
         """
 
-        event_ids = session.query(GithubEvent.id).filter(
-            GithubEvent.created_at >= self.get_event_cutoff_datetime()
+        events = (
+            session.query(GithubEvent.id, GithubEvent.created_at)
+            .filter(GithubEvent.created_at >= self.get_event_cutoff_datetime())
+            .yield_per(10000)
+        )
+        self._event_id_index.load(events)
+
+    def create_partitions(self) -> int:
+        """
+        Creates daily partitions of the events table ahead of time, if it's partitioned.
+
+        :return number of created partitions
+        """
+
+        if not self._event_partitions.is_partitioned():
+            return 0
+        return self._event_partitions.create_partitions(
+            cutoff_datetime=self.get_event_cutoff_datetime()
         )
-        self._cached_github_event_ids = set([event_id[0] for event_id in event_ids])
 
     @postgre_session
     def delete_expired_events(self, session: Session) -> int:
         """
-        Deletes events older than AGGREGATOR_ROLLING_DAYS days old.
+        Deletes events older than AGGREGATOR_ROLLING_DAYS days old, and their hourly counts. The hour
+        the cutoff falls into keeps its counts until it's whole past the cutoff.
+
+        In a partitioned table, partitions of whole expired days are dropped, so only events of the
+        partition the cutoff falls into are deleted row by row. Cached ids of whole expired days are dropped too.
 
         :param session: postgre session injected by decorator
         :return number of deleted events
         """
+        cutoff_datetime = self.get_event_cutoff_datetime()
+        dropped_count = 0
+        if self._event_partitions.is_partitioned():
+            dropped_count = self._event_partitions.drop_expired_partitions(
+                cutoff_datetime=cutoff_datetime
+            )
+
         deleted_count: int = (
             session.query(GithubEvent)
-            .filter(GithubEvent.created_at < self.get_event_cutoff_datetime())
+            .filter(GithubEvent.created_at < cutoff_datetime)
             .delete()
         )
+        session.query(GithubEventHourlyCount).filter(
+            GithubEventHourlyCount.hour < truncate_to_hour(cutoff_datetime)
+        ).delete()
         session.commit()
-        return deleted_count
+        self._event_id_index.expire(cutoff_datetime)
+        return dropped_count + deleted_count
+
+    @staticmethod
+    def _upsert_hourly_counts(session: Session, github_events: list[GithubEventRecord]):
+        """
+        Adds events to their hourly counts, creating the counts of new hours.
+
+        :param session: postgre session of the events insert, so counts are committed together with events
+        :param github_events: events newly inserted to database
+        """
+
+        hourly_counts = Counter(
+            (event.repository, event.type, truncate_to_hour(event.created_at))
+            for event in github_events
+        )
+        if not hourly_counts:
+            return
+
+        insert = get_dialect_insert(session)(GithubEventHourlyCount).values(
+            [
+                {"repository": repository, "type": type_, "hour": hour, "count": count}
+                for (repository, type_, hour), count in hourly_counts.items()
+            ]
+        )
+        session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[
+                    GithubEventHourlyCount.repository,
+                    GithubEventHourlyCount.type,
+                    GithubEventHourlyCount.hour,
+                ],
+                set_={"count": GithubEventHourlyCount.count + insert.excluded.count},
+            )
+        )
+
+    @staticmethod
+    def get_inserted_events_payload(github_events: list[GithubEventRecord]) -> str:
+        """
+        :param github_events: events newly inserted to database
+        :return: notification payload with the affected repositories and creation time of the newest event,
+            repositories are null if they don't fit in NOTIFY_PAYLOAD_LIMIT
+        """
+
+        max_created_at = convert_to_github_datetime(
+            max(event.created_at for event in github_events)
+        )
+        payload = json.dumps(
+            {
+                "repositories": sorted({event.repository for event in github_events}),
+                "max_created_at": max_created_at,
+            }
+        )
+        if len(payload.encode()) >= GithubEventWrapper.NOTIFY_PAYLOAD_LIMIT:
+            # the API refreshes all repositories instead
+            payload = json.dumps(
+                {"repositories": None, "max_created_at": max_created_at}
+            )
+
+        return payload
+
+    def _notify_inserted_events(
+        self, session: Session, github_events: list[GithubEventRecord]
+    ):
+        """
+        Notifies DATABASE_NOTIFY_CHANNEL about inserted events, so the API can refresh their repositories
+        right away. The notification is delivered only if the insert is committed.
+
+        :param session: postgre session of the events insert
+        :param github_events: events newly inserted to database
+        """
+
+        if not github_events or session.get_bind().dialect.name != "postgresql":
+            return
+
+        session.execute(
+            select(
+                func.pg_notify(
+                    self._config.DATABASE_NOTIFY_CHANNEL,
+                    self.get_inserted_events_payload(github_events),
+                )
+            )
+        )
+
+    @postgre_session
+    def backfill_hourly_counts(self, session: Session) -> int:
+        """
+        Counts events already in database into hourly counts, if there are none yet, e.g. for events
+        inserted before the hourly counts existed.
+
+        :param session: postgre session injected by decorator
+        :return number of backfilled events
+        """
+
+        if session.query(GithubEventHourlyCount).first() is not None:
+            return 0
+
+        # only the counted columns, rows have the same attributes as events
+        github_events = (
+            session.query(
+                GithubEvent.repository, GithubEvent.type, GithubEvent.created_at
+            )
+            .filter(GithubEvent.created_at >= self.get_event_cutoff_datetime())
+            .all()
+        )
+        self._upsert_hourly_counts(session, github_events)
+        session.commit()
+        return len(github_events)
+
+    def _insert_new_events(
+        self, session: Session, github_events: list[GithubEventRecord]
+    ) -> set[str]:
+        """
+        Inserts events with ON CONFLICT DO NOTHING, so events already in database, e.g. inserted by another scraper
+        or before a restart, are skipped by the database instead of failing the whole insert.
+
+        :param session: postgre session of the insert
+        :param github_events: events to insert, with unique ids
+        :return ids of the events that were inserted
+        """
+
+        insert = get_dialect_insert(session)
+        inserted_ids = set()
+        for start in range(0, len(github_events), self.INSERT_CHUNK_SIZE):
+            rows = [
+                {
+                    "id": event.id,
+                    "type": event.type,
+                    "created_at": event.created_at,
+                    "repository": event.repository,
+                }
+                for event in github_events[start : start + self.INSERT_CHUNK_SIZE]
+            ]
+            inserted_ids.update(
+                session.scalars(
+                    insert(GithubEvent)
+                    .values(rows)
+                    .on_conflict_do_nothing()
+                    .returning(GithubEvent.id)
+                )
+            )
+
+        return inserted_ids
 
     @postgre_session
     def insert_multiple_events(
-        self, session: Session, github_events: list[GithubEvent]
+        self, session: Session, github_events: list[GithubEventRecord]
     ) -> list[str]:
         """
-        Filter out old events and events already in database and insert them.
+        Filter out old events and events already in database and insert them, together with their hourly counts.
+        Notifies DATABASE_NOTIFY_CHANNEL about the inserted events on commit.
+
+        The cached event ids only save the round trip, database is the source of truth, only the events it inserted
+        are counted and notified.
 
         :param session: postgre session injected by decorator
         :param github_events: events to insert
         :return newly inserted event ids
         """
 
-        filtered_events: list[GithubEvent] = []
+        # by id, so an event scraped twice in the batch is inserted once
+        filtered_events: dict[str, GithubEventRecord] = {}
 
+        event_ids_in_db = self.get_event_ids_in_db(
+            [(event.id, event.created_at) for event in github_events]
+        )
+        dedup_hits = 0
         for event in github_events:
-            if (
-                not self.is_event_id_in_db(event.id)
-                and calculate_days_ago(event.created_at)
+            if event.id in event_ids_in_db:
+                dedup_hits += 1
+            elif (
+                calculate_days_ago(event.created_at)
                 < self._config.AGGREGATOR_ROLLING_DAYS
             ):
-                filtered_events.append(event)
+                filtered_events[event.id] = event
+        DEDUP_LOOKUPS.inc(len(github_events))
+        DEDUP_HITS.inc(dedup_hits)
 
-        session.bulk_save_objects(filtered_events)
+        inserted_ids = self._insert_new_events(session, list(filtered_events.values()))
+        INSERT_CONFLICTS.inc(len(filtered_events) - len(inserted_ids))
+        inserted_events = [
+            event for event in filtered_events.values() if event.id in inserted_ids
+        ]
+        self._upsert_hourly_counts(session, inserted_events)
+        self._notify_inserted_events(session, inserted_events)
         session.commit()
-        filtered_event_ids = [filtered_event.id for filtered_event in filtered_events]
-        self._cached_github_event_ids.update(filtered_event_ids)
+        # the conflicting events are in database too
+        for event in filtered_events.values():
+            self._event_id_index.add(event.id, event.created_at)
 
-        return filtered_event_ids
+        return [event.id for event in inserted_events]
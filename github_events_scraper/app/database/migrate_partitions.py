@@ -0,0 +1,90 @@
+
+"""
+Migrates an existing events table to a table partitioned by day on created_at.
+
+The old table is renamed, the partitioned table and its daily partitions are created in its place, and the events
+of the last AGGREGATOR_ROLLING_DAYS days are copied over, all in a single transaction. Stop the scraper before running
+it, from github_events_scraper directory:
+
+    PYTHONPATH=.:.. python -m app.database.migrate_partitions [--keep-old-table]
+"""
+
+import argparse
+import logging
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.database.event_partitions import EventPartitions
+from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.github_event import GithubEvent
+from shared_resources.database_utils import get_connection_string
+from shared_resources.helpers import set_logger
+
+
+def migrate(config: Config, db_engine: Engine, keep_old_table: bool):
+    event_partitions = EventPartitions(config=config, db_engine=db_engine)
+    if event_partitions.is_partitioned():
+        logging.info(f"Table {GithubEvent.__tablename__} is already partitioned.")
+        return
+
+    table_name = GithubEvent.__tablename__
+    old_table_name = f"{table_name}_unpartitioned"
+    cutoff_datetime = GithubEventWrapper(
+        config=config, db_engine=db_engine
+    ).get_event_cutoff_datetime()
+
+    with Session(db_engine) as session:
+        quote = session.get_bind().dialect.identifier_preparer.quote
+
+        # indexes keep their names on rename, they would clash with the indexes of the new table
+        session.execute(
+            text(f"ALTER TABLE {quote(table_name)} RENAME TO {quote(old_table_name)}")
+        )
+        for index_name in (f"{table_name}_pkey", f"ix_{table_name}_created_at"):
+            session.execute(
+                text(
+                    f"ALTER INDEX IF EXISTS {quote(index_name)} "
+                    f"RENAME TO {quote(index_name.replace(table_name, old_table_name, 1))}"
+                )
+            )
+
+        GithubEvent.__table__.create(session.connection())
+        event_partitions.create_partitions_uncommitted(session, cutoff_datetime)
+
+        copied_count = session.execute(
+            text(
+                f"INSERT INTO {quote(table_name)} (id, type, created_at, repository) "
+                f"SELECT id, type, created_at, repository FROM {quote(old_table_name)} "
+                f"WHERE created_at >= :cutoff_datetime"
+            ),
+            {"cutoff_datetime": cutoff_datetime},
+        ).rowcount
+        if not keep_old_table:
+            session.execute(text(f"DROP TABLE {quote(old_table_name)}"))
+
+        session.commit()
+
+    logging.info(f"Copied {copied_count} events to partitioned {table_name} table.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--keep-old-table",
+        action="store_true",
+        help="keep the old table renamed with _unpartitioned suffix instead of dropping it",
+    )
+    args = parser.parse_args()
+
+    config = Config()
+    set_logger(config)
+    migrate(
+        config=config,
+        db_engine=create_engine(get_connection_string()),
+        keep_old_table=args.keep_old_table,
+    )
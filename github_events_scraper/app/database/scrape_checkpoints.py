@@ -0,0 +1,87 @@
+
+import datetime
+from typing import NamedTuple
+
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+
+from app.config import Config
+from shared_resources.github_event import GithubEventCheckpoint
+from shared_resources.database_utils import postgre_session, get_dialect_insert
+
+
+class ScrapeCheckpoint(NamedTuple):
+    """
+    Newest event of a source from its last stored scraping, and the ETag and Last-Modified of its first page.
+    """
+
+    event_id: str
+    created_at: datetime.datetime
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class ScrapeCheckpoints:
+    """
+    Stores a checkpoint of every event source, so a restarted scraper stops scraping a source at its newest stored
+    event, and sends conditional requests right away, without loading all the event ids first.
+    """
+
+    def __init__(self, config: Config, db_engine: Engine):
+        self._config = config
+        self.db_engine = db_engine
+
+    @postgre_session
+    def load_checkpoints(self, session: Session) -> dict[str, ScrapeCheckpoint]:
+        """
+        :param session: postgre session injected by decorator
+        :return: source -> its checkpoint
+        """
+
+        return {
+            checkpoint.source: ScrapeCheckpoint(
+                event_id=checkpoint.event_id,
+                # stored in UTC without timezone
+                created_at=checkpoint.created_at.replace(tzinfo=datetime.timezone.utc),
+                etag=checkpoint.etag,
+                last_modified=checkpoint.last_modified,
+            )
+            for checkpoint in session.query(GithubEventCheckpoint)
+        }
+
+    @postgre_session
+    def save_checkpoints(
+        self, session: Session, checkpoints: dict[str, ScrapeCheckpoint]
+    ):
+        """
+        :param session: postgre session injected by decorator
+        :param checkpoints: source -> its new checkpoint
+        """
+
+        if not checkpoints:
+            return
+
+        insert = get_dialect_insert(session)(GithubEventCheckpoint).values(
+            [
+                {
+                    "source": source,
+                    "event_id": checkpoint.event_id,
+                    "created_at": checkpoint.created_at,
+                    "etag": checkpoint.etag,
+                    "last_modified": checkpoint.last_modified,
+                }
+                for source, checkpoint in checkpoints.items()
+            ]
+        )
+        session.execute(
+            insert.on_conflict_do_update(
+                index_elements=[GithubEventCheckpoint.source],
+                set_={
+                    "event_id": insert.excluded.event_id,
+                    "created_at": insert.excluded.created_at,
+                    "etag": insert.excluded.etag,
+                    "last_modified": insert.excluded.last_modified,
+                },
+            )
+        )
+        session.commit()
@@ -1,12 +1,33 @@
 import traceback
 import logging
 import time
-from typing import Callable
+from typing import Awaitable, Callable
 from functools import wraps
 
+import httpx
 from requests import Response
 
 from shared_resources.helpers import time_response
+from app.metrics import REQUEST_LATENCY
+
+
+def _log_response(request_url: str, request_start: float, response):
+    REQUEST_LATENCY.observe(time.time() - request_start)
+
+    msg = f"Request to url: {request_url}, took: {time_response(request_start)}s, status code: {response.status_code}"
+
+    if response.status_code < 400:
+        logging.info(msg)
+    else:
+        logging.warning(f"{msg}, response: {response.text}")
+
+
+def _log_error(request_url: str, request_start: float, error: Exception):
+    # most likely "Max retries exceeded" from the retry adapter
+    logging.error(
+        f"Request to url: {request_url}, took: {time_response(request_start)}s, ERROR: {error}, "
+        f"traceback: {traceback.format_exc()}"
+    )
 
 
 def track_response(func: Callable[..., Response]) -> Callable[..., Response]:
@@ -16,24 +37,32 @@ def track_response(func: Callable[..., Response]) -> Callable[..., Response]:
 
         request_url = args[1]
 
-        log_message = f"Request to url: {request_url}, took: "
-
         try:
             response = func(*args, **kwargs)
+            _log_response(request_url, request_start, response)
+            return response
+        except Exception as e:
+            _log_error(request_url, request_start, e)
+            raise
+
+    return inner
+
 
-            msg = f"{log_message}{time_response(request_start)}s, status code: {response.status_code}"
+def track_async_response(
+    func: Callable[..., Awaitable[httpx.Response]],
+) -> Callable[..., Awaitable[httpx.Response]]:
+    @wraps(func)
+    async def inner(*args, **kwargs) -> httpx.Response:
+        request_start = time.time()
 
-            if response.ok:
-                logging.info(msg)
-            else:
-                logging.warning(f"{msg}, response: {response.text}")
+        request_url = args[1]
 
+        try:
+            response = await func(*args, **kwargs)
+            _log_response(request_url, request_start, response)
             return response
         except Exception as e:
-            # most likely "Max retries exceeded" from the retry adapter
-            logging.error(
-                f"{log_message}{time_response(request_start)}s, ERROR: {e}, traceback: {traceback.format_exc()}"
-            )
+            _log_error(request_url, request_start, e)
             raise
 
     return inner
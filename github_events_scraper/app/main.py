@@ -1,4 +1,5 @@
 import time
+import asyncio
 import logging
 import traceback
 
@@ -6,11 +7,17 @@ from sqlalchemy import create_engine
 
 from app.config import Config
 from app.database.github_event_wrapper import GithubEventWrapper
-from shared_resources.github_event import GithubEvent
-from shared_resources.helpers import time_response, set_logger
+from app.database.event_writer import EventWriter
+from app.database.scrape_checkpoints import ScrapeCheckpoints
+from app.metrics import EVENTS_SCRAPED, EVENTS_DELETED, start_metrics_server
+from shared_resources.github_event import GithubEvent, GithubEventRecord
+from shared_resources.helpers import set_logger
 from shared_resources.database_utils import get_connection_string
 from app.scraping.github_client import GithubClient
+from app.scraping.async_github_client import AsyncGithubClient
 from app.scraping.github_scraper import GithubScraper
+from app.scraping.poll_scheduler import PollScheduler
+from app.scraping.token_pool import TokenPool
 
 
 config = Config()
@@ -20,31 +27,72 @@ db_engine = create_engine(get_connection_string())
 GithubEvent.metadata.create_all(db_engine)
 
 github_event_wrapper = GithubEventWrapper(config=config, db_engine=db_engine)
+event_writer = EventWriter(config=config, github_event_wrapper=github_event_wrapper)
+scrape_checkpoints = ScrapeCheckpoints(config=config, db_engine=db_engine)
 
-github_client = GithubClient(config=config)
+token_pool = TokenPool(config=config)
+github_client = GithubClient(config=config, token_pool=token_pool)
+async_github_client = AsyncGithubClient(config=config, token_pool=token_pool)
 github_scraper = GithubScraper(
     config=config,
     github_client=github_client,
     github_event_wrapper=github_event_wrapper,
+    async_github_client=async_github_client,
 )
+poll_scheduler = PollScheduler(
+    config=config,
+    github_client=(
+        async_github_client if config.GITHUB_ASYNC_SCRAPING else github_client
+    ),
+    token_pool=token_pool,
+)
+
+
+def handle_page_events(github_events: list[GithubEventRecord]):
+    EVENTS_SCRAPED.inc(len(github_events))
+    poll_scheduler.observe_events(github_events)
+    event_writer.put(github_events)
 
 
 if __name__ == "__main__":
 
-    github_event_wrapper.load_event_ids()
+    start_metrics_server(config)
+    # the sources are scraped until their checkpoints, instead of looking up all the stored event ids
+    github_scraper.restore_checkpoints(scrape_checkpoints.load_checkpoints())
+    backfilled_count = github_event_wrapper.backfill_hourly_counts()
+    logging.info(f"Backfilled hourly counts of {backfilled_count} events.")
+    # one loop for all the scrapes, the async client's connections are bound to it
+    scraping_loop = asyncio.new_event_loop()
+    event_writer.start()
 
     while True:
-        loop_start = time.time()
+        due_sources = poll_scheduler.pop_due_sources()
 
         try:
-            github_events = github_scraper.scrape_events()
-            logging.info(f"Scraped {len(github_events)} new events.")
-            inserted_events = github_event_wrapper.insert_multiple_events(
-                github_events=github_events
+            created_count = github_event_wrapper.create_partitions()
+            if created_count:
+                logging.info(f"Created {created_count} events partitions.")
+            # pages are inserted by the event writer while the scraping goes on
+            if config.GITHUB_ASYNC_SCRAPING:
+                scraping_loop.run_until_complete(
+                    github_scraper.scrape_events_async(
+                        due_sources, on_page_events=handle_page_events
+                    )
+                )
+            else:
+                github_scraper.scrape_events(
+                    due_sources, on_page_events=handle_page_events
+                )
+            # untracked events of the sources with many repositories count for their scheduling too
+            poll_scheduler.observe_source_events(github_scraper.pop_source_events())
+            event_writer.flush()
+            scrape_checkpoints.save_checkpoints(
+                checkpoints=github_scraper.pop_new_checkpoints()
             )
-            logging.info(f"Inserted {len(inserted_events)} new events.")
             deleted_count = github_event_wrapper.delete_expired_events()
             logging.info(f"Deleted {deleted_count} old events.")
+            EVENTS_DELETED.inc(deleted_count)
+            poll_scheduler.schedule_scraped(due_sources)
 
         except KeyboardInterrupt:
             break
@@ -52,8 +100,15 @@ if __name__ == "__main__":
             logging.error(
                 f"There was an error in the main loop, ERROR: {e}, traceback: {traceback.format_exc()}"
             )
+            # the scraped events may not be stored, they must not be skipped as not modified next time
+            github_client.clear_conditional_headers()
+            async_github_client.clear_conditional_headers()
+            github_scraper.discard_new_checkpoints()
+            # the sources are scraped again from their old checkpoints, the events are counted again
+            github_scraper.pop_source_events()
+            for source in due_sources:
+                poll_scheduler.schedule_retry(source)
 
-        loop_took = time_response(loop_start)
+        time.sleep(poll_scheduler.get_sleep_time() + 0.01)
 
-        if loop_took < config.GITHUB_REFRESH_RATE:
-            time.sleep(config.GITHUB_REFRESH_RATE - loop_took + 0.01)
+    event_writer.close()
@@ -0,0 +1,71 @@
+
+import logging
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from app.config import Config
+
+PAGES_FETCHED = Counter(
+    "github_events_scraper_pages_fetched_total",
+    "Pages of events fetched from Github API by repository or event source",
+    ["repository"],
+)
+REQUEST_LATENCY = Histogram(
+    "github_events_scraper_request_duration_seconds",
+    "Latency of Github API requests, including retries",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+PAGES_NOT_MODIFIED = Counter(
+    "github_events_scraper_pages_not_modified_total",
+    "Conditional requests of event pages answered with 304 Not Modified",
+)
+RATE_LIMIT_REMAINING = Gauge(
+    "github_events_scraper_rate_limit_remaining",
+    "Remaining Github API requests in the current rate limit window, by index of the authentication token",
+    ["token"],
+)
+POLL_INTERVAL = Gauge(
+    "github_events_scraper_poll_interval_seconds",
+    "Scheduled interval until the next scraping of the repository or event source",
+    ["repository"],
+)
+
+EVENTS_SCRAPED = Counter(
+    "github_events_scraper_events_scraped_total", "Events scraped from Github API"
+)
+EVENTS_INSERTED = Counter(
+    "github_events_scraper_events_inserted_total", "Events inserted to database"
+)
+WRITE_QUEUE_PAGES = Gauge(
+    "github_events_scraper_write_queue_pages",
+    "Pages of scraped events waiting for insert to database",
+)
+EVENTS_DELETED = Counter(
+    "github_events_scraper_events_deleted_total", "Expired events deleted from database"
+)
+INSERT_CONFLICTS = Counter(
+    "github_events_scraper_insert_conflicts_total",
+    "Events skipped by the insert, as they were already in database but not in the scraped event ids",
+)
+
+# hit ratio is dedup hits / dedup lookups, counted by the insert
+DEDUP_LOOKUPS = Counter(
+    "github_events_scraper_dedup_lookups_total",
+    "Event ids looked up in the ids of events already in database",
+)
+DEDUP_HITS = Counter(
+    "github_events_scraper_dedup_hits_total",
+    "Event ids found in the ids of events already in database",
+)
+
+
+def start_metrics_server(config: Config):
+    """
+    Serves the metrics on METRICS_PORT in a background thread, unless it's 0.
+    """
+
+    if not config.METRICS_PORT:
+        return
+
+    start_http_server(config.METRICS_PORT)
+    logging.info(f"Serving metrics on port {config.METRICS_PORT}.")
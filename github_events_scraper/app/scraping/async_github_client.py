@@ -0,0 +1,141 @@
+
+import asyncio
+from collections import defaultdict
+
+import httpx
+
+from app.config import Config
+from app.decorators import track_async_response
+from app.scraping.github_client import BaseGithubClient
+from app.scraping.token_pool import TokenPool
+
+
+class AsyncGithubClient(BaseGithubClient):
+    """
+    Github events API client for concurrent scraping. All requests share one pooled HTTP/2 connection, HTTP/1.1 is
+    used if the server doesn't support it. Concurrent requests are bounded by REQUEST_MAX_CONCURRENCY overall and
+    by REQUEST_MAX_CONCURRENCY_PER_TOKEN for every authentication token.
+
+    The client is bound to the event loop of its first request, it must be used from the same loop.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        token_pool: TokenPool,
+        transport: httpx.AsyncBaseTransport = None,
+    ):
+        """
+        :param transport: custom transport of the HTTP client, e.g. for tests
+        """
+
+        super().__init__(config, token_pool)
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(config.REQUEST_MAX_CONCURRENCY)
+        self._token_semaphores = defaultdict(
+            lambda: asyncio.Semaphore(config.REQUEST_MAX_CONCURRENCY_PER_TOKEN)
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # created lazily, so it's created in the event loop it's used in
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self._config.REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self._config.REQUEST_MAX_CONCURRENCY
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def _send_with_retries(
+        self, url: str, params: dict, headers: dict
+    ) -> httpx.Response:
+        """
+        Retries failed requests, such as timeouts or connection failed, and responses with REQUEST_STATUS_FORCELIST
+        statuses up to REQUEST_MAX_RETRY times, with exponential backoff like the sync client.
+        """
+
+        client = self._get_client()
+        for retry in range(self._config.REQUEST_MAX_RETRY + 1):
+            is_last_try = retry == self._config.REQUEST_MAX_RETRY
+            if retry:
+                await asyncio.sleep(
+                    self._config.REQUEST_BACKOFF_FACTOR * 2 ** (retry - 1)
+                )
+
+            try:
+                response = await client.get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if is_last_try:
+                    raise
+                continue
+
+            if (
+                response.status_code not in self._config.REQUEST_STATUS_FORCELIST
+                or is_last_try
+            ):
+                return response
+
+    @track_async_response
+    async def _get_github_events(
+        self,
+        url: str,
+        authorization_token: str,
+        per_page: int,
+        page_num: int,
+        conditional_headers: dict,
+    ) -> httpx.Response:
+        """
+        Scrape a page from Github events API. It's a separate function for the decorator for tracking purposes.
+
+        :param url: API endpoint url
+        :param authorization_token: github token for scraping. Public repos work without it too, but scraping limits are lower.
+        :param per_page: how many events to get from single request
+        :param page_num: what page of events to get
+        :param conditional_headers: If-None-Match and If-Modified-Since headers of the page
+        :return: response from the request
+        """
+
+        async with self._semaphore, self._token_semaphores[authorization_token]:
+            return await self._send_with_retries(
+                url,
+                params={"per_page": per_page, "page": page_num},
+                headers=self._get_headers(authorization_token, conditional_headers),
+            )
+
+    async def get_github_events(
+        self,
+        source: str,
+        per_page: int,
+        page_num: int,
+    ) -> list[dict] | None:
+        """
+        Scrape a page from Github events API.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param per_page: how many events to get from single request
+        :param page_num: what page of events to get
+        :return: events of the page, empty if the request failed, None if the page didn't change since the last request
+        """
+
+        authorization_token = self._token_pool.get_token()
+        self._get_client().cookies.clear()
+        events_response = await self._get_github_events(
+            self._get_events_url(source),
+            authorization_token,
+            per_page,
+            page_num,
+            self._conditional_headers.get((source, page_num), {}),
+        )
+
+        return self._handle_response(
+            source, authorization_token, page_num, events_response
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
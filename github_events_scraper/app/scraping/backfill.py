@@ -0,0 +1,184 @@
+"""
+Backfills events from GH Archive (https://www.gharchive.org) hourly dumps on local disk, e.g. after an outage or for
+a newly configured repository, which the events API only returns the last 300 events of. Download the hours first:
+
+    wget https://data.gharchive.org/2025-04-07-{0..23}.json.gz
+
+and import them from github_events_scraper directory, the scraper can keep running:
+
+    PYTHONPATH=.:.. python -m app.scraping.backfill 2025-04-07-*.json.gz [--processes 4]
+
+The dumps are decoded in a pool of processes, one dump at a time each, streamed through gzip line by line. Only
+events of GITHUB_REPOSITORIES created within AGGREGATOR_ROLLING_DAYS are kept, and inserted by the same insert as the
+scraped events, so the events already in database are skipped.
+"""
+
+import argparse
+import datetime
+import gzip
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import orjson
+from sqlalchemy import create_engine
+
+from app.config import Config
+from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.database_utils import get_connection_string
+from shared_resources.github_event import GithubEvent, GithubEventRecord
+from shared_resources.helpers import convert_github_datetime, set_logger
+
+
+def get_repositories_pattern(repositories: list[str]) -> re.Pattern:
+    """
+    :return: pattern of the quoted repository names, lines without them aren't decoded at all
+    """
+
+    return re.compile(
+        b"|".join(re.escape(f'"{repository}"'.encode()) for repository in repositories),
+        re.IGNORECASE,
+    )
+
+
+def read_archive(
+    path: str, repositories: list[str], cutoff_datetime: datetime.datetime
+) -> tuple[int, list[GithubEventRecord]]:
+    """
+    :param path: GH Archive hourly dump, gzipped JSON event per line
+    :param repositories: repositories in format {owner}/{repo_name} to keep events of
+    :param cutoff_datetime: events created before it aren't kept
+    :return: number of events in the dump, and the kept events
+    """
+
+    repositories_pattern = get_repositories_pattern(repositories)
+    tracked_repositories = {repository.lower() for repository in repositories}
+    events_count = 0
+    github_events = []
+
+    with gzip.open(path, "rb") as archive:
+        for line in archive:
+            events_count += 1
+            # the name may be anywhere in the line, e.g. in a commit message, the match is only a candidate
+            if not repositories_pattern.search(line):
+                continue
+
+            event = orjson.loads(line)
+            if event["repo"]["name"].lower() not in tracked_repositories:
+                continue
+            created_at = convert_github_datetime(event["created_at"])
+            if created_at < cutoff_datetime:
+                continue
+            github_events.append(
+                GithubEventRecord(
+                    id=event["id"],
+                    type=event["type"],
+                    created_at=created_at,
+                    repository=event["repo"]["name"],
+                )
+            )
+
+    return events_count, github_events
+
+
+def read_archives(
+    config: Config,
+    paths: list[str],
+    cutoff_datetime: datetime.datetime,
+    processes: int,
+) -> Iterator[tuple[str, int, list[GithubEventRecord]]]:
+    """
+    :return: path, number of events and the kept events of every dump, in order of the paths
+    """
+
+    arguments = (
+        paths,
+        [config.GITHUB_REPOSITORIES] * len(paths),
+        [cutoff_datetime] * len(paths),
+    )
+    if processes == 1:
+        for path, result in zip(paths, map(read_archive, *arguments)):
+            yield path, *result
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for path, result in zip(paths, executor.map(read_archive, *arguments)):
+            yield path, *result
+
+
+def backfill(
+    config: Config,
+    github_event_wrapper: GithubEventWrapper,
+    paths: list[str],
+    processes: int,
+) -> int:
+    """
+    Inserts the events of the dumps in batches of DATABASE_WRITE_BATCH_SIZE events, as they're decoded.
+
+    :param config: config with the repositories
+    :param github_event_wrapper: wrapper of the insert, its cached event ids should be loaded
+    :param paths: GH Archive hourly dumps
+    :param processes: number of processes decoding the dumps
+    :return number of inserted events
+    """
+
+    created_count = github_event_wrapper.create_partitions()
+    if created_count:
+        logging.info(f"Created {created_count} events partitions.")
+
+    read_count = inserted_count = 0
+    start = time.perf_counter()
+    for path, events_count, github_events in read_archives(
+        config, paths, github_event_wrapper.get_event_cutoff_datetime(), processes
+    ):
+        read_count += events_count
+        for batch_start in range(
+            0, len(github_events), config.DATABASE_WRITE_BATCH_SIZE
+        ):
+            inserted_count += len(
+                github_event_wrapper.insert_multiple_events(
+                    github_events=github_events[
+                        batch_start : batch_start + config.DATABASE_WRITE_BATCH_SIZE
+                    ]
+                )
+            )
+        logging.info(
+            f"Archive: {path}, read {events_count} events, kept {len(github_events)} events."
+        )
+
+    took = time.perf_counter() - start
+    logging.info(
+        f"Read {read_count} events in {took:.1f}s ({read_count / max(took, 1e-9):.0f} events/s), "
+        f"inserted {inserted_count} events."
+    )
+    return inserted_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("paths", nargs="+", help="GH Archive hourly .json.gz dumps")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes decoding the dumps, all CPUs by default",
+    )
+    args = parser.parse_args()
+
+    config = Config()
+    set_logger(config)
+    db_engine = create_engine(get_connection_string())
+    GithubEvent.metadata.create_all(db_engine)
+    github_event_wrapper = GithubEventWrapper(config=config, db_engine=db_engine)
+    github_event_wrapper.load_event_ids()
+    backfill(
+        config=config,
+        github_event_wrapper=github_event_wrapper,
+        paths=args.paths,
+        processes=args.processes,
+    )
@@ -0,0 +1,78 @@
+
+import re
+
+from app.config import Config
+
+# GITHUB_EVENT_SOURCES entries, besides repositories in format {owner}/{repo_name}
+PUBLIC_SOURCE = "public"
+ORGANIZATION_PREFIX = "org:"
+USER_PREFIX = "user:"
+
+
+def validate_event_source(source: str):
+    if not re.fullmatch(
+        rf"({ORGANIZATION_PREFIX}|{USER_PREFIX})[\w.-]+|{PUBLIC_SOURCE}", source
+    ):
+        raise ValueError(
+            f"Event source {source} doesn't match schema '{ORGANIZATION_PREFIX}owner', '{USER_PREFIX}owner' "
+            f"or '{PUBLIC_SOURCE}'"
+        )
+
+
+def is_repository_source(source: str) -> bool:
+    """
+    :return: whether the source is a single repository, the other sources have events of many repositories
+    """
+
+    return "/" in source
+
+
+def get_events_path(source: str) -> str:
+    """
+    :param source: repository in format {owner}/{repo_name}, or GITHUB_EVENT_SOURCES entry
+    :return: path of the events endpoint of the source in Github API
+    """
+
+    if is_repository_source(source):
+        return f"repos/{source}/events"
+    if source.startswith(ORGANIZATION_PREFIX):
+        return f"orgs/{source.removeprefix(ORGANIZATION_PREFIX)}/events"
+    if source.startswith(USER_PREFIX):
+        return f"users/{source.removeprefix(USER_PREFIX)}/events"
+    return "events"
+
+
+def get_repository_sources(config: Config) -> dict[str, str]:
+    """
+    Repositories of an organization in GITHUB_EVENT_SOURCES are scraped from the organization's events, one request
+    for all of them, the other repositories from their own events. A user's events are only the events the user
+    performed, not the events of others on the user's repositories, and the public events are only a sample of all
+    events, so they don't replace scraping of any repository.
+
+    :return: configured repository -> source it's scraped from
+    """
+
+    organization_sources = {
+        source.removeprefix(ORGANIZATION_PREFIX).lower(): source
+        for source in config.GITHUB_EVENT_SOURCES
+        if source.startswith(ORGANIZATION_PREFIX)
+    }
+
+    return {
+        repository: organization_sources.get(
+            repository.split("/")[0].lower(), repository
+        )
+        for repository in config.GITHUB_REPOSITORIES
+    }
+
+
+def get_event_sources(config: Config) -> list[str]:
+    """
+    :return: sources to scrape, repositories not scraped from their owner's events and GITHUB_EVENT_SOURCES
+    """
+
+    return list(
+        dict.fromkeys(
+            [*get_repository_sources(config).values(), *config.GITHUB_EVENT_SOURCES]
+        )
+    )
@@ -1,17 +1,175 @@
 
+import time
+
+import orjson
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
 from app.config import Config
 from app.decorators import track_response
+from app.metrics import PAGES_NOT_MODIFIED
+from app.scraping.event_source import get_events_path
+from app.scraping.token_pool import TokenPool
+
 
+class BaseGithubClient:
+    """
+    Requests are conditional, with the ETag and Last-Modified of the last response of the same source page. Github
+    answers them with 304 Not Modified, which doesn't count against the rate limit, when the page didn't change.
+
+    Every request takes the authentication token with the most remaining requests from the token pool.
+    """
 
-class GithubClient:
     API_URL = "https://api.github.com"
 
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, token_pool: TokenPool):
         self._config = config
+        self._token_pool = token_pool
+        # (source, page_num) -> conditional headers of the next request of the page
+        self._conditional_headers: dict[tuple[str, int], dict] = {}
+        # source -> X-Poll-Interval in seconds, and monotonic time of its last poll (first page request)
+        self._poll_intervals: dict[str, int] = {}
+        self._polled_at: dict[str, float] = {}
+
+    def _get_events_url(self, source: str) -> str:
+        return f"{self.API_URL}/{get_events_path(source)}"
+
+    @staticmethod
+    def _get_headers(authorization_token: str, conditional_headers: dict) -> dict:
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+            **conditional_headers,
+        }
+
+        if authorization_token:
+            headers["Authorization"] = f"Bearer {authorization_token}"
+
+        return headers
+
+    def _observe_rate_limit(self, authorization_token: str, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_at = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset_at is None:
+            return
+
+        self._token_pool.observe_rate_limit(
+            authorization_token, int(remaining), float(reset_at)
+        )
+
+    def _handle_response(
+        self, source: str, authorization_token: str, page_num: int, response
+    ) -> list[dict] | None:
+        """
+        Remembers the rate limit, poll interval and conditional headers of the response.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param authorization_token: github token of the request
+        :param page_num: requested page of events
+        :param response: response of requests or httpx
+        :return: events of the page, empty if the request failed, None if the page didn't change since the last request
+        """
+
+        self._observe_rate_limit(authorization_token, response.headers)
+        if page_num == 1:
+            self._polled_at[source] = time.monotonic()
+        poll_interval = response.headers.get("X-Poll-Interval")
+        if poll_interval is not None:
+            self._poll_intervals[source] = int(poll_interval)
+
+        if response.status_code == 304:
+            PAGES_NOT_MODIFIED.inc()
+            return None
+        if not 200 <= response.status_code < 300:
+            return []
+
+        conditional_headers = {}
+        if etag := response.headers.get("ETag"):
+            conditional_headers["If-None-Match"] = etag
+        if last_modified := response.headers.get("Last-Modified"):
+            conditional_headers["If-Modified-Since"] = last_modified
+        self._conditional_headers[(source, page_num)] = conditional_headers
+
+        # orjson decodes the page about twice as fast as json of requests and httpx
+        return orjson.loads(response.content)
+
+    def get_poll_interval(self, source: str) -> int:
+        """
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :return: X-Poll-Interval of the source in seconds, 0 before the first response
+        """
+
+        return self._poll_intervals.get(source, 0)
+
+    def get_poll_wait(self, source: str) -> float:
+        """
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :return: seconds until the X-Poll-Interval of the source passes since its last poll, 0 if it did already
+        """
+
+        polled_at = self._polled_at.get(source)
+        if polled_at is None:
+            return 0
+        return max(polled_at + self.get_poll_interval(source) - time.monotonic(), 0)
+
+    def is_poll_due(self, source: str) -> bool:
+        """
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :return: False if the source was polled more recently than its X-Poll-Interval
+        """
+
+        return not self.get_poll_wait(source)
+
+    def clear_conditional_headers(self, source: str | None = None):
+        """
+        Makes the next requests unconditional, e.g. when the scraped events weren't stored, so they aren't lost behind
+        304 responses.
+
+        :param source: event source, all sources if None
+        """
+
+        if source is None:
+            self._conditional_headers.clear()
+            return
+
+        for key in list(self._conditional_headers):
+            if key[0] == source:
+                del self._conditional_headers[key]
+
+    def get_validators(self, source: str) -> tuple[str | None, str | None]:
+        """
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :return: ETag and Last-Modified of the last response of the first page of the source
+        """
+
+        conditional_headers = self._conditional_headers.get((source, 1), {})
+        return conditional_headers.get("If-None-Match"), conditional_headers.get(
+            "If-Modified-Since"
+        )
+
+    def set_validators(self, source: str, etag: str | None, last_modified: str | None):
+        """
+        Makes the next request of the first page of the source conditional, e.g. with the validators stored before
+        a restart.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param etag: ETag of the first page
+        :param last_modified: Last-Modified of the first page
+        """
+
+        conditional_headers = {}
+        if etag:
+            conditional_headers["If-None-Match"] = etag
+        if last_modified:
+            conditional_headers["If-Modified-Since"] = last_modified
+        self._conditional_headers[(source, 1)] = conditional_headers
+
+
+class GithubClient(BaseGithubClient):
+
+    def __init__(self, config: Config, token_pool: TokenPool):
+        super().__init__(config, token_pool)
         self._session = requests.Session()
         self._mount_session()
 
@@ -30,7 +188,12 @@ class GithubClient:
 
     @track_response
     def _get_github_events(
-        self, url: str, authorization_token: str, per_page: int, page_num: int
+        self,
+        url: str,
+        authorization_token: str,
+        per_page: int,
+        page_num: int,
+        conditional_headers: dict,
     ) -> requests.Response:
         """
         Scrape a page from Github events API. It's a separate function for the decorator for tracking purposes.
@@ -39,49 +202,42 @@ class GithubClient:
         :param authorization_token: github token for scraping. Public repos work without it too, but scraping limits are lower.
         :param per_page: how many events to get from single request
         :param page_num: what page of events to get
+        :param conditional_headers: If-None-Match and If-Modified-Since headers of the page
         :return: response from the request
         """
 
-        headers = {
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28",
-        }
-
-        if authorization_token:
-            headers["Authorization"] = f"Bearer {authorization_token}"
-
         return self._session.get(
             url,
             params={"per_page": per_page, "page": page_num},
-            headers=headers,
+            headers=self._get_headers(authorization_token, conditional_headers),
             timeout=self._config.REQUEST_TIMEOUT,
         )
 
     def get_github_events(
         self,
-        owner: str,
-        repository_name: str,
-        authorization_token: str,
+        source: str,
         per_page: int,
         page_num: int,
-    ) -> list[dict]:
+    ) -> list[dict] | None:
         """
         Scrape a page from Github events API.
 
-        :param owner: repository owner name
-        :param repository_name: repository name
-        :param authorization_token: github token for scraping. Public repos work without it too, but scraping limits are lower.
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
         :param per_page: how many events to get from single request
         :param page_num: what page of events to get
-        :return:
+        :return: events of the page, empty if the request failed, None if the page didn't change since the last request
         """
 
+        authorization_token = self._token_pool.get_token()
         self._session.cookies.clear()
         events_response = self._get_github_events(
-            f"{self.API_URL}/repos/{owner}/{repository_name}/events",
+            self._get_events_url(source),
             authorization_token,
             per_page,
             page_num,
+            self._conditional_headers.get((source, page_num), {}),
         )
 
-        return events_response.json() if events_response.ok else []
+        return self._handle_response(
+            source, authorization_token, page_num, events_response
+        )
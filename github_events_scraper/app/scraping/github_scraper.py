@@ -1,31 +1,65 @@
 
 import re
+import asyncio
+import datetime
 import logging
 import traceback
 import math
 import time
+from typing import Callable
 
 from app.config import Config
-from app.scraping.github_client import GithubClient
+from app.scraping.github_client import BaseGithubClient, GithubClient
+from app.scraping.async_github_client import AsyncGithubClient
+from app.scraping.event_source import (
+    get_event_sources,
+    is_repository_source,
+    validate_event_source,
+)
 from app.database.github_event_wrapper import GithubEventWrapper
+from app.database.scrape_checkpoints import ScrapeCheckpoint
+from app.metrics import PAGES_FETCHED
 from shared_resources.helpers import convert_github_datetime
-from shared_resources.github_event import GithubEvent
+from shared_resources.github_event import GithubEventRecord
+
+PageEventsHandler = Callable[[list[GithubEventRecord]], None]
 
 
 class GithubScraper:
 
     GITHUB_PER_PAGE = 100
+    # Github events API doesn't return more events of a source
+    GITHUB_EVENTS_HORIZON = 300
 
     def __init__(
         self,
         config: Config,
         github_client: GithubClient,
         github_event_wrapper: GithubEventWrapper,
+        async_github_client: AsyncGithubClient | None = None,
     ):
+        """
+        :param async_github_client: client of the async scraping by scrape_events_async
+        """
+
         self._config = config
         self._github_client = github_client
+        self._async_github_client = async_github_client
         self._github_event_wrapper = github_event_wrapper
         self._validate()
+        self._sources = get_event_sources(config)
+        # events of the sources with many repositories are kept only for the configured repositories
+        self._tracked_repositories = {
+            repository.lower() for repository in config.GITHUB_REPOSITORIES
+        }
+        self._pages_fetched = {
+            source: PAGES_FETCHED.labels(repository=source) for source in self._sources
+        }
+        # source -> newest event of its stored scraping, and of the scraping waiting for its events to be stored
+        self._checkpoints: dict[str, ScrapeCheckpoint] = {}
+        self._new_checkpoints: dict[str, ScrapeCheckpoint] = {}
+        # source -> count and creation time of the oldest of all its new events, tracked or not, for its scheduling
+        self._source_events: dict[str, tuple[int, datetime.datetime]] = {}
 
     @staticmethod
     def _validate_repository(repository: str):
@@ -37,6 +71,8 @@ class GithubScraper:
     def _validate(self):
         if type(self._config.GITHUB_REPOSITORIES) != list:
             raise TypeError("Github repositories must be a list")
+        if type(self._config.GITHUB_EVENT_SOURCES) != list:
+            raise TypeError("Github event sources must be a list")
         if type(self._config.GITHUB_AUTHENTICATION_TOKENS) != list:
             raise TypeError("Github authentication_tokens must be a list")
         if len(self._config.GITHUB_REPOSITORIES) == 0:
@@ -45,108 +81,368 @@ class GithubScraper:
             raise ValueError(
                 "Github authentication_tokens must contain at least 1 authentication token"
             )
-        if len(self._config.GITHUB_REPOSITORIES) > self._config.GITHUB_MAX_REPOSITORIES:
-            raise ValueError(
-                f"There can't be more than {self._config.GITHUB_MAX_REPOSITORIES} repositories"
-            )
-        if len(self._config.GITHUB_REPOSITORIES) != len(
-            self._config.GITHUB_AUTHENTICATION_TOKENS
-        ):
-            raise ValueError(
-                f"Github repositories must be the same amount of elements as authentication_tokens"
-            )
 
         for repository_name in self._config.GITHUB_REPOSITORIES:
             self._validate_repository(repository_name)
+        for source in self._config.GITHUB_EVENT_SOURCES:
+            validate_event_source(source)
+
+    def _get_page_count(self, source: str) -> int:
+        if not is_repository_source(source):
+            # events of all the repositories of the source are needed
+            return math.ceil(self.GITHUB_EVENTS_HORIZON / self.GITHUB_PER_PAGE)
+        return math.ceil(self._config.AGGREGATOR_ROLLING_EVENTS // self.GITHUB_PER_PAGE)
 
-    def _scrape_repository(
-        self, repository: str, authentication_token: str
-    ) -> list[GithubEvent]:
+    def _get_due_sources(
+        self, github_client: BaseGithubClient, sources: list[str] | None
+    ) -> list[str]:
+        """
+        :param github_client: client of the scraping
+        :param sources: sources to scrape, all configured sources if None
+        :return: sources, except the ones polled more recently than their X-Poll-Interval
         """
-        Scrape repository events page for page, until the rolling events limit is reached.
 
-        We stop scraping a new page if we find an event that we already scraped (old data),
-        or we find that the event is older than configured rolling days limit.
+        due_sources = []
+        for source in self._sources if sources is None else sources:
+            if github_client.is_poll_due(source):
+                due_sources.append(source)
+            else:
+                logging.info(f"Repo: {source}, skipped before its poll interval.")
+
+        return due_sources
+
+    def restore_checkpoints(self, checkpoints: dict[str, ScrapeCheckpoint]):
+        """
+        Sources are scraped until their checkpoint, and their first pages are requested with its validators.
 
-        :param repository: Github repository name in format {owner}/{repo_name}
-        :param authentication_token: Authentication token for scraping that repository, can be any for public repos.
-        :return: Scraped events from repository.
+        :param checkpoints: source -> its stored checkpoint
         """
 
-        repository_events = []
+        self._checkpoints = dict(checkpoints)
+        for github_client in (self._github_client, self._async_github_client):
+            if github_client is None:
+                continue
+            for source, checkpoint in checkpoints.items():
+                github_client.set_validators(
+                    source, checkpoint.etag, checkpoint.last_modified
+                )
 
-        owner, repository_name = repository.split("/")
+    def pop_new_checkpoints(self) -> dict[str, ScrapeCheckpoint]:
+        """
+        Call once the scraped events are stored, the sources are scraped until the new checkpoints from then on.
 
-        dont_continue = False
-        events_num = 0
+        :return: source -> its new checkpoint, to be stored
+        """
 
-        for page_num in range(
-            1,
-            math.ceil(self._config.AGGREGATOR_ROLLING_EVENTS // self.GITHUB_PER_PAGE)
-            + 1,
-        ):
-            github_events_response = self._github_client.get_github_events(
-                owner,
-                repository_name,
-                authentication_token,
-                self.GITHUB_PER_PAGE,
-                page_num,
-            )
-            page_events = []
-
-            for event in github_events_response:
-                created_event_datetime = convert_github_datetime(event["created_at"])
-                if (
-                    created_event_datetime
-                    < self._github_event_wrapper.get_event_cutoff_datetime()
-                    or self._github_event_wrapper.is_event_id_in_db(event["id"])
-                ):
-                    dont_continue = True
-                    break
+        new_checkpoints, self._new_checkpoints = self._new_checkpoints, {}
+        self._checkpoints.update(new_checkpoints)
+        return new_checkpoints
+
+    def discard_new_checkpoints(self):
+        """
+        Call when the scraped events weren't stored, so the sources are scraped again until their old checkpoints.
+        """
 
-                github_event = GithubEvent(
+        self._new_checkpoints.clear()
+
+    def pop_source_events(self) -> dict[str, tuple[int, datetime.datetime]]:
+        """
+        Events of untracked repositories fill the events API horizon of a source with many repositories too, so it's
+        scheduled by all of them, not only by the scraped ones.
+
+        :return: source -> count and creation time of the oldest of all new events of the source since the last call
+        """
+
+        source_events, self._source_events = self._source_events, {}
+        return source_events
+
+    def _observe_source_events(
+        self, source: str, events_count: int, oldest_created_at: datetime.datetime
+    ):
+        observed_count, observed_oldest_created_at = self._source_events.get(
+            source, (0, oldest_created_at)
+        )
+        self._source_events[source] = (
+            observed_count + events_count,
+            min(observed_oldest_created_at, oldest_created_at),
+        )
+
+    def _set_new_checkpoint(
+        self,
+        source: str,
+        github_client: BaseGithubClient,
+        first_page_response: list[dict] | None,
+    ):
+        """
+        :param first_page_response: events of the first page of a finished scraping of the source
+        """
+
+        if not first_page_response:
+            # not modified, or the request failed, the checkpoint stays
+            return
+
+        newest_event = first_page_response[0]
+        self._new_checkpoints[source] = ScrapeCheckpoint(
+            newest_event["id"],
+            convert_github_datetime(newest_event["created_at"]),
+            *github_client.get_validators(source),
+        )
+
+    def _process_page(
+        self,
+        source: str,
+        page_num: int,
+        github_events_response: list[dict] | None,
+    ) -> tuple[list[GithubEventRecord], bool]:
+        """
+        Converts scraped events of a page until an event that we already scraped (old data), the checkpoint of the
+        source or an event older than configured rolling days limit. Events of a source with many repositories are demultiplexed by their
+        repository, only the configured repositories are kept.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param page_num: number of the page
+        :param github_events_response: events of the page, None if it didn't change since the last scrape
+        :return: new events of the page, and whether the next page shouldn't be scraped
+        """
+
+        self._pages_fetched[source].inc()
+        if github_events_response is None:
+            # the page didn't change, so all its events were already scraped
+            logging.info(f"Repo: {source}, page: {page_num}, not modified.")
+            return [], True
+
+        # the events within the rolling days, only their kept fields, looked up in database at once
+        cutoff_datetime = self._github_event_wrapper.get_event_cutoff_datetime()
+        checkpoint = self._checkpoints.get(source)
+        is_repository = is_repository_source(source)
+        page_events = []
+        # creation times of all events of the page, tracked or not, and the number of them up to each kept event
+        source_created_ats = []
+        page_positions = []
+        dont_continue = False
+        for event in github_events_response:
+            created_event_datetime = convert_github_datetime(event["created_at"])
+            if created_event_datetime < cutoff_datetime:
+                dont_continue = True
+                break
+            # events created in the same second as the checkpoint may be on either side of it, database skips them
+            if checkpoint is not None and (
+                event["id"] == checkpoint.event_id
+                or created_event_datetime < checkpoint.created_at
+            ):
+                logging.info(f"Repo: {source}, page: {page_num}, reached checkpoint.")
+                dont_continue = True
+                break
+            source_created_ats.append(created_event_datetime)
+            if (
+                not is_repository
+                and event["repo"]["name"].lower() not in self._tracked_repositories
+            ):
+                continue
+            page_events.append(
+                GithubEventRecord(
                     id=event["id"],
                     type=event["type"],
-                    created_at=convert_github_datetime(event["created_at"]),
+                    created_at=created_event_datetime,
                     repository=event["repo"]["name"],
                 )
-                page_events.append(github_event)
-                events_num += 1
+            )
+            page_positions.append(len(source_created_ats))
+        event_ids_in_db = self._github_event_wrapper.get_event_ids_in_db(
+            [(event.id, event.created_at) for event in page_events]
+        )
 
-            logging.info(
-                f"Repo: {repository}, page: {page_num}, scraped {len(page_events)} events."
+        for i, event in enumerate(page_events):
+            if event.id in event_ids_in_db:
+                dont_continue = True
+                page_events = page_events[:i]
+                # the events from the scraped one on are old
+                del source_created_ats[page_positions[i] - 1 :]
+                break
+
+        if source_created_ats:
+            self._observe_source_events(
+                source, len(source_created_ats), min(source_created_ats)
+            )
+        logging.info(
+            f"Repo: {source}, page: {page_num}, scraped {len(page_events)} events."
+        )
+
+        return page_events, (
+            dont_continue or len(github_events_response) < self.GITHUB_PER_PAGE
+        )
+
+    @staticmethod
+    def _handle_page_events(
+        page_events: list[GithubEventRecord], on_page_events: PageEventsHandler
+    ) -> int:
+        if page_events:
+            on_page_events(page_events)
+        return len(page_events)
+
+    def _scrape_source(self, source: str, on_page_events: PageEventsHandler) -> int:
+        """
+        Scrape events of the source page for page, until the rolling events limit is reached.
+
+        We stop scraping a new page if we find an event that we already scraped (old data), the checkpoint of the
+        source, or we find that the event is older than configured rolling days limit. The newest event becomes the
+        new checkpoint of the source, once the events are stored.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param on_page_events: called with new events of every page
+        :return: number of scraped events from source.
+        """
+
+        events_count = 0
+        first_page_response = None
+
+        for page_num in range(1, self._get_page_count(source) + 1):
+            github_events_response = self._github_client.get_github_events(
+                source,
+                self.GITHUB_PER_PAGE,
+                page_num,
+            )
+            if page_num == 1:
+                first_page_response = github_events_response
+            page_events, dont_continue = self._process_page(
+                source, page_num, github_events_response
             )
-            repository_events.extend(page_events)
+            events_count += self._handle_page_events(page_events, on_page_events)
 
             time.sleep(0.2)
 
-            if dont_continue or len(github_events_response) < self.GITHUB_PER_PAGE:
+            if dont_continue:
                 break
 
-        return repository_events
+        self._set_new_checkpoint(source, self._github_client, first_page_response)
+        return events_count
 
-    def scrape_events(self) -> list[GithubEvent]:
+    async def _scrape_source_async(
+        self, source: str, on_page_events: PageEventsHandler
+    ) -> int:
         """
-        Scrape events from all configured repositories
+        Same as _scrape_source, with the async client and without the sleep between pages, the client bounds
+        the concurrent requests instead.
 
-        :return: Scraped events from all repositories.
+        When a page is all new events, the next pages are likely needed too, so GITHUB_PREFETCH_PAGES pages after
+        the next one are requested speculatively, and discarded if the scraping stops before them.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param on_page_events: called with new events of every page
+        :return: number of scraped events from source.
         """
 
-        github_events = []
+        events_count = 0
+        first_page_response = None
 
-        for i, repository in enumerate(self._config.GITHUB_REPOSITORIES):
-            authentication_token = self._config.GITHUB_AUTHENTICATION_TOKENS[i]
+        page_count = self._get_page_count(source)
+        page_requests: dict[int, asyncio.Task] = {}
 
+        def request_page(page_num: int):
+            if page_num <= page_count and page_num not in page_requests:
+                page_requests[page_num] = asyncio.create_task(
+                    self._async_github_client.get_github_events(
+                        source,
+                        self.GITHUB_PER_PAGE,
+                        page_num,
+                    )
+                )
+
+        request_page(1)
+        try:
+            for page_num in range(1, page_count + 1):
+                github_events_response = await page_requests.pop(page_num)
+                if page_num == 1:
+                    first_page_response = github_events_response
+                page_events, dont_continue = self._process_page(
+                    source, page_num, github_events_response
+                )
+                events_count += self._handle_page_events(page_events, on_page_events)
+
+                if dont_continue:
+                    break
+
+                for next_page_num in range(
+                    page_num + 1, page_num + 2 + self._config.GITHUB_PREFETCH_PAGES
+                ):
+                    request_page(next_page_num)
+        finally:
+            for page_request in page_requests.values():
+                page_request.cancel()
+            await asyncio.gather(*page_requests.values(), return_exceptions=True)
+
+        self._set_new_checkpoint(source, self._async_github_client, first_page_response)
+        return events_count
+
+    def scrape_events(
+        self,
+        sources: list[str] | None = None,
+        on_page_events: PageEventsHandler | None = None,
+    ) -> list[GithubEventRecord]:
+        """
+        Scrape events from all configured sources, the repositories and GITHUB_EVENT_SOURCES
+
+        :param sources: sources to scrape, all configured sources if None
+        :param on_page_events: called with new events of every page as soon as it's scraped, instead of returning
+            them, so they don't pile up in memory
+        :return: Scraped events from all repositories, empty with on_page_events.
+        """
+
+        github_events = []
+
+        for source in self._get_due_sources(self._github_client, sources):
             try:
-                events = self._scrape_repository(repository, authentication_token)
-                logging.info(f"Repo: {repository}, scraped {len(events)} events.")
-                github_events.extend(events)
+                events_count = self._scrape_source(
+                    source, on_page_events or github_events.extend
+                )
+                logging.info(f"Repo: {source}, scraped {events_count} events.")
             except KeyboardInterrupt:
                 raise
             except Exception as e:
                 logging.error(
-                    f"Error during scraping of repository events for: {repository}"
+                    f"Error during scraping of repository events for: {source}"
                     f", ERROR: {e}, traceback: {traceback.format_exc()}"
                 )
+                self._github_client.clear_conditional_headers(source)
+
+        return github_events
+
+    async def scrape_events_async(
+        self,
+        sources: list[str] | None = None,
+        on_page_events: PageEventsHandler | None = None,
+    ) -> list[GithubEventRecord]:
+        """
+        Scrape events from all configured sources concurrently, with the async client.
+
+        :param sources: sources to scrape, all configured sources if None
+        :param on_page_events: called with new events of every page as soon as it's scraped, instead of returning
+            them. It's called in the event loop, so blocking in it holds back all the scraping.
+        :return: Scraped events from all repositories, empty with on_page_events.
+        """
+
+        github_events = []
+
+        due_sources = self._get_due_sources(self._async_github_client, sources)
+        sources_events_counts = await asyncio.gather(
+            *(
+                self._scrape_source_async(
+                    source, on_page_events or github_events.extend
+                )
+                for source in due_sources
+            ),
+            return_exceptions=True,
+        )
+
+        for source, events_count in zip(due_sources, sources_events_counts):
+            if isinstance(events_count, Exception):
+                logging.error(
+                    f"Error during scraping of repository events for: {source}"
+                    f", ERROR: {events_count}, traceback: {''.join(traceback.format_exception(events_count))}"
+                )
+                self._async_github_client.clear_conditional_headers(source)
+                continue
+
+            logging.info(f"Repo: {source}, scraped {events_count} events.")
 
         return github_events
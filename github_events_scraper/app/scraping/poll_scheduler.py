@@ -0,0 +1,281 @@
+
+import datetime
+import heapq
+import math
+import time
+
+from app.config import Config
+from app.metrics import POLL_INTERVAL
+from app.scraping.event_source import (
+    PUBLIC_SOURCE,
+    get_event_sources,
+    get_repository_sources,
+    is_repository_source,
+)
+from app.scraping.github_client import BaseGithubClient
+from app.scraping.token_pool import TokenPool
+from shared_resources.github_event import GithubEventRecord
+
+
+class PollScheduler:
+    """
+    Schedules the scraping of every source separately, repositories and GITHUB_EVENT_SOURCES, in a heap keyed by the
+    time the source is due.
+
+    The interval of a source is learned from its recent event rate, so the source is scraped again by the time GITHUB_REFRESH_TARGET_FILL of the events API horizon is filled with new events. It's kept between
+    GITHUB_MIN_REFRESH_RATE and GITHUB_REFRESH_RATE, and never shorter than the X-Poll-Interval of the source. The
+    public events are scraped every GITHUB_MIN_REFRESH_RATE, events of all Github fill their horizon in seconds.
+
+    The intervals are lengthened when the sources would use more requests than the tokens of the pool have left
+    until their rate limits reset, and the repositories wait for the first reset when every token has only
+    GITHUB_RATE_LIMIT_RESERVE requests left.
+    """
+
+    # Github events API doesn't return more events of a repository
+    GITHUB_EVENTS_HORIZON = 300
+    GITHUB_PER_PAGE = 100
+    # weight of the last measured event rate in the average
+    EVENT_RATE_SMOOTHING = 0.5
+
+    def __init__(
+        self, config: Config, github_client: BaseGithubClient, token_pool: TokenPool
+    ):
+        """
+        :param github_client: client of the scraping, tracks poll intervals from Github responses
+        :param token_pool: tokens of the scraping, tracks their rate limits from Github responses
+        """
+
+        self._config = config
+        self._github_client = github_client
+        self._token_pool = token_pool
+        self._events_horizon = min(
+            self.GITHUB_EVENTS_HORIZON, config.AGGREGATOR_ROLLING_EVENTS
+        )
+
+        sources = get_event_sources(config)
+        now = time.time()
+        self._due_heap = [(now, source) for source in sources]
+        heapq.heapify(self._due_heap)
+        # source -> events per second, expected requests per second and time of the last scrape
+        self._event_rates: dict[str, float] = {}
+        self._requests_rates: dict[str, float] = {}
+        self._scraped_at: dict[str, float] = {}
+        # repository -> source it's scraped from, Github repository names are case-insensitive
+        self._repository_sources = {
+            repository.lower(): source
+            for repository, source in get_repository_sources(config).items()
+        }
+        # source -> new events count and creation time of the oldest one, of the scraping in progress
+        self._observed_events: dict[str, tuple[int, datetime.datetime]] = {}
+        # sum of the expected requests per second, kept up to date so scheduling doesn't go through all sources
+        self._requests_rate = 0
+        self._poll_intervals = {
+            source: POLL_INTERVAL.labels(repository=source) for source in sources
+        }
+
+    def pop_due_sources(self) -> list[str]:
+        """
+        Sources polled more recently than their X-Poll-Interval are due again once it passes, without measuring
+        their event rate, as they aren't scraped.
+
+        :return: sources due for scraping, they must be scheduled again after the scraping
+        """
+
+        now = time.time()
+        due_sources = []
+        while self._due_heap and self._due_heap[0][0] <= now:
+            source = heapq.heappop(self._due_heap)[1]
+            poll_wait = self._github_client.get_poll_wait(source)
+            if poll_wait:
+                heapq.heappush(self._due_heap, (now + poll_wait, source))
+            else:
+                due_sources.append(source)
+
+        return due_sources
+
+    def get_sleep_time(self) -> float:
+        """
+        :return: seconds until the next repository is due
+        """
+
+        if not self._due_heap:
+            return self._config.GITHUB_MIN_REFRESH_RATE
+        return max(self._due_heap[0][0] - time.time(), 0)
+
+    def _observe(
+        self, source: str, events_count: int, oldest_created_at: datetime.datetime
+    ):
+        observed_count, observed_oldest_created_at = self._observed_events.get(
+            source, (0, oldest_created_at)
+        )
+        self._observed_events[source] = (
+            observed_count + events_count,
+            min(observed_oldest_created_at, oldest_created_at),
+        )
+
+    def observe_events(self, github_events: list[GithubEventRecord]):
+        """
+        Counts new events of the repositories scraped from their own events, for the scheduling of their source once
+        it's scraped. Events of the repositories found by the other sources count towards their own sources too.
+
+        :param github_events: new events, e.g. of a scraped page
+        """
+
+        for event in github_events:
+            # the configured name may differ in case from the one in the events
+            source = self._repository_sources.get(event.repository.lower())
+            if source is not None and is_repository_source(source):
+                self._observe(source, 1, event.created_at)
+
+    def observe_source_events(
+        self, source_events: dict[str, tuple[int, datetime.datetime]]
+    ):
+        """
+        Counts new events of the sources with many repositories, all of them fill the horizon of the source, not only
+        the events of the configured repositories.
+
+        :param source_events: source -> count and creation time of the oldest of all its new events
+        """
+
+        for source, (events_count, oldest_created_at) in source_events.items():
+            if not is_repository_source(source):
+                self._observe(source, events_count, oldest_created_at)
+
+    def _measure_event_rate(
+        self,
+        source: str,
+        events_count: int,
+        oldest_created_at: datetime.datetime | None,
+        now: float,
+    ) -> float:
+        """
+        Events per second since the last scrape, or since the oldest event on the first scrape.
+        """
+
+        scraped_at = self._scraped_at.get(source)
+        if scraped_at is None:
+            if not events_count:
+                return 0
+            scraped_at = oldest_created_at.timestamp()
+
+        elapsed = max(now - scraped_at, self._config.GITHUB_MIN_REFRESH_RATE)
+        return events_count / elapsed
+
+    def _set_requests_rate(self, source: str, interval: float):
+        """
+        Expected requests per second of the source, pages of the events expected in an interval, at least one.
+        """
+
+        expected_events = self._event_rates[source] * interval
+        expected_pages = min(
+            max(math.ceil(expected_events / self.GITHUB_PER_PAGE), 1),
+            math.ceil(self._events_horizon / self.GITHUB_PER_PAGE),
+        )
+        requests_rate = expected_pages / interval
+
+        self._requests_rate += requests_rate - self._requests_rates.get(source, 0)
+        self._requests_rates[source] = requests_rate
+
+    def _get_request_budget(self, now: float) -> tuple[float, float]:
+        """
+        :return: how many times the intervals must be longer, to spread the requests left until the rate limits
+        reset, and the first reset
+        """
+
+        allowed_rate = 0
+        first_reset_at = math.inf
+        for rate_limit in self._token_pool.get_rate_limits():
+            # a token without a response yet, or reset since the last one, has its full limit
+            if rate_limit is None or rate_limit[1] <= now:
+                return 1, now
+
+            remaining, reset_at = rate_limit
+            allowed_rate += max(
+                remaining - self._config.GITHUB_RATE_LIMIT_RESERVE, 0
+            ) / max(reset_at - now, 1)
+            first_reset_at = min(first_reset_at, reset_at)
+
+        if not allowed_rate:
+            return math.inf, first_reset_at
+        return max(self._requests_rate / allowed_rate, 1), first_reset_at
+
+    def schedule(
+        self,
+        source: str,
+        events_count: int,
+        oldest_created_at: datetime.datetime | None = None,
+    ):
+        """
+        Schedules the next scraping of the source.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        :param events_count: number of new events from the scraping of the source
+        :param oldest_created_at: creation time of the oldest new event, None without new events
+        """
+
+        now = time.time()
+        event_rate = self._measure_event_rate(
+            source, events_count, oldest_created_at, now
+        )
+        if source in self._event_rates:
+            event_rate = (
+                self.EVENT_RATE_SMOOTHING * event_rate
+                + (1 - self.EVENT_RATE_SMOOTHING) * self._event_rates[source]
+            )
+        self._event_rates[source] = event_rate
+        self._scraped_at[source] = now
+
+        if source == PUBLIC_SOURCE or events_count >= self._events_horizon:
+            # the horizon was filled, older events may have been lost already, the public events always fill it
+            interval = self._config.GITHUB_MIN_REFRESH_RATE
+        elif event_rate:
+            interval = (
+                self._config.GITHUB_REFRESH_TARGET_FILL
+                * self._events_horizon
+                / event_rate
+            )
+        else:
+            interval = self._config.GITHUB_REFRESH_RATE
+
+        interval = min(
+            max(
+                interval,
+                self._config.GITHUB_MIN_REFRESH_RATE,
+                self._github_client.get_poll_interval(source),
+            ),
+            self._config.GITHUB_REFRESH_RATE,
+        )
+        self._set_requests_rate(source, interval)
+
+        delay = interval
+        budget_factor, reset_at = self._get_request_budget(now)
+        if budget_factor > 1:
+            # requests are renewed at the reset, no need to wait longer, infinite factor waits exactly for it
+            delay = max(min(interval * budget_factor, reset_at - now), interval)
+
+        self._poll_intervals[source].set(delay)
+        heapq.heappush(self._due_heap, (now + delay, source))
+
+    def schedule_scraped(self, sources: list[str]):
+        """
+        Schedules the next scraping of the scraped sources, by their events counted by observe_events and
+        observe_source_events.
+
+        :param sources: scraped sources
+        """
+
+        for source in sources:
+            self.schedule(source, *self._observed_events.pop(source, (0, None)))
+
+    def schedule_retry(self, source: str):
+        """
+        Schedules the source after failed scraping in GITHUB_MIN_REFRESH_RATE.
+
+        :param source: event source, repository in format {owner}/{repo_name} or GITHUB_EVENT_SOURCES entry
+        """
+
+        self._observed_events.pop(source, None)
+        heapq.heappush(
+            self._due_heap,
+            (time.time() + self._config.GITHUB_MIN_REFRESH_RATE, source),
+        )
@@ -0,0 +1,72 @@
+
+import math
+import time
+from collections import defaultdict
+
+from app.config import Config
+from app.metrics import RATE_LIMIT_REMAINING
+
+
+class TokenPool:
+    """
+    Authentication tokens shared by all repositories. Every request takes the token with the most remaining requests,
+    tracked from the rate limit headers of its responses. Tokens without a response yet, or whose limit was reset
+    since, are taken first.
+    """
+
+    def __init__(self, config: Config):
+        self._tokens = list(config.GITHUB_AUTHENTICATION_TOKENS)
+        # token -> remaining requests and epoch time of their reset, counted down by every taken request
+        self._rate_limits: dict[str, tuple[int, float]] = {}
+        # requests taken since the last response, spreads the requests over the tokens without known rate limit
+        self._unobserved_requests = defaultdict(int)
+        # labeled by index in GITHUB_AUTHENTICATION_TOKENS, so the tokens aren't exposed
+        self._rate_limit_remaining = {
+            token: RATE_LIMIT_REMAINING.labels(token=str(i))
+            for i, token in enumerate(self._tokens)
+        }
+
+    def _get_remaining(self, token: str, now: float) -> float:
+        rate_limit = self._rate_limits.get(token)
+        if rate_limit is None or rate_limit[1] <= now:
+            return math.inf
+        return rate_limit[0]
+
+    def get_token(self) -> str:
+        """
+        :return: token with the most remaining requests
+        """
+
+        now = time.time()
+        token = max(
+            self._tokens,
+            key=lambda token: (
+                self._get_remaining(token, now),
+                -self._unobserved_requests[token],
+            ),
+        )
+
+        self._unobserved_requests[token] += 1
+        if token in self._rate_limits:
+            remaining, reset_at = self._rate_limits[token]
+            self._rate_limits[token] = (remaining - 1, reset_at)
+
+        return token
+
+    def observe_rate_limit(self, token: str, remaining: int, reset_at: float):
+        """
+        :param token: token of the request
+        :param remaining: X-RateLimit-Remaining of the response
+        :param reset_at: X-RateLimit-Reset of the response, epoch time
+        """
+
+        self._rate_limits[token] = (remaining, reset_at)
+        self._unobserved_requests[token] = 0
+        self._rate_limit_remaining[token].set(remaining)
+
+    def get_rate_limits(self) -> list[tuple[int, float] | None]:
+        """
+        :return: remaining requests and epoch time of their reset of every token, None before its first response
+        """
+
+        return [self._rate_limits.get(token) for token in self._tokens]
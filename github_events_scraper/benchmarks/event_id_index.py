@@ -0,0 +1,112 @@
+"""
+Compares memory and lookup time of the cached event ids, the EventIdIndex against the set of id strings the scraper
+used before. Ids are generated like Github event ids, increasing numbers spread over --days days.
+
+Run from github_events_scraper directory:
+
+    PYTHONPATH=.:.. python -m benchmarks.event_id_index --ids 1000000 3000000 --days 7
+"""
+
+import argparse
+import datetime
+import json
+import random
+import time
+import tracemalloc
+
+from app.database.event_id_index import EventIdIndex
+
+FIRST_EVENT_ID = 40_000_000_000
+PAGE_SIZE = 100
+
+
+def generate_events(ids_count: int, days: int) -> list[tuple[str, datetime.datetime]]:
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    step = datetime.timedelta(days=days) / ids_count
+    return [
+        (str(FIRST_EVENT_ID + i * 3), now - datetime.timedelta(days=days) + i * step)
+        for i in range(ids_count)
+    ]
+
+
+def build_set(events: list[tuple[str, datetime.datetime]]) -> set[str]:
+    # new strings, like the ids loaded from database
+    return {str(int(event_id)) for event_id, _ in events}
+
+
+def build_index(events: list[tuple[str, datetime.datetime]]) -> EventIdIndex:
+    event_id_index = EventIdIndex()
+    event_id_index.load(events)
+    return event_id_index
+
+
+def lookup_set(event_ids: set[str], pages: list[list[tuple[str, datetime.datetime]]]):
+    for page in pages:
+        {event_id for event_id, _ in page if event_id in event_ids}
+
+
+def lookup_index(
+    event_id_index: EventIdIndex, pages: list[list[tuple[str, datetime.datetime]]]
+):
+    for page in pages:
+        event_id_index.get_contained_ids(page)
+
+
+def measure(build, lookup, events: list, pages: list) -> dict:
+    tracemalloc.start()
+    cached_ids = build(events)
+    memory_mb = tracemalloc.get_traced_memory()[0] / 1024**2
+    tracemalloc.stop()
+    del cached_ids
+
+    # timed without tracing, it slows down allocations
+    start = time.perf_counter()
+    cached_ids = build(events)
+    build_took = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lookup(cached_ids, pages)
+    lookup_took = time.perf_counter() - start
+
+    return {
+        "memory_mb": round(memory_mb, 1),
+        "bytes_per_id": round(memory_mb * 1024**2 / len(events), 1),
+        "build_seconds": round(build_took, 3),
+        "page_lookup_microseconds": round(lookup_took / len(pages) * 10**6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--ids", type=int, nargs="+", default=[1000000, 3000000])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--pages", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = []
+    for ids_count in args.ids:
+        events = generate_events(ids_count, args.days)
+        # half of the looked up events are cached
+        pages = [
+            random.sample(events, PAGE_SIZE // 2)
+            + [
+                (str(int(event_id) + 1), created_at)
+                for event_id, created_at in random.sample(events, PAGE_SIZE // 2)
+            ]
+            for _ in range(args.pages)
+        ]
+        results.append(
+            {
+                "ids": ids_count,
+                "set": measure(build_set, lookup_set, events, pages),
+                "event_id_index": measure(build_index, lookup_index, events, pages),
+            }
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
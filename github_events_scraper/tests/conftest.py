@@ -3,19 +3,24 @@ import os
 
 import pytest
 from unittest.mock import MagicMock
+from sqlalchemy import create_engine
 from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
 
 os.environ["GITHUB_REPOSITORIES"] = '["test_owner/test_repo"]'
+os.environ["GITHUB_EVENT_SOURCES"] = "[]"
 os.environ["GITHUB_AUTHENTICATION_TOKENS"] = '["test_token"]'
-os.environ["GITHUB_MAX_REPOSITORIES"] = "5"
 os.environ["AGGREGATOR_ROLLING_EVENTS"] = "500"
 os.environ["AGGREGATOR_ROLLING_DAYS"] = "7"
 os.environ["DATABASE_NAME"] = "test_name"
+os.environ.setdefault("DATABASE_TABLE_NAME", "test_events_table")
 
 from app.scraping.github_scraper import GithubScraper
 from app.config import Config
 from app.scraping.github_client import GithubClient
+from app.scraping.async_github_client import AsyncGithubClient
 from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.github_event import GithubEvent
 
 
 @pytest.fixture
@@ -23,6 +28,11 @@ def mock_github_client():
     return MagicMock(spec=GithubClient)
 
 
+@pytest.fixture
+def mock_async_github_client():
+    return MagicMock(spec=AsyncGithubClient)
+
+
 @pytest.fixture
 def mock_github_event_wrapper():
     mock = MagicMock(spec=GithubEventWrapper)
@@ -30,7 +40,7 @@ def mock_github_event_wrapper():
     mock.get_event_cutoff_datetime.return_value = datetime.datetime.now(
         tz=datetime.timezone.utc
     ) - datetime.timedelta(days=config.AGGREGATOR_ROLLING_DAYS)
-    mock.is_event_id_in_db.return_value = False
+    mock.get_event_ids_in_db.return_value = set()
     return mock
 
 
@@ -40,9 +50,28 @@ def mock_engine() -> Engine:
 
 
 @pytest.fixture
-def github_scraper(mock_github_client, mock_github_event_wrapper):
+def sqlite_engine() -> Engine:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    GithubEvent.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def github_event_wrapper(sqlite_engine: Engine) -> GithubEventWrapper:
+    return GithubEventWrapper(config=Config(), db_engine=sqlite_engine)
+
+
+@pytest.fixture
+def github_scraper(
+    mock_github_client, mock_github_event_wrapper, mock_async_github_client
+):
     return GithubScraper(
         config=Config(),
         github_client=mock_github_client,
         github_event_wrapper=mock_github_event_wrapper,
+        async_github_client=mock_async_github_client,
     )
@@ -0,0 +1,97 @@
+import asyncio
+
+import httpx
+
+from app.config import Config
+from app.scraping.async_github_client import AsyncGithubClient
+from app.scraping.token_pool import TokenPool
+
+
+def get_events(client: AsyncGithubClient) -> list[dict]:
+    async def get_and_close():
+        try:
+            return await client.get_github_events("test_owner/test_repo", 100, 1)
+        finally:
+            await client.close()
+
+    return asyncio.run(get_and_close())
+
+
+def test_get_github_events_retries_forcelist_statuses(monkeypatch):
+    config = Config()
+    monkeypatch.setattr(config, "REQUEST_BACKOFF_FACTOR", 0)
+    statuses = [502, 503, 200]
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(statuses[len(requests) - 1], json=[{"id": "1"}])
+
+    events = get_events(
+        AsyncGithubClient(config, TokenPool(config), httpx.MockTransport(handler))
+    )
+
+    assert events == [{"id": "1"}]
+    assert len(requests) == 3
+    assert requests[0].url.params["page"] == "1"
+    assert requests[0].headers["Authorization"] == "Bearer test_token"
+
+
+def test_get_github_events_gives_up_after_max_retries(monkeypatch):
+    config = Config()
+    monkeypatch.setattr(config, "REQUEST_BACKOFF_FACTOR", 0)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503)
+
+    events = get_events(
+        AsyncGithubClient(config, TokenPool(config), httpx.MockTransport(handler))
+    )
+
+    assert events == []
+    assert len(requests) == config.REQUEST_MAX_RETRY + 1
+
+
+def test_get_github_events_conditional_requests():
+    config = Config()
+    requests = []
+
+    # 304 responses don't count against the rate limit
+    rate_limit_headers = {
+        "X-RateLimit-Remaining": "4999",
+        "X-RateLimit-Reset": "1700000000",
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"etag"':
+            return httpx.Response(
+                304, headers={"X-Poll-Interval": "60", **rate_limit_headers}
+            )
+        return httpx.Response(
+            200, json=[{"id": "1"}], headers={"ETag": '"etag"', **rate_limit_headers}
+        )
+
+    token_pool = TokenPool(config)
+    client = AsyncGithubClient(config, token_pool, httpx.MockTransport(handler))
+
+    async def get_twice():
+        try:
+            return [
+                await client.get_github_events("test_owner/test_repo", 100, 1)
+                for _ in range(2)
+            ]
+        finally:
+            await client.close()
+
+    assert asyncio.run(get_twice()) == [[{"id": "1"}], None]
+    assert "If-None-Match" not in requests[0].headers
+    assert not client.is_poll_due("test_owner/test_repo")
+    assert 59 < client.get_poll_wait("test_owner/test_repo") <= 60
+    assert client.get_poll_interval("test_owner/test_repo") == 60
+    assert token_pool.get_rate_limits() == [(4999, 1700000000)]
+
+    client.clear_conditional_headers("test_owner/test_repo")
+    assert get_events(client) == [{"id": "1"}]
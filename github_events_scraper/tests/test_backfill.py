@@ -0,0 +1,82 @@
+import datetime
+import gzip
+
+import orjson
+
+from app.config import Config
+from app.database.github_event_wrapper import GithubEventWrapper
+from app.scraping.backfill import backfill, read_archive
+from shared_resources.helpers import convert_to_github_datetime
+
+REPO_NAME = "test_owner/test_repo"
+
+
+def get_event(event_id: str, repository: str, created_at: datetime.datetime) -> dict:
+    return {
+        "id": event_id,
+        "type": "PushEvent",
+        "actor": {"id": 1, "login": "test_user"},
+        "repo": {
+            "id": 1,
+            "name": repository,
+            "url": f"https://api.github.com/repos/{repository}",
+        },
+        "payload": {"commits": [{"message": f"Merge {REPO_NAME}"}]},
+        "public": True,
+        "created_at": convert_to_github_datetime(created_at),
+    }
+
+
+def write_archive(path, events: list[dict]):
+    with gzip.open(path, "wb") as archive:
+        for event in events:
+            archive.write(orjson.dumps(event) + b"\n")
+
+
+def test_read_archive(tmp_path):
+    now = datetime.datetime.now(tz=datetime.timezone.utc).replace(microsecond=0)
+    path = tmp_path / "2025-04-07-0.json.gz"
+    write_archive(
+        path,
+        [
+            get_event("1", REPO_NAME.upper(), now),
+            # mentions the repository only in its payload
+            get_event("2", "other_owner/other_repo", now),
+            get_event("3", REPO_NAME, now - datetime.timedelta(days=8)),
+        ],
+    )
+
+    events_count, github_events = read_archive(
+        str(path), [REPO_NAME], now - datetime.timedelta(days=7)
+    )
+
+    assert events_count == 3
+    assert [
+        (event.id, event.repository, event.created_at) for event in github_events
+    ] == [("1", REPO_NAME.upper(), now)]
+
+
+def test_backfill(tmp_path, github_event_wrapper: GithubEventWrapper):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    paths = [
+        str(tmp_path / "2025-04-07-0.json.gz"),
+        str(tmp_path / "2025-04-07-1.json.gz"),
+    ]
+    write_archive(
+        paths[0], [get_event("1", REPO_NAME, now), get_event("2", REPO_NAME, now)]
+    )
+    write_archive(
+        paths[1], [get_event("2", REPO_NAME, now), get_event("3", REPO_NAME, now)]
+    )
+    github_event_wrapper.insert_multiple_events(
+        github_events=read_archive(
+            paths[0], [REPO_NAME], now - datetime.timedelta(days=1)
+        )[1][:1]
+    )
+
+    inserted_count = backfill(Config(), github_event_wrapper, paths, processes=1)
+
+    assert inserted_count == 2
+    assert github_event_wrapper.get_event_ids_in_db(
+        [(event_id, now) for event_id in ["1", "2", "3"]]
+    ) == {"1", "2", "3"}
@@ -0,0 +1,57 @@
+import datetime
+
+from app.database.event_id_index import EventIdBucket, EventIdIndex
+
+NOW = datetime.datetime(2024, 1, 10, 12, tzinfo=datetime.timezone.utc)
+YESTERDAY = NOW - datetime.timedelta(days=1)
+
+
+def test_event_id_index_contains_added_ids():
+    event_id_index = EventIdIndex()
+    event_id_index.add("1", NOW)
+    event_id_index.add("not-numeric", NOW)
+
+    assert event_id_index.contains("1", NOW)
+    assert event_id_index.contains("not-numeric", YESTERDAY)
+    assert not event_id_index.contains("2", NOW)
+    # ids are looked up only in the day of their creation
+    assert not event_id_index.contains("1", YESTERDAY)
+    assert len(event_id_index) == 2
+
+
+def test_event_id_index_get_contained_ids():
+    event_id_index = EventIdIndex()
+    # naive datetimes from database are in UTC
+    event_id_index.load([("1", NOW.replace(tzinfo=None)), ("2", YESTERDAY)])
+
+    assert event_id_index.get_contained_ids(
+        [("1", NOW), ("2", YESTERDAY), ("3", NOW)]
+    ) == {"1", "2"}
+
+
+def test_event_id_index_merges_recent_ids(monkeypatch):
+    monkeypatch.setattr(EventIdBucket, "MERGE_SIZE", 3)
+    event_id_index = EventIdIndex()
+    event_id_index.load([("5", NOW)])
+    # the already merged id isn't merged again
+    for event_id in ["3", "5", "9", "1", "10", "7", "11"]:
+        event_id_index.add(event_id, NOW)
+
+    bucket = event_id_index._buckets[NOW.date()]
+    assert list(bucket._sorted_ids) == [1, 3, 5, 7, 9, 10]
+    assert bucket._recent_ids == {11}
+    assert all(
+        event_id_index.contains(event_id, NOW)
+        for event_id in ["1", "3", "5", "7", "9", "10", "11"]
+    )
+    assert len(event_id_index) == 7
+
+
+def test_event_id_index_expire():
+    event_id_index = EventIdIndex()
+    event_id_index.load([("1", YESTERDAY), ("2", YESTERDAY), ("3", NOW)])
+
+    # the day of the cutoff is kept whole
+    assert event_id_index.expire(NOW) == 2
+    assert event_id_index.expire(NOW) == 0
+    assert event_id_index.get_contained_ids([("1", YESTERDAY), ("3", NOW)]) == {"3"}
@@ -0,0 +1,108 @@
+import datetime
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.config import Config
+from app.database.event_partitions import EventPartitions
+from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.github_event import GithubEvent
+
+
+def test_partition_names(mock_engine: Engine):
+    event_partitions = EventPartitions(config=Config(), db_engine=mock_engine)
+    day = datetime.date(2025, 4, 7)
+
+    partition_name = event_partitions.get_partition_name(day)
+
+    assert partition_name == f"{GithubEvent.__tablename__}_p20250407"
+    assert event_partitions.get_partition_day(partition_name) == day
+    assert event_partitions.get_partition_day(f"{partition_name}_old") is None
+    assert event_partitions.get_partition_day("other_table_p20250407") is None
+
+
+def test_partition_days(mock_engine: Engine):
+    config = Config()
+    event_partitions = EventPartitions(config=config, db_engine=mock_engine)
+    now = datetime.datetime(2025, 4, 7, 23, 30, tzinfo=datetime.timezone.utc)
+
+    days = event_partitions.get_partition_days(
+        now - datetime.timedelta(days=config.AGGREGATOR_ROLLING_DAYS), now
+    )
+
+    assert days[0] == datetime.date(2025, 3, 31)
+    assert days[-1] == datetime.date(2025, 4, 7) + datetime.timedelta(
+        days=config.DATABASE_PARTITION_DAYS_AHEAD
+    )
+    assert len(days) == (
+        config.AGGREGATOR_ROLLING_DAYS + config.DATABASE_PARTITION_DAYS_AHEAD + 1
+    )
+
+
+def test_drop_expired_partitions_detaches_concurrently(mock_engine: Engine):
+    mock_engine.dialect = postgresql.dialect()
+    event_partitions = EventPartitions(config=Config(), db_engine=mock_engine)
+    connection = (
+        mock_engine.connect.return_value.execution_options.return_value.__enter__.return_value
+    )
+    table_name = GithubEvent.__tablename__
+    # attached, pending detach and detached by an interrupted drop, and a kept one
+    partitions = [
+        (f"{table_name}_p20250401", False),
+        (f"{table_name}_p20250402", True),
+        (f"{table_name}_p20250403", None),
+        (f"{table_name}_p20250407", False),
+    ]
+    statements = []
+
+    def execute(statement, *args):
+        statements.append(str(statement))
+        result = MagicMock()
+        result.__iter__.return_value = iter(partitions)
+        result.scalar.return_value = 10
+        return result
+
+    connection.execute.side_effect = execute
+
+    assert (
+        event_partitions.drop_expired_partitions(
+            cutoff_datetime=datetime.datetime(
+                2025, 4, 7, 12, tzinfo=datetime.timezone.utc
+            )
+        )
+        == 30
+    )
+    mock_engine.connect.return_value.execution_options.assert_called_once_with(
+        isolation_level="AUTOCOMMIT"
+    )
+    assert [
+        statement for statement in statements if not statement.startswith("SELECT")
+    ] == [
+        f"ALTER TABLE {table_name} DETACH PARTITION {table_name}_p20250401 CONCURRENTLY",
+        f"DROP TABLE {table_name}_p20250401",
+        f"ALTER TABLE {table_name} DETACH PARTITION {table_name}_p20250402 FINALIZE",
+        f"DROP TABLE {table_name}_p20250402",
+        f"DROP TABLE {table_name}_p20250403",
+    ]
+
+
+def test_unpartitioned_table_deletes_rows(github_event_wrapper: GithubEventWrapper):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    with Session(github_event_wrapper.db_engine) as session:
+        session.add_all(
+            [
+                GithubEvent(
+                    id=str(days_ago),
+                    type="PushEvent",
+                    created_at=now - datetime.timedelta(days=days_ago),
+                    repository="test_owner/test_repo",
+                )
+                for days_ago in (0, 10, 20)
+            ]
+        )
+        session.commit()
+
+    assert github_event_wrapper.create_partitions() == 0
+    assert github_event_wrapper.delete_expired_events() == 2
@@ -0,0 +1,59 @@
+import pytest
+
+from app.config import Config
+from app.scraping.event_source import (
+    get_event_sources,
+    get_events_path,
+    get_repository_sources,
+    validate_event_source,
+)
+
+
+def test_get_events_path():
+    assert (
+        get_events_path("test_owner/test_repo") == "repos/test_owner/test_repo/events"
+    )
+    assert get_events_path("org:test_org") == "orgs/test_org/events"
+    assert get_events_path("user:test_user") == "users/test_user/events"
+    assert get_events_path("public") == "events"
+
+
+def test_validate_event_source():
+    validate_event_source("org:test_org")
+    with pytest.raises(ValueError):
+        validate_event_source("test_owner/test_repo")
+    with pytest.raises(ValueError):
+        validate_event_source("team:test_team")
+
+
+def test_get_event_sources(monkeypatch):
+    monkeypatch.setenv(
+        "GITHUB_REPOSITORIES",
+        '["Test_Org/repo_1", "test_org/repo_2", "test_owner/test_repo"]',
+    )
+    monkeypatch.setenv("GITHUB_EVENT_SOURCES", '["org:test_org", "public"]')
+    config = Config()
+
+    # owners are case-insensitive, like repositories
+    assert get_repository_sources(config) == {
+        "Test_Org/repo_1": "org:test_org",
+        "test_org/repo_2": "org:test_org",
+        "test_owner/test_repo": "test_owner/test_repo",
+    }
+    assert get_event_sources(config) == [
+        "org:test_org",
+        "test_owner/test_repo",
+        "public",
+    ]
+
+
+def test_user_source_doesnt_replace_repository_sources(monkeypatch):
+    monkeypatch.setenv("GITHUB_REPOSITORIES", '["test_user/test_repo"]')
+    monkeypatch.setenv("GITHUB_EVENT_SOURCES", '["user:test_user"]')
+    config = Config()
+
+    # the user's events are only the events the user performed
+    assert get_repository_sources(config) == {
+        "test_user/test_repo": "test_user/test_repo"
+    }
+    assert get_event_sources(config) == ["test_user/test_repo", "user:test_user"]
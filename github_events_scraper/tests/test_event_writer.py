@@ -0,0 +1,84 @@
+import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.config import Config
+from app.database.event_writer import EventWriter, EventWriterError
+from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.github_event import GithubEventRecord
+
+
+def get_events(count: int) -> list[GithubEventRecord]:
+    return [
+        GithubEventRecord(
+            id=str(i),
+            type="PushEvent",
+            created_at=datetime.datetime.now(tz=datetime.timezone.utc),
+            repository="test_owner/test_repo",
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def mock_github_event_wrapper():
+    mock = MagicMock(spec=GithubEventWrapper)
+    mock.insert_multiple_events.side_effect = lambda github_events: [
+        event.id for event in github_events
+    ]
+    return mock
+
+
+@pytest.fixture
+def event_writer(monkeypatch, mock_github_event_wrapper):
+    config = Config()
+    monkeypatch.setattr(config, "DATABASE_WRITE_BATCH_SIZE", 100)
+    monkeypatch.setattr(config, "DATABASE_WRITE_BATCH_SECONDS", 60)
+    event_writer = EventWriter(
+        config=config, github_event_wrapper=mock_github_event_wrapper
+    )
+    event_writer.start()
+    yield event_writer
+    event_writer.close()
+
+
+def get_batch_sizes(mock_github_event_wrapper) -> list[int]:
+    return [
+        len(call.kwargs["github_events"])
+        for call in mock_github_event_wrapper.insert_multiple_events.call_args_list
+    ]
+
+
+def test_write_batches(event_writer: EventWriter, mock_github_event_wrapper):
+    for _ in range(3):
+        event_writer.put(get_events(60))
+    event_writer.flush()
+
+    # the first batch is inserted when it's full, the rest on flush
+    assert get_batch_sizes(mock_github_event_wrapper) == [120, 60]
+
+
+def test_write_batch_after_batch_seconds(
+    monkeypatch, event_writer: EventWriter, mock_github_event_wrapper
+):
+    monkeypatch.setattr(Config(), "DATABASE_WRITE_BATCH_SECONDS", 0)
+
+    event_writer.put(get_events(10))
+    event_writer._queue.join()
+
+    assert get_batch_sizes(mock_github_event_wrapper) == [10]
+
+
+def test_flush_raises_failed_batch(
+    event_writer: EventWriter, mock_github_event_wrapper
+):
+    mock_github_event_wrapper.insert_multiple_events.side_effect = Exception(
+        "Database down!"
+    )
+    event_writer.put(get_events(10))
+
+    with pytest.raises(EventWriterError):
+        event_writer.flush()
+    # the error is raised once
+    event_writer.flush()
@@ -0,0 +1,184 @@
+import datetime
+import json
+
+from prometheus_client import REGISTRY
+from sqlalchemy.orm import Session
+
+from app.database.github_event_wrapper import GithubEventWrapper
+from shared_resources.github_event import (
+    GithubEvent,
+    GithubEventHourlyCount,
+    GithubEventRecord,
+)
+
+REPO_NAME = "test_owner/test_repo"
+
+
+def make_event(
+    event_id: str, created_at: datetime.datetime, event_type: str = "PushEvent"
+) -> GithubEvent:
+    return GithubEvent(
+        id=event_id, type=event_type, created_at=created_at, repository=REPO_NAME
+    )
+
+
+def get_hourly_counts(github_event_wrapper: GithubEventWrapper) -> dict:
+    with Session(github_event_wrapper.db_engine) as session:
+        return {
+            (hourly_count.type, hourly_count.hour): hourly_count.count
+            for hourly_count in session.query(GithubEventHourlyCount)
+        }
+
+
+def test_insert_multiple_events_upserts_hourly_counts(
+    github_event_wrapper: GithubEventWrapper,
+):
+    hour = datetime.datetime.now(tz=datetime.timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    ) - datetime.timedelta(hours=2)
+    github_event_wrapper.insert_multiple_events(
+        github_events=[
+            make_event("1", hour),
+            make_event("2", hour + datetime.timedelta(minutes=30)),
+            make_event("3", hour + datetime.timedelta(minutes=70), "WatchEvent"),
+        ]
+    )
+    github_event_wrapper.insert_multiple_events(
+        github_events=[
+            # already inserted, not counted again
+            make_event("2", hour + datetime.timedelta(minutes=30)),
+            make_event("4", hour + datetime.timedelta(minutes=59)),
+        ]
+    )
+
+    naive_hour = hour.replace(tzinfo=None)
+    assert get_hourly_counts(github_event_wrapper) == {
+        ("PushEvent", naive_hour): 3,
+        ("WatchEvent", naive_hour + datetime.timedelta(hours=1)): 1,
+    }
+
+
+def test_delete_expired_events_trims_hourly_counts(
+    github_event_wrapper: GithubEventWrapper,
+):
+    cutoff = github_event_wrapper.get_event_cutoff_datetime()
+    with Session(github_event_wrapper.db_engine) as session:
+        session.add_all(
+            [
+                GithubEventHourlyCount(
+                    repository=REPO_NAME,
+                    type="PushEvent",
+                    hour=(cutoff + datetime.timedelta(hours=hours_offset)).replace(
+                        minute=0, second=0, microsecond=0, tzinfo=None
+                    ),
+                    count=1,
+                )
+                for hours_offset in (-2, 0, 1)
+            ]
+        )
+        session.commit()
+
+    github_event_wrapper.delete_expired_events()
+
+    assert len(get_hourly_counts(github_event_wrapper)) == 2
+
+
+def test_backfill_hourly_counts(github_event_wrapper: GithubEventWrapper):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    with Session(github_event_wrapper.db_engine) as session:
+        session.add_all([make_event(str(i), now) for i in range(3)])
+        session.commit()
+
+    assert github_event_wrapper.backfill_hourly_counts() == 3
+    assert list(get_hourly_counts(github_event_wrapper).values()) == [3]
+    assert github_event_wrapper.backfill_hourly_counts() == 0
+
+
+def test_get_inserted_events_payload():
+    created_at = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    other_event = make_event("3", created_at - datetime.timedelta(hours=1))
+    other_event.repository = "other_owner/other_repo"
+
+    payload = GithubEventWrapper.get_inserted_events_payload(
+        [
+            make_event("1", created_at - datetime.timedelta(minutes=5)),
+            make_event("2", created_at),
+            other_event,
+        ]
+    )
+
+    assert json.loads(payload) == {
+        "repositories": ["other_owner/other_repo", REPO_NAME],
+        "max_created_at": "2024-01-02T03:04:05Z",
+    }
+
+
+def test_get_inserted_events_payload_too_long():
+    created_at = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+    github_events = []
+    for i in range(300):
+        github_event = make_event(str(i), created_at)
+        github_event.repository = f"test_owner/test_repository_{i}"
+        github_events.append(github_event)
+
+    payload = GithubEventWrapper.get_inserted_events_payload(github_events)
+
+    assert len(payload.encode()) < GithubEventWrapper.NOTIFY_PAYLOAD_LIMIT
+    assert json.loads(payload) == {
+        "repositories": None,
+        "max_created_at": "2024-01-02T03:04:05Z",
+    }
+
+
+def test_insert_multiple_events_skips_events_in_database(
+    github_event_wrapper: GithubEventWrapper,
+):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    # inserted by another scraper, not in the cached event ids
+    with Session(github_event_wrapper.db_engine) as session:
+        session.add(make_event("1", now))
+        session.commit()
+
+    inserted_ids = github_event_wrapper.insert_multiple_events(
+        github_events=[make_event("1", now), make_event("2", now), make_event("2", now)]
+    )
+
+    assert inserted_ids == ["2"]
+    assert list(get_hourly_counts(github_event_wrapper).values()) == [1]
+    assert github_event_wrapper.get_event_ids_in_db([("1", now)]) == {"1"}
+    with Session(github_event_wrapper.db_engine) as session:
+        assert session.query(GithubEvent).count() == 2
+
+
+def test_insert_multiple_events_dedup_metrics(
+    github_event_wrapper: GithubEventWrapper,
+):
+    def get_sample(name: str) -> float:
+        return REGISTRY.get_sample_value(name) or 0
+
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    github_event_wrapper.insert_multiple_events(github_events=[make_event("1", now)])
+    lookups = get_sample("github_events_scraper_dedup_lookups_total")
+    hits = get_sample("github_events_scraper_dedup_hits_total")
+
+    github_event_wrapper.insert_multiple_events(
+        github_events=[make_event("1", now), make_event("2", now)]
+    )
+
+    assert get_sample("github_events_scraper_dedup_lookups_total") == lookups + 2
+    assert get_sample("github_events_scraper_dedup_hits_total") == hits + 1
+
+
+def test_insert_multiple_events_inserts_records(
+    github_event_wrapper: GithubEventWrapper,
+):
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+
+    inserted_ids = github_event_wrapper.insert_multiple_events(
+        github_events=[GithubEventRecord("1", "PushEvent", now, REPO_NAME)]
+    )
+
+    assert inserted_ids == ["1"]
+    with Session(github_event_wrapper.db_engine) as session:
+        github_event = session.query(GithubEvent).one()
+        assert (github_event.id, github_event.repository) == ("1", REPO_NAME)
@@ -1,13 +1,21 @@
 
+import asyncio
 import copy
 import datetime
 import math
 from datetime import timedelta
 
+import pytest
+from prometheus_client import REGISTRY
+
 from app.config import Config
+from app.database.scrape_checkpoints import ScrapeCheckpoint
 from app.scraping.github_scraper import GithubScraper
-from shared_resources.github_event import GithubEvent
-from shared_resources.helpers import convert_to_github_datetime
+from shared_resources.github_event import GithubEventRecord
+from shared_resources.helpers import (
+    convert_github_datetime,
+    convert_to_github_datetime,
+)
 
 
 REPO_NAME = "test_owner/test_repo"
@@ -29,7 +37,7 @@ def test_scrape_repository_returns_events(
     events = github_scraper.scrape_events()
 
     assert len(events) == 2
-    assert all(isinstance(event, GithubEvent) for event in events)
+    assert all(isinstance(event, GithubEventRecord) for event in events)
     assert events[0].id == EVENT_ID
     mock_github_client.get_github_events.assert_called_once()
 
@@ -58,7 +66,7 @@ def test_scrape_repository_skips_old_events(
     events = github_scraper.scrape_events()
 
     assert len(events) == 2
-    assert all(isinstance(event, GithubEvent) for event in events)
+    assert all(isinstance(event, GithubEventRecord) for event in events)
     mock_github_client.get_github_events.assert_called_once()
 
 
@@ -66,10 +74,13 @@ def test_scrape_repository_skips_existing_events(
     github_scraper: GithubScraper, mock_github_client, mock_github_event_wrapper
 ):
     mock_github_client.get_github_events.return_value = [TEST_EVENT]
-    mock_github_event_wrapper.is_event_id_in_db.return_value = True
+    mock_github_event_wrapper.get_event_ids_in_db.side_effect = lambda events: {
+        event_id for event_id, _ in events
+    }
     events = github_scraper.scrape_events()
 
     assert events == []
+    assert github_scraper.pop_source_events() == {}
 
 
 def test_scrape_repository_cut_rolling_events(
@@ -83,7 +94,7 @@ def test_scrape_repository_cut_rolling_events(
     events = github_scraper.scrape_events()
 
     assert len(events) == config.AGGREGATOR_ROLLING_EVENTS
-    assert all(isinstance(event, GithubEvent) for event in events)
+    assert all(isinstance(event, GithubEventRecord) for event in events)
     mock_github_client.get_github_events.call_count = (
         math.ceil(config.AGGREGATOR_ROLLING_EVENTS / github_scraper.GITHUB_PER_PAGE) + 1
     )
@@ -97,3 +108,220 @@ def test_scrape_repository_handles_exception(
     events = github_scraper.scrape_events()
 
     assert events == []
+
+
+def test_scrape_repository_metrics(github_scraper: GithubScraper, mock_github_client):
+    def get_sample(name: str, labels: dict | None = None) -> float:
+        return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+    pages_labels = {"repository": REPO_NAME}
+    pages = get_sample("github_events_scraper_pages_fetched_total", pages_labels)
+
+    mock_github_client.get_github_events.return_value = [TEST_EVENT]
+    github_scraper.scrape_events()
+
+    assert (
+        get_sample("github_events_scraper_pages_fetched_total", pages_labels)
+        == pages + 1
+    )
+
+
+def get_page_events(page_num: int, count: int) -> list[dict]:
+    page_events = []
+    for i in range(count):
+        event = copy.deepcopy(TEST_EVENT)
+        event["id"] = f"{page_num}-{i}"
+        page_events.append(event)
+    return page_events
+
+
+def test_scrape_events_async_prefetches_pages(
+    github_scraper: GithubScraper, mock_async_github_client
+):
+    pages = {
+        1: get_page_events(1, github_scraper.GITHUB_PER_PAGE),
+        2: get_page_events(2, github_scraper.GITHUB_PER_PAGE),
+        3: get_page_events(3, 10),
+    }
+
+    async def get_github_events(source, per_page, page_num):
+        return pages.get(page_num, [])
+
+    mock_async_github_client.get_github_events.side_effect = get_github_events
+
+    events = asyncio.run(github_scraper.scrape_events_async())
+
+    assert len(events) == 2 * github_scraper.GITHUB_PER_PAGE + 10
+    assert [event.id for event in events[:2]] == ["1-0", "1-1"]
+    # page 4 is prefetched after the full page 2, but not used after the short page 3
+    requested_pages = [
+        call.args[2]
+        for call in mock_async_github_client.get_github_events.call_args_list
+    ]
+    assert requested_pages == [1, 2, 3, 4]
+
+
+def test_scrape_events_async_stops_on_existing_event(
+    github_scraper: GithubScraper, mock_async_github_client, mock_github_event_wrapper
+):
+    page_events = get_page_events(1, github_scraper.GITHUB_PER_PAGE)
+    mock_async_github_client.get_github_events.return_value = page_events
+    mock_github_event_wrapper.get_event_ids_in_db.return_value = {"1-50"}
+
+    events = asyncio.run(github_scraper.scrape_events_async())
+
+    assert len(events) == 50
+    mock_async_github_client.get_github_events.assert_called_once()
+
+
+def test_scrape_events_async_handles_exception(
+    github_scraper: GithubScraper, mock_async_github_client
+):
+    mock_async_github_client.get_github_events.side_effect = Exception(
+        "GitHub API down!"
+    )
+
+    events = asyncio.run(github_scraper.scrape_events_async())
+
+    assert events == []
+
+
+def test_scrape_repository_stops_on_not_modified_page(
+    github_scraper: GithubScraper, mock_github_client
+):
+    mock_github_client.get_github_events.return_value = None
+
+    events = github_scraper.scrape_events()
+
+    assert events == []
+    mock_github_client.get_github_events.assert_called_once()
+
+
+def test_scrape_events_skips_repository_before_poll_interval(
+    github_scraper: GithubScraper, mock_github_client
+):
+    mock_github_client.is_poll_due.return_value = False
+
+    events = github_scraper.scrape_events()
+
+    assert events == []
+    mock_github_client.get_github_events.assert_not_called()
+
+
+def test_scrape_events_passes_page_events(
+    github_scraper: GithubScraper, mock_github_client
+):
+    pages = [
+        get_page_events(1, github_scraper.GITHUB_PER_PAGE),
+        get_page_events(2, 10),
+    ]
+    mock_github_client.get_github_events.side_effect = pages
+    page_events = []
+
+    events = github_scraper.scrape_events(on_page_events=page_events.append)
+
+    assert events == []
+    assert [len(events) for events in page_events] == [
+        github_scraper.GITHUB_PER_PAGE,
+        10,
+    ]
+    assert page_events[1][0].id == "2-0"
+
+
+def test_convert_github_datetime():
+    assert convert_github_datetime("2024-02-29T23:59:01Z") == datetime.datetime(
+        2024, 2, 29, 23, 59, 1, tzinfo=datetime.timezone.utc
+    )
+    with pytest.raises(ValueError):
+        convert_github_datetime("2024-02-30T23:59:01Z")
+    with pytest.raises(ValueError):
+        convert_github_datetime("2024-02-29 23:59:01")
+
+
+def test_scrape_events_demultiplexes_event_sources(
+    monkeypatch, mock_github_client, mock_github_event_wrapper
+):
+    monkeypatch.setenv(
+        "GITHUB_REPOSITORIES", f'["{REPO_NAME}", "other_owner/other_repo"]'
+    )
+    monkeypatch.setenv("GITHUB_EVENT_SOURCES", '["org:test_owner", "public"]')
+    github_scraper = GithubScraper(
+        config=Config(),
+        github_client=mock_github_client,
+        github_event_wrapper=mock_github_event_wrapper,
+    )
+
+    def get_event(event_id: str, repository: str) -> dict:
+        return {**TEST_EVENT, "id": event_id, "repo": {"name": repository}}
+
+    pages = {
+        "org:test_owner": [
+            get_event("1", REPO_NAME.upper()),
+            get_event("2", "test_owner/untracked_repo"),
+        ],
+        "other_owner/other_repo": [get_event("3", "other_owner/other_repo")],
+        "public": [
+            get_event("4", "untracked_owner/untracked_repo"),
+            get_event("5", "other_owner/other_repo"),
+        ],
+    }
+    mock_github_client.get_github_events.side_effect = (
+        lambda source, per_page, page_num: pages[source]
+    )
+
+    events = github_scraper.scrape_events()
+
+    assert [
+        call.args[0] for call in mock_github_client.get_github_events.call_args_list
+    ] == [
+        "org:test_owner",
+        "other_owner/other_repo",
+        "public",
+    ]
+    assert [(event.id, event.repository) for event in events] == [
+        ("1", REPO_NAME.upper()),
+        ("3", "other_owner/other_repo"),
+        ("5", "other_owner/other_repo"),
+    ]
+    # the sources with many repositories are scheduled by all their events
+    created_at = convert_github_datetime(TEST_EVENT["created_at"])
+    assert github_scraper.pop_source_events() == {
+        "org:test_owner": (2, created_at),
+        "other_owner/other_repo": (1, created_at),
+        "public": (2, created_at),
+    }
+    assert github_scraper.pop_source_events() == {}
+
+
+def test_scrape_events_stops_at_checkpoint(
+    github_scraper: GithubScraper, mock_github_client, mock_async_github_client
+):
+    mock_github_client.get_validators.return_value = ('"etag"', None)
+    created_at = datetime.datetime.now(tz=datetime.timezone.utc).replace(
+        microsecond=0
+    ) - timedelta(hours=1)
+    page = get_page_events(1, 4)
+    for i, event in enumerate(page):
+        event["created_at"] = convert_to_github_datetime(
+            created_at - timedelta(minutes=i)
+        )
+    mock_github_client.get_github_events.return_value = page
+    github_scraper.restore_checkpoints(
+        {REPO_NAME: ScrapeCheckpoint("1-2", created_at - timedelta(minutes=2), '"old"')}
+    )
+
+    events = github_scraper.scrape_events()
+
+    assert [event.id for event in events] == ["1-0", "1-1"]
+    mock_async_github_client.set_validators.assert_called_once_with(
+        REPO_NAME, '"old"', None
+    )
+
+    # the new checkpoint is used once the events are stored
+    github_scraper.discard_new_checkpoints()
+    assert github_scraper.pop_new_checkpoints() == {}
+    github_scraper.scrape_events()
+    assert github_scraper.pop_new_checkpoints() == {
+        REPO_NAME: ScrapeCheckpoint("1-0", created_at, '"etag"')
+    }
+    assert github_scraper.scrape_events() == []
@@ -0,0 +1,179 @@
+import datetime
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.config import Config
+from app.scraping.github_client import BaseGithubClient
+from app.scraping.poll_scheduler import PollScheduler
+from app.scraping.token_pool import TokenPool
+from shared_resources.github_event import GithubEventRecord
+
+
+REPO_NAME = "test_owner/test_repo"
+
+
+@pytest.fixture
+def mock_github_client():
+    mock = MagicMock(spec=BaseGithubClient)
+    mock.get_poll_interval.return_value = 0
+    mock.get_poll_wait.return_value = 0
+    return mock
+
+
+@pytest.fixture
+def mock_token_pool():
+    mock = MagicMock(spec=TokenPool)
+    mock.get_rate_limits.return_value = [None]
+    return mock
+
+
+@pytest.fixture
+def poll_scheduler(mock_github_client, mock_token_pool) -> PollScheduler:
+    return PollScheduler(
+        config=Config(),
+        github_client=mock_github_client,
+        token_pool=mock_token_pool,
+    )
+
+
+def get_created_at(seconds_ago: int) -> datetime.datetime:
+    return datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(
+        seconds=seconds_ago
+    )
+
+
+def get_events(
+    count: int, seconds_ago: int, repository: str = REPO_NAME
+) -> list[GithubEventRecord]:
+    return [
+        GithubEventRecord(
+            id=str(i),
+            type="PushEvent",
+            created_at=get_created_at(seconds_ago),
+            repository=repository,
+        )
+        for i in range(count)
+    ]
+
+
+def test_pop_due_sources(poll_scheduler: PollScheduler):
+    assert poll_scheduler.pop_due_sources() == [REPO_NAME]
+    assert poll_scheduler.pop_due_sources() == []
+
+    poll_scheduler.schedule_retry(REPO_NAME)
+
+    assert poll_scheduler.get_sleep_time() == pytest.approx(
+        Config().GITHUB_MIN_REFRESH_RATE, abs=1
+    )
+
+
+@pytest.mark.parametrize(
+    "events_count, expected_interval",
+    [
+        # horizon filled, scraped as often as possible
+        (300, 60),
+        # 0.1 events per second, half of the horizon fills in 1500 seconds
+        (100, 1500),
+        # quiet repository
+        (0, 3600),
+    ],
+)
+def test_schedule_by_event_rate(
+    poll_scheduler: PollScheduler, events_count: int, expected_interval: float
+):
+    poll_scheduler.pop_due_sources()
+
+    poll_scheduler.observe_events(get_events(events_count, 1000))
+    poll_scheduler.schedule_scraped([REPO_NAME])
+
+    assert poll_scheduler.get_sleep_time() == pytest.approx(expected_interval, abs=1)
+
+
+def test_schedule_respects_poll_interval(
+    poll_scheduler: PollScheduler, mock_github_client
+):
+    mock_github_client.get_poll_interval.return_value = 120
+    poll_scheduler.pop_due_sources()
+
+    poll_scheduler.schedule(REPO_NAME, 300, get_created_at(1000))
+
+    assert poll_scheduler.get_sleep_time() == pytest.approx(120, abs=1)
+
+
+def test_pop_due_sources_waits_for_poll_interval(
+    poll_scheduler: PollScheduler, mock_github_client
+):
+    poll_scheduler.pop_due_sources()
+    poll_scheduler.schedule(REPO_NAME, 100, get_created_at(1000))
+    event_rate = poll_scheduler._event_rates[REPO_NAME]
+    # polled since, e.g. by a retry
+    poll_scheduler._due_heap[0] = (time.time(), REPO_NAME)
+    mock_github_client.get_poll_wait.return_value = 30
+
+    assert poll_scheduler.pop_due_sources() == []
+    assert poll_scheduler.get_sleep_time() == pytest.approx(30, abs=1)
+    assert poll_scheduler._event_rates[REPO_NAME] == event_rate
+
+
+def test_schedule_spreads_rate_limit(poll_scheduler: PollScheduler, mock_token_pool):
+    config = Config()
+    # one request left above the reserve, 1 request per 1500 seconds is expected
+    mock_token_pool.get_rate_limits.return_value = [
+        (config.GITHUB_RATE_LIMIT_RESERVE + 1, time.time() + 2000)
+    ]
+    poll_scheduler.pop_due_sources()
+
+    poll_scheduler.schedule(REPO_NAME, 100, get_created_at(1000))
+
+    assert poll_scheduler.get_sleep_time() == pytest.approx(2000, abs=1)
+
+
+def test_schedule_waits_for_rate_limit_reset(
+    poll_scheduler: PollScheduler, mock_token_pool
+):
+    config = Config()
+    mock_token_pool.get_rate_limits.return_value = [
+        (config.GITHUB_RATE_LIMIT_RESERVE, time.time() + 600),
+        (config.GITHUB_RATE_LIMIT_RESERVE, time.time() + 1200),
+    ]
+    poll_scheduler.pop_due_sources()
+
+    poll_scheduler.schedule(REPO_NAME, 300, get_created_at(1000))
+
+    assert poll_scheduler.get_sleep_time() == pytest.approx(600, abs=1)
+
+
+def test_observe_events_by_configured_name(poll_scheduler: PollScheduler):
+    poll_scheduler.pop_due_sources()
+
+    # events of a page in two parts, with the repository name in different case
+    poll_scheduler.observe_events(get_events(50, 1000, REPO_NAME.upper()))
+    poll_scheduler.observe_events(get_events(50, 500))
+    poll_scheduler.observe_events(get_events(10, 500, "other_owner/other_repo"))
+    poll_scheduler.schedule_scraped([REPO_NAME])
+
+    # 100 events in 1000 seconds
+    assert poll_scheduler.get_sleep_time() == pytest.approx(1500, abs=1)
+
+
+def test_schedule_event_sources(monkeypatch, mock_github_client, mock_token_pool):
+    monkeypatch.setenv("GITHUB_EVENT_SOURCES", '["org:test_owner", "public"]')
+    poll_scheduler = PollScheduler(
+        config=Config(), github_client=mock_github_client, token_pool=mock_token_pool
+    )
+
+    # the repository is scraped from its organization's events
+    assert poll_scheduler.pop_due_sources() == ["org:test_owner", "public"]
+
+    # the source is scheduled by all its events, the ones of its tracked repositories are a part of them
+    poll_scheduler.observe_events(get_events(10, 1000))
+    poll_scheduler.observe_source_events(
+        {"org:test_owner": (100, get_created_at(1000))}
+    )
+    poll_scheduler.schedule_scraped(["org:test_owner"])
+    assert poll_scheduler.get_sleep_time() == pytest.approx(1500, abs=1)
+
+    poll_scheduler.schedule_scraped(["public"])
+    assert poll_scheduler.get_sleep_time() == pytest.approx(60, abs=1)
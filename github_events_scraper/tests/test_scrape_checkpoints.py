@@ -0,0 +1,35 @@
+import datetime
+
+from sqlalchemy.engine import Engine
+
+from app.config import Config
+from app.database.scrape_checkpoints import ScrapeCheckpoint, ScrapeCheckpoints
+
+REPO_NAME = "test_owner/test_repo"
+
+
+def test_save_and_load_checkpoints(sqlite_engine: Engine):
+    scrape_checkpoints = ScrapeCheckpoints(config=Config(), db_engine=sqlite_engine)
+    created_at = datetime.datetime(2025, 4, 7, 12, tzinfo=datetime.timezone.utc)
+
+    scrape_checkpoints.save_checkpoints(checkpoints={})
+    scrape_checkpoints.save_checkpoints(
+        checkpoints={
+            REPO_NAME: ScrapeCheckpoint("1", created_at, '"etag-1"'),
+            "public": ScrapeCheckpoint("2", created_at),
+        }
+    )
+    scrape_checkpoints.save_checkpoints(
+        checkpoints={
+            REPO_NAME: ScrapeCheckpoint(
+                "3", created_at, '"etag-3"', "Mon, 07 Apr 2025 12:00:00 GMT"
+            )
+        }
+    )
+
+    assert scrape_checkpoints.load_checkpoints() == {
+        REPO_NAME: ScrapeCheckpoint(
+            "3", created_at, '"etag-3"', "Mon, 07 Apr 2025 12:00:00 GMT"
+        ),
+        "public": ScrapeCheckpoint("2", created_at),
+    }
@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from app.config import Config
+from app.scraping.token_pool import TokenPool
+
+
+@pytest.fixture
+def token_pool(monkeypatch) -> TokenPool:
+    monkeypatch.setenv("GITHUB_AUTHENTICATION_TOKENS", '["first", "second", "third"]')
+    return TokenPool(Config())
+
+
+def test_get_token_spreads_unobserved_tokens(token_pool: TokenPool):
+    assert [token_pool.get_token() for _ in range(4)] == [
+        "first",
+        "second",
+        "third",
+        "first",
+    ]
+
+
+def test_get_token_with_most_remaining_requests(token_pool: TokenPool):
+    reset_at = time.time() + 3600
+    token_pool.observe_rate_limit("first", 100, reset_at)
+    token_pool.observe_rate_limit("second", 102, reset_at)
+    token_pool.observe_rate_limit("third", 10, reset_at)
+
+    assert [token_pool.get_token() for _ in range(4)] == [
+        "second",
+        "second",
+        "first",
+        "second",
+    ]
+    assert token_pool.get_rate_limits() == [
+        (99, reset_at),
+        (99, reset_at),
+        (10, reset_at),
+    ]
+
+
+def test_get_token_after_rate_limit_reset(token_pool: TokenPool):
+    token_pool.observe_rate_limit("first", 100, time.time() + 3600)
+    token_pool.observe_rate_limit("second", 0, time.time() - 1)
+    token_pool.observe_rate_limit("third", 200, time.time() + 3600)
+
+    assert token_pool.get_token() == "second"
@@ -4,8 +4,9 @@ import os
 from typing import Callable
 from functools import wraps
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.engine import Engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 
 def get_connection_string() -> str:
@@ -17,6 +18,17 @@ def get_connection_string() -> str:
     return f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
 
+def get_dialect_insert(session: Session) -> Callable:
+    """
+    :param session: session of the database the insert is for
+    :return: insert construct supporting on conflict clauses of the session's database, sqlite is used in tests
+    """
+
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
+
+
 def postgre_session(func: Callable[..., any]) -> Callable[..., any]:
     @wraps(func)
     def inner(*args, **kwargs) -> any:
@@ -1,16 +1,60 @@
 
+import datetime
 import os
+from typing import NamedTuple
 
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Integer
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 class GithubEvent(Base):
     __tablename__ = os.getenv("DATABASE_TABLE_NAME")
+    # partitioned by day in postgre, keys of a partitioned table must include the partition column
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(String(50), primary_key=True, unique=True)
+    id = Column(String(50), primary_key=True)
     type = Column(String(255))
-    created_at = Column(DateTime, index=True)
+    created_at = Column(DateTime, primary_key=True, index=True)
     repository = Column(String(255))
 
+
+class GithubEventRecord(NamedTuple):
+    """
+    Event as scraped, only the kept fields of Github event JSON, without the overhead of ORM objects. Has the same
+    attributes as GithubEvent, it's inserted as a plain row.
+    """
+
+    id: str
+    type: str
+    created_at: datetime.datetime
+    repository: str
+
+
+class GithubEventHourlyCount(Base):
+    """
+    Rollup of events counted per repository, event type and hour of creation, maintained by the scraper
+    at insert time.
+    """
+
+    __tablename__ = f"{os.getenv('DATABASE_TABLE_NAME')}_hourly_counts"
+
+    repository = Column(String(255), primary_key=True)
+    type = Column(String(255), primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+
+class GithubEventCheckpoint(Base):
+    """
+    Newest scraped event of every event source, and the validators of its first page, maintained by the scraper once
+    the scraped events are stored, so a restarted scraper stops at them.
+    """
+
+    __tablename__ = f"{os.getenv('DATABASE_TABLE_NAME')}_checkpoints"
+
+    source = Column(String(255), primary_key=True)
+    event_id = Column(String(50), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    etag = Column(String(255))
+    last_modified = Column(String(255))
@@ -16,6 +16,33 @@ def calculate_days_ago(datetime_input: datetime.datetime) -> int:
 
 
 def convert_github_datetime(datetime_input: str) -> datetime.datetime:
+    """
+    Github datetimes have fixed format %Y-%m-%dT%H:%M:%SZ, they're sliced instead of the slow strptime, which
+    validates anything else.
+    """
+
+    if (
+        len(datetime_input) == 20
+        and datetime_input[4] == "-"
+        and datetime_input[7] == "-"
+        and datetime_input[10] == "T"
+        and datetime_input[13] == ":"
+        and datetime_input[16] == ":"
+        and datetime_input[19] == "Z"
+    ):
+        try:
+            return datetime.datetime(
+                int(datetime_input[0:4]),
+                int(datetime_input[5:7]),
+                int(datetime_input[8:10]),
+                int(datetime_input[11:13]),
+                int(datetime_input[14:16]),
+                int(datetime_input[17:19]),
+                tzinfo=datetime.timezone.utc,
+            )
+        except ValueError:
+            pass
+
     input_time = datetime.datetime.strptime(datetime_input, "%Y-%m-%dT%H:%M:%SZ")
     return input_time.replace(tzinfo=datetime.timezone.utc)
 
@@ -24,6 +51,18 @@ def convert_to_github_datetime(datetime_input: datetime.datetime) -> str:
     return datetime_input.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
+def truncate_to_hour(datetime_input: datetime.datetime) -> datetime.datetime:
+    """
+    :return: start of the hour in UTC without timezone, as stored in the database
+    """
+
+    if datetime_input.tzinfo:
+        datetime_input = datetime_input.astimezone(datetime.timezone.utc).replace(
+            tzinfo=None
+        )
+    return datetime_input.replace(minute=0, second=0, microsecond=0)
+
+
 def set_logger(config: Config):
     logging_level_map = {
         "debug": logging.DEBUG,